@@ -0,0 +1,169 @@
+"""
+Synthesizes the frequency tones on demand, so videos can be muxed without the MP3 files.
+
+generate_frequencies.py encodes each tone to MP3, and the video stage used to decode that
+MP3 again only to re-encode it to AAC. SineSource produces the same 16-bit PCM in fixed-size
+blocks and feeds it straight to the audio encoder: as a MoviePy AudioClip for
+write_videofile, or over a local socket as raw s16le input for ffmpeg command lines.
+The whole track is never held in memory and the lossy MP3 round-trip is skipped.
+
+check_audio_frequency decodes a rendered track and measures its dominant frequency with
+an FFT to confirm the tone survived encoding.
+"""
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from ffmpeg_tools import read_ffmpeg
+
+SAMPLE_RATE = 44100
+AMPLITUDE = 0.5
+CHUNK_SIZE = 65536  # Samples per synthesized block
+
+
+def generate_sine_chunks(frequency, duration, sample_rate, chunk_size=CHUNK_SIZE):
+    """
+    Yield the same 16-bit PCM tone as generate_sine_wave in fixed-size blocks.
+    Phase is carried between blocks as a fraction of a cycle, so memory stays at
+    one block and precision does not degrade for arbitrarily long durations.
+    """
+    total_samples = int(sample_rate * duration)
+    phase_step = frequency / sample_rate  # Cycles per sample
+    phase = 0.0
+
+    for start in range(0, total_samples, chunk_size):
+        count = min(chunk_size, total_samples - start)
+        cycles = phase + phase_step * np.arange(count)
+        audio_data = AMPLITUDE * np.sin(2 * np.pi * cycles)
+        yield (audio_data * 32767).astype(np.int16)
+        phase = (phase + phase_step * count) % 1.0
+
+
+class SineSource:
+    """
+    A mono sine tone of the given frequency and duration, generated block by block.
+    """
+    def __init__(self, frequency: float, duration: float, sample_rate: int = SAMPLE_RATE,
+                 chunk_size: int = CHUNK_SIZE):
+        self.frequency = frequency
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+
+    @property
+    def params(self) -> dict:
+        """
+        Everything that determines the samples, for cache keys.
+        """
+        return {"frequency": self.frequency, "duration": self.duration, "sample_rate": self.sample_rate,
+                "amplitude": AMPLITUDE, "format": "s16le"}
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        return generate_sine_chunks(self.frequency, self.duration, self.sample_rate, self.chunk_size)
+
+    def audio_clip(self):
+        """
+        The tone as a MoviePy AudioClip. MoviePy asks for samples in buffers of a few
+        thousand timestamps, and each buffer is computed from its timestamps directly.
+        """
+        from moviepy.editor import AudioClip
+
+        frequency = self.frequency
+        return AudioClip(lambda t: AMPLITUDE * np.sin(2 * np.pi * ((frequency * np.asarray(t)) % 1.0)),
+                         duration=self.duration, fps=self.sample_rate)
+
+    @contextmanager
+    def serve(self) -> Iterator[List[str]]:
+        """
+        Serve the PCM on a local TCP socket for the duration of the block and yield the
+        ffmpeg input arguments that read it. A socket works the same on every platform,
+        unlike inherited pipe descriptors, and leaves ffmpeg's stdin free for video frames.
+        """
+        server = socket.create_server(("127.0.0.1", 0))
+        server.settimeout(0.5)
+        port = server.getsockname()[1]
+        stop = threading.Event()
+        errors = []
+
+        def feed():
+            try:
+                while not stop.is_set():
+                    try:
+                        connection, _ = server.accept()
+                        break
+                    except socket.timeout:
+                        continue
+                else:
+                    return
+                with connection:
+                    connection.settimeout(None)
+                    for block in self.blocks():
+                        connection.sendall(block.astype("<i2", copy=False).tobytes())
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # ffmpeg stopped reading; its own exit status reports why
+            except BaseException as e:
+                errors.append(e)
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        try:
+            yield ["-f", "s16le", "-ar", str(self.sample_rate), "-ac", "1", "-i", f"tcp://127.0.0.1:{port}"]
+        finally:
+            stop.set()
+            feeder.join()
+            server.close()
+        if errors:
+            raise errors[0]
+
+
+def read_audio(path, sample_rate: int = SAMPLE_RATE, start: float = 0, seconds: float = 10) -> np.ndarray:
+    """
+    Decode `seconds` of a file's first audio stream to mono float samples in [-1, 1].
+    """
+    data = read_ffmpeg(["-ss", start, "-t", seconds, "-i", path, "-map", "0:a:0",
+                        "-ac", "1", "-ar", sample_rate, "-f", "s16le", "-"])
+    return np.frombuffer(data, dtype="<i2").astype(np.float64) / 32768
+
+
+def dominant_frequency(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> tuple:
+    """
+    Return (frequency, peak amplitude) of the strongest spectral component. A Hann window
+    keeps leakage away from the peak, and a parabola through the log magnitudes of the
+    peak bin and its neighbours locates the peak to a small fraction of a bin.
+    """
+    window = np.hanning(len(samples))
+    spectrum = np.abs(np.fft.rfft((samples - samples.mean()) * window))
+    peak = int(np.argmax(spectrum[1:])) + 1
+    offset, magnitude = 0.0, spectrum[peak]
+    if peak + 1 < len(spectrum):
+        left, center, right = np.log(spectrum[peak - 1:peak + 2] + 1e-12)
+        offset = 0.5 * (left - right) / (left - 2 * center + right)
+        magnitude = np.exp(center - 0.25 * (left - right) * offset)
+    # A windowed sine of amplitude A peaks at A * sum(window) / 2
+    amplitude = 2 * magnitude / window.sum()
+    return (peak + offset) * sample_rate / len(samples), amplitude
+
+
+def check_audio_frequency(path, frequency: float, start: float = 0, seconds: float = 10,
+                          tolerance: Optional[float] = None, amplitude: float = AMPLITUDE) -> List[str]:
+    """
+    Verify the audio of a rendered file is a tone at `frequency` and roughly the
+    synthesized level. The default tolerance is 5% of an FFT bin, 0.005 Hz for 10 seconds
+    of audio. Returns a list of problems.
+    """
+    samples = read_audio(path, start=start, seconds=seconds)
+    if not len(samples):
+        return ["no audio samples"]
+    if tolerance is None:
+        tolerance = 0.05 * SAMPLE_RATE / len(samples)
+    measured, level = dominant_frequency(samples)
+    problems = []
+    if abs(measured - frequency) > tolerance:
+        problems.append(f"dominant frequency {measured:.4f} Hz, expected {frequency} Hz")
+    # Loose on purpose: some AAC encodes attenuate infrasonic tones by 10-15%
+    if abs(level - amplitude) > 0.25 * amplitude:
+        problems.append(f"tone amplitude {level:.3f}, expected {amplitude}")
+    return problems
@@ -0,0 +1,1164 @@
+"""
+Benchmarks for the FreqCreator pipeline stages.
+
+Usage:
+    python benchmark.py render [--size 1080x1920] [--repeat 5] [--frequency 432]
+    python benchmark.py text [--size 1080x1920] [--repeat 5]
+    python benchmark.py pulse [--size 1080x1920] [--duration 20] [--cache-mb 1024] [--policy lru]
+    python benchmark.py composite [--size 1080x1920] [--frames 90]
+    python benchmark.py writer [--size 1080x1920] [--duration 300]
+    python benchmark.py audio [--duration 300] [--frequencies 7.83,432,1222] [--writer pipe]
+    python benchmark.py formats [--duration 300] [--frequencies 7.83,432,1222]
+    python benchmark.py period [--duration 300] [--frequencies 432,528,100]
+    python benchmark.py transcode [--size 360x640] [--duration 120]
+    python benchmark.py upload [--files 8] [--size-mb 16] [--jobs 4] [--failures 6]
+    python benchmark.py pipeline [--size 270x480] [--duration 2] [--frequencies 2]
+    python benchmark.py resume [--size 270x480] [--duration 20] [--frequencies 3]
+    python benchmark.py queue [--size 270x480] [--duration 10] [--frequencies 3] [--workers 3] [--lease-ttl 5]
+    python benchmark.py preview [--full-duration 30] [--frequencies 12]
+    python benchmark.py aspects [--size 540x960] [--duration 10] [--aspects 1:1,16:9]
+    python benchmark.py tracing [--size 270x480] [--duration 2] [--frequencies 2] [--spans 100000]
+    python benchmark.py openai [--frequencies 12] [--latency 0.5] [--concurrency 4] [--rpm 600]
+    python benchmark.py suite [--size 540x960] [--video-duration 10] [--audio-duration 60] [--repeat 3]
+                              [--output benchmark_results.json] [--baseline benchmark_baseline.json] [--save-baseline]
+
+The suite runs every stage offline on synthetic inputs, each in a fresh process, and
+records wall time, CPU time (including ffmpeg), peak RSS and output bytes. With a
+baseline it exits with status 1 when a metric grows past its threshold.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+def parse_size(value: str) -> tuple:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def time_call(func, repeat: int) -> float:
+    """
+    Return the best wall-clock time in seconds over `repeat` calls.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_with_cpu(func) -> tuple:
+    """
+    Return (wall seconds, CPU seconds) for one call, including child processes such as ffmpeg.
+    """
+    before = os.times()
+    start = time.perf_counter()
+    func()
+    wall = time.perf_counter() - start
+    after = os.times()
+    cpu = sum(after[:4]) - sum(before[:4])
+    return wall, cpu
+
+
+def make_test_video(path, size: tuple, duration: float, fps: int = 30):
+    """
+    Write a synthetic H.264/AAC source video with ffmpeg's test pattern and a sine tone.
+    """
+    from ffmpeg_tools import run_ffmpeg
+
+    run_ffmpeg([
+        "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={size[0]}x{size[1]}:rate={fps}",
+        "-f", "lavfi", "-i", "sine=frequency=432:sample_rate=44100",
+        "-t", duration,
+        "-c:v", "libx264", "-b:v", "8000k", "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        path
+    ])
+
+
+def bench_render(args):
+    from frequency_video_generator import FrequencyVideoGenerator, RENDERERS
+
+    timings = {}
+    layer_timings = {}
+    images = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for renderer in RENDERERS:
+            generator = FrequencyVideoGenerator(
+                output_folder=str(Path(tmp) / renderer),
+                image_size=args.size,
+                renderer=renderer
+            )
+            # Drop the memoized background so every repeat renders it again
+            timings[renderer] = time_call(lambda: (generator.release(args.frequency),
+                                                   generator.generate_image(args.frequency)), args.repeat)
+            draw_layers = getattr(generator, f"_draw_layers_{renderer}")
+            canvas = ImageDraw.Draw(Image.new("RGB", args.size, "black"))
+            center_x, center_y = args.size[0] // 2, args.size[1] // 2
+            layer_timings[renderer] = time_call(
+                lambda: draw_layers(canvas, args.frequency, center_x, center_y,
+                                    min(center_x, center_y) * 1.8, (255, 0, 0), (0, 0, 255)),
+                args.repeat
+            )
+            image_path = generator.images_dir / f"{args.frequency}Hz_base_image.jpg"
+            images[renderer] = np.asarray(Image.open(image_path), dtype=np.int16)
+
+    diff = np.abs(images["numpy"] - images["pil"])
+    print(f"\ngenerate_image at {args.size[0]}x{args.size[1]} ({args.frequency} Hz, best of {args.repeat}):")
+    for renderer, seconds in timings.items():
+        print(f"  {renderer:>6}: {seconds * 1000:8.1f} ms/image ({layer_timings[renderer] * 1000:.1f} ms in layer drawing)")
+    print(f"  speedup: {timings['pil'] / timings['numpy']:.2f}x per image, "
+          f"{layer_timings['pil'] / layer_timings['numpy']:.2f}x in layer drawing")
+    print(f"  pixel difference: mean {diff.mean():.4f}, max {diff.max()}")
+
+
+def bench_text(args):
+    from frequency_video_generator import FrequencyVideoGenerator, RENDERERS
+
+    frequencies = [7.83, 136.1, 432, 528, 963, 1111]
+    overlays = {"with_text": "_render_text_overlay", "overlay": "_render_transparent_text_overlay"}
+    timings = {(renderer, name): 0.0 for renderer in RENDERERS for name in overlays}
+    outputs = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        generators = {renderer: FrequencyVideoGenerator(output_folder=tmp, image_size=args.size, renderer=renderer)
+                      for renderer in RENDERERS}
+        for frequency in frequencies:
+            description = generators["numpy"].describe(frequency)
+            for renderer, generator in generators.items():
+                generator.base_image(frequency)
+                for name, method in overlays.items():
+                    render = getattr(generator, method)
+                    timings[renderer, name] += time_call(lambda: render(frequency, description), args.repeat)
+                    outputs[renderer, name, frequency] = np.asarray(render(frequency, description), dtype=np.float32)
+
+    def over_gray(layer):
+        alpha = layer[..., 3:] / 255
+        return layer[..., :3] * alpha + 128 * (1 - alpha)
+
+    print(f"\nText overlays at {args.size[0]}x{args.size[1]}, mean over {len(frequencies)} frequencies (best of {args.repeat}):")
+    for name in overlays:
+        pil, numpy_ = timings["pil", name] / len(frequencies), timings["numpy", name] / len(frequencies)
+        diffs = []
+        for frequency in frequencies:
+            a, b = outputs["numpy", name, frequency], outputs["pil", name, frequency]
+            if name == "overlay":
+                a, b = over_gray(a), over_gray(b)
+            diffs.append(np.abs(a - b))
+        diff = np.stack(diffs)
+        print(f"  {name:>9}: pil {pil * 1000:6.1f} ms, numpy {numpy_ * 1000:6.1f} ms ({pil / numpy_:.2f}x); "
+              f"pixel difference mean {diff.mean():.3f}, {(diff.max(-1) > 8).mean() * 100:.2f}% of pixels off by more than 8")
+    per_frequency = {renderer: sum(timings[renderer, name] for name in overlays) / len(frequencies) for renderer in RENDERERS}
+    print(f"  per frequency: pil {per_frequency['pil'] * 1000:.1f} ms, numpy {per_frequency['numpy'] * 1000:.1f} ms")
+
+
+def bench_pulse(args):
+    import math
+    from moviepy.editor import ImageClip, vfx
+    from frequency_video_generator import FrequencyVideoGenerator
+    from frame_cache import FrameCache
+
+    def modify_time(t):
+        return 1 + 0.02 * math.sin(2 * math.pi * t / 10)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generator = FrequencyVideoGenerator(output_folder=tmp, image_size=args.size)
+        base_clip = ImageClip(generator.generate_image(args.frequency)).set_duration(args.duration)
+
+        frame_cache = FrameCache(args.cache_mb * 2**20, args.policy)
+        clips = {
+            "resize": base_clip.fx(vfx.resize, modify_time),
+            "cached": generator._cached_pulse(base_clip, modify_time, frame_cache),
+        }
+        frame_times = [i / args.fps for i in range(int(args.duration * args.fps))]
+
+        timings = {}
+        mismatches = 0
+        for name, clip in clips.items():
+            start = time.perf_counter()
+            for t in frame_times:
+                clip.get_frame(t)
+            timings[name] = time.perf_counter() - start
+
+        for t in frame_times[::args.fps]:
+            if not np.array_equal(clips["resize"].get_frame(t), clips["cached"].get_frame(t)):
+                mismatches += 1
+
+    print(f"\nPulsing background, {len(frame_times)} frames at {args.size[0]}x{args.size[1]}:")
+    for name, seconds in timings.items():
+        print(f"  {name:>6}: {seconds:8.2f}s ({len(frame_times) / seconds:.0f} frames/s)")
+    print(f"  speedup: {timings['resize'] / timings['cached']:.1f}x")
+    print(f"  {frame_cache.report()}")
+    print(f"  frames differing from vfx.resize: {mismatches} of {len(frame_times[::args.fps])} sampled")
+
+
+def bench_composite(args):
+    import math
+    import tracemalloc
+    from moviepy.editor import CompositeVideoClip, ImageClip
+    from compositor import OverlayCompositor
+    from frame_cache import FrameCache
+    from frequency_video_generator import FrequencyVideoGenerator
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generator = FrequencyVideoGenerator(output_folder=tmp, image_size=args.size)
+        duration = args.frames / args.fps
+        base_clip = ImageClip(np.asarray(generator.base_image(args.frequency))).set_duration(duration)
+        overlay = np.asarray(generator.text_layer(args.frequency))
+
+    pulsing_clip = generator._cached_pulse(base_clip, lambda t: 1 + 0.02 * math.sin(2 * math.pi * t / 10), FrameCache())
+    clips = {
+        "composite": CompositeVideoClip([pulsing_clip, ImageClip(overlay, transparent=True).set_duration(duration)]),
+        "integer": OverlayCompositor(overlay).clip(pulsing_clip),
+    }
+    frame_times = [i / args.fps for i in range(args.frames)]
+    for t in frame_times:
+        pulsing_clip.get_frame(t)  # Warm the pulse cache so only compositing is timed
+
+    results = {}
+    for name, clip in clips.items():
+        start = time.perf_counter()
+        for t in frame_times:
+            clip.get_frame(t)
+        seconds = time.perf_counter() - start
+
+        # Peak memory allocated while producing a frame, beyond what was live before it
+        tracemalloc.start()
+        peaks = []
+        for t in frame_times[:10]:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            clip.get_frame(t)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        tracemalloc.stop()
+        results[name] = (seconds, max(peaks))
+
+    frame_bytes = args.size[0] * args.size[1] * 3
+    differing = [np.abs(clips["composite"].get_frame(t).astype(np.int16) - clips["integer"].get_frame(t))
+                 for t in frame_times[::args.fps]]
+    print(f"\nText overlay compositing, {args.frames} frames at {args.size[0]}x{args.size[1]}:")
+    for name, (seconds, peak) in results.items():
+        print(f"  {name:>9}: {args.frames / seconds:7.1f} frames/s, peak {peak / 2**20:6.1f} MB allocated per frame "
+              f"({peak / frame_bytes:.1f} frame buffers)")
+    print(f"  speedup: {results['composite'][0] / results['integer'][0]:.1f}x; "
+          f"max difference {max(diff.max() for diff in differing)}, "
+          f"{np.mean([(diff > 0).any(-1).mean() for diff in differing]) * 100:.3f}% of pixels differ")
+
+
+def bench_writer(args):
+    from frequency_video_generator import FrequencyVideoGenerator, VIDEO_WRITERS
+    from ffmpeg_tools import run_ffmpeg
+    from loop_render import probe_packets
+
+    results = {}
+    packets = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_folder = os.path.join(tmp, "audio")
+        os.makedirs(audio_folder)
+        audio_path = os.path.join(audio_folder, f"{args.frequency:g}Hz.mp3")
+        run_ffmpeg(["-y", "-f", "lavfi", "-i", f"sine=frequency={args.frequency:g}:sample_rate=44100",
+                    "-t", args.duration, "-b:a", "192k", audio_path])
+
+        for writer in VIDEO_WRITERS:
+            generator = FrequencyVideoGenerator(audio_folder=audio_folder, output_folder=os.path.join(tmp, writer),
+                                                video_duration=args.duration, image_size=args.size,
+                                                progress=False, writer=writer)
+            video_path = generator.videos_dir / f"{args.frequency:g}Hz_video.mp4"
+            generator.base_image(args.frequency)
+            generator.text_layer(args.frequency)
+            results[writer] = time_with_cpu(lambda: generator._render_video(args.frequency, audio_path, video_path))
+            packets[writer] = {stream: probe_packets(video_path, stream)[1] for stream in ("v", "a")}
+
+    print(f"\nFull render of a {args.duration:.0f}s {args.size[0]}x{args.size[1]} video:")
+    for writer, (wall, cpu) in results.items():
+        print(f"  {writer:>7}: {wall:8.1f}s wall, {cpu:8.1f}s CPU, "
+              f"{len(packets[writer]['v'])} video / {len(packets[writer]['a'])} audio packets")
+    (moviepy_wall, moviepy_cpu), (pipe_wall, pipe_cpu) = results["moviepy"], results["pipe"]
+    same_video = [packet[2] for packet in packets["moviepy"]["v"]] == [packet[2] for packet in packets["pipe"]["v"]]
+    print(f"  saved: {moviepy_wall - pipe_wall:.1f}s wall ({moviepy_wall / pipe_wall:.2f}x), "
+          f"{moviepy_cpu - pipe_cpu:.1f}s CPU; video streams {'identical' if same_video else 'differ'}")
+
+
+def bench_audio(args):
+    from audio_source import SineSource, dominant_frequency, read_audio
+    from ffmpeg_tools import run_ffmpeg
+    from frequency_video_generator import FrequencyVideoGenerator, VIDEO_SETTINGS
+    from generate_frequencies import stream_sine_to_mp3
+
+    print(f"\nAAC track of {args.duration:.0f}s per frequency, from the MP3 vs synthesized on the fly:")
+    with tempfile.TemporaryDirectory() as tmp:
+        totals = {"mp3": 0.0, "synth": 0.0}
+        for frequency in args.frequencies:
+            mp3_path = os.path.join(tmp, f"{frequency:g}Hz.mp3")
+            stream_sine_to_mp3(frequency, args.duration, 44100, mp3_path)
+            results = {}
+            for name in totals:
+                output = os.path.join(tmp, f"{frequency:g}Hz_{name}.m4a")
+
+                def encode():
+                    if name == "mp3":
+                        run_ffmpeg(["-y", "-i", mp3_path, "-c:a", VIDEO_SETTINGS["audio_codec"], output])
+                        return
+                    with SineSource(frequency, args.duration).serve() as audio_input:
+                        run_ffmpeg(["-y", *audio_input, "-c:a", VIDEO_SETTINGS["audio_codec"], output])
+
+                wall, cpu = time_with_cpu(encode)
+                totals[name] += cpu
+                measured, level = dominant_frequency(read_audio(output, start=args.duration / 2))
+                results[name] = (wall, cpu, measured, level)
+            print(f"  {frequency:>8g} Hz: " + ", ".join(
+                f"{name} {wall:5.2f}s wall {cpu:5.2f}s CPU -> {measured:.4f} Hz (error {measured - frequency:+.4f}), "
+                f"amplitude {level:.3f}" for name, (wall, cpu, measured, level) in results.items()))
+        print(f"  CPU: {totals['mp3']:.2f}s from MP3, {totals['synth']:.2f}s synthesized "
+              f"({totals['mp3'] / totals['synth']:.2f}x)")
+
+        frequency = args.frequencies[0]
+        generator = FrequencyVideoGenerator(audio_folder=os.path.join(tmp, "missing"), output_folder=os.path.join(tmp, "out"),
+                                            video_duration=args.video_duration, image_size=args.size,
+                                            progress=False, writer=args.writer, audio_source="synth")
+        start = time.perf_counter()
+        generator.create_video(frequency)
+        print(f"  {args.video_duration:.0f}s {args.writer} render at {frequency:g} Hz without an MP3: "
+              f"{time.perf_counter() - start:.1f}s")
+
+
+def bench_formats(args):
+    import generate_frequencies
+    import process_videos
+    from ffmpeg_tools import run_ffmpeg
+
+    sample_rate = generate_frequencies.sample_rate
+    platform_durations = sorted(set(process_videos.platforms.values()))
+    stages = {"mp3 only": {}, "mp3 + m4a": {}}
+
+    def mux_and_platforms(audio_path, codec, tmp):
+        # Audio side of the video mux, then of the platform fan-out from the muxed track
+        muxed = os.path.join(tmp, f"muxed_{codec}.m4a")
+        run_ffmpeg(["-y", "-t", args.duration, "-i", audio_path, "-c:a", codec, muxed])
+        outputs = []
+        for max_duration in platform_durations:
+            outputs += ["-t", max_duration, "-c:a", codec, os.path.join(tmp, f"platform_{max_duration}_{codec}.m4a")]
+        run_ffmpeg(["-y", "-i", muxed] + outputs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for frequency in args.frequencies:
+            paths = {audio_format: os.path.join(tmp, f"{frequency:g}Hz.{audio_format}") for audio_format in ("mp3", "m4a")}
+            chunks = lambda: generate_frequencies.generate_sine_chunks(frequency, args.duration, sample_rate)
+
+            old = stages["mp3 only"]
+            old.setdefault("generate", []).append(time_with_cpu(
+                lambda: generate_frequencies.encode_tone(chunks(), sample_rate, {"mp3": paths["mp3"]}))[1])
+            old.setdefault("mux + platforms", []).append(time_with_cpu(
+                lambda: mux_and_platforms(paths["mp3"], "aac", tmp))[1])
+
+            new = stages["mp3 + m4a"]
+            new.setdefault("generate", []).append(time_with_cpu(
+                lambda: generate_frequencies.encode_tone(chunks(), sample_rate, paths))[1])
+            new.setdefault("mux + platforms", []).append(time_with_cpu(
+                lambda: mux_and_platforms(paths["m4a"], "copy", tmp))[1])
+
+    batch = len(generate_frequencies.frequencies)
+    print(f"\nAudio encode CPU per {args.duration:.0f}s frequency (mean of {len(args.frequencies)}), "
+          f"video mux plus {len(platform_durations)} platform encodes:")
+    totals = {}
+    for name, stage_times in stages.items():
+        per_frequency = {stage: sum(times) / len(times) for stage, times in stage_times.items()}
+        totals[name] = sum(per_frequency.values())
+        print(f"  {name:>9}: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in per_frequency.items())
+              + f", total {totals[name]:.2f}s")
+    saved = totals["mp3 only"] - totals["mp3 + m4a"]
+    print(f"  saved {saved:.2f}s CPU per frequency, {saved * batch:.0f}s over the {batch}-frequency batch "
+          f"({saved * len(set(generate_frequencies.frequencies)):.0f}s for its "
+          f"{len(set(generate_frequencies.frequencies))} distinct frequencies)")
+
+
+def bench_period(args):
+    import generate_frequencies
+    from mp3_period import _encode, check_seams, encode_periodic_mp3, loop_block_samples, periodic_tone, split_frames
+
+    sample_rate, bit_rate = generate_frequencies.sample_rate, generate_frequencies.bit_rate
+    print(f"\n{args.duration:.0f}s MP3 per frequency, full streaming encode vs one repeated loop block:")
+    with tempfile.TemporaryDirectory() as tmp:
+        for frequency in args.frequencies:
+            stream_path = os.path.join(tmp, f"{frequency:g}Hz_stream.mp3")
+            period_path = os.path.join(tmp, f"{frequency:g}Hz_period.mp3")
+            stream_wall, stream_cpu = time_with_cpu(lambda: generate_frequencies.stream_sine_to_mp3(
+                frequency, args.duration, sample_rate, stream_path))
+            result = {}
+            period_wall, period_cpu = time_with_cpu(lambda: result.update(encode_periodic_mp3(
+                frequency, args.duration, sample_rate, bit_rate, period_path) or {}))
+            if not result:
+                print(f"  {frequency:>8g} Hz: loop block of {loop_block_samples(frequency, sample_rate, bit_rate) / sample_rate:.1f}s "
+                      f"is too long to repeat, streaming encode {stream_cpu:.2f}s CPU")
+                continue
+
+            problems = check_seams(period_path, frequency, result["seam_frames"], sample_rate)
+            assert not problems, problems
+
+            # Splicing must give exactly the frames of encoding the whole duration
+            full = split_frames(_encode(periodic_tone(frequency, sample_rate, result["total_samples"]),
+                                        sample_rate, bit_rate, 2))
+            spliced = split_frames(Path(period_path).read_bytes())[1:]
+            assert spliced == full, "spliced frames differ from a full encode"
+
+            print(f"  {frequency:>8g} Hz: stream {stream_cpu:.2f}s CPU, period {period_cpu:.2f}s CPU "
+                  f"({stream_cpu / period_cpu:.1f}x), block {result['block_samples'] / sample_rate:.2f}s, "
+                  f"encoded {result['encoded_samples'] / sample_rate:.1f}s; {len(result['seam_frames'])} seams "
+                  f"phase-continuous, frames identical to a full encode")
+
+    distinct = sorted(set(generate_frequencies.frequencies))
+    repeatable = [f for f in distinct if loop_block_samples(f, sample_rate, bit_rate) * 3 <= sample_rate * args.duration]
+    print(f"  {len(repeatable)} of the batch's {len(distinct)} distinct frequencies have a short enough loop block")
+
+
+def bench_transcode(args):
+    import process_videos
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.mp4")
+        make_test_video(source, args.size, args.duration)
+
+        for name, process in [("legacy", process_videos.process_video_legacy),
+                              ("fanout", process_videos.transcode_fanout)]:
+            process_videos.output_folder = os.path.join(tmp, name)
+            process_videos.create_folders()
+            results[name] = time_with_cpu(lambda: process(source, "source.mp4"))
+
+    print(f"\nPlatform transcode of a {args.duration:.0f}s {args.size[0]}x{args.size[1]} video "
+          f"({len(process_videos.platforms)} platforms):")
+    for name, (wall, cpu) in results.items():
+        print(f"  {name:>6}: {wall:8.1f}s wall, {cpu:8.1f}s CPU")
+    (legacy_wall, legacy_cpu), (fanout_wall, fanout_cpu) = results["legacy"], results["fanout"]
+    print(f"  saved: {legacy_wall - fanout_wall:.1f}s wall ({legacy_wall / fanout_wall:.1f}x), "
+          f"{legacy_cpu - fanout_cpu:.1f}s CPU ({legacy_cpu / fanout_cpu:.1f}x)")
+
+
+def bench_pipeline(args):
+    from build_cache import BuildCache
+    from frequency_video_generator import PIPELINE_STAGES, _process_frequency_job
+    from ffmpeg_tools import run_ffmpeg
+
+    frequencies = [432 + 96 * index for index in range(args.frequencies)]
+    runs = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_folder = os.path.join(tmp, "audio")
+        os.makedirs(audio_folder)
+        for frequency in frequencies:
+            run_ffmpeg(["-y", "-f", "lavfi", "-i", f"sine=frequency={frequency}:sample_rate=44100",
+                        "-t", args.duration, os.path.join(audio_folder, f"{frequency}Hz.mp3")])
+
+        options = dict(audio_folder=audio_folder, output_folder=os.path.join(tmp, "out"),
+                       video_duration=args.duration, image_size=args.size, progress=False)
+        cache_dir = str(BuildCache(os.path.join(tmp, "cache")).cache_dir)
+        for name in ("cold", "cached"):
+            start = time.perf_counter()
+            records = [_process_frequency_job(options, cache_dir, frequency) for frequency in frequencies]
+            runs[name] = (time.perf_counter() - start, records)
+
+    print(f"\nprocess_frequency for {len(frequencies)} frequencies, {args.duration:.0f}s at {args.size[0]}x{args.size[1]}:")
+    for name, (seconds, records) in runs.items():
+        counts = {stage: [record["stage_runs"].get(stage, 0) for record in records] for stage in PIPELINE_STAGES}
+        errors = [record["error"] for record in records if record["error"]]
+        print(f"  {name:>6}: {seconds:6.2f}s, runs per frequency: "
+              + ", ".join(f"{stage} {max(runs_)}" for stage, runs_ in counts.items())
+              + (f", errors: {errors}" if errors else ""))
+        assert not errors, errors
+        for stage, runs_ in counts.items():
+            # Every stage runs exactly once per frequency; a warm cache skips all but the
+            # description, which is part of every cache key
+            expected = 1 if name == "cold" or stage == "description" else 0
+            assert runs_ == [expected] * len(frequencies), f"{stage} ran {runs_} times on the {name} run"
+    print("  each stage ran exactly once per frequency, and only the description when cached")
+
+
+def bench_tracing(args):
+    import tracing
+    from frequency_video_generator import MANIFEST_STAGES, _process_frequency_job
+    from ffmpeg_tools import run_ffmpeg
+
+    print(f"\nCost of one span, {args.spans} spans:")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, trace_path, metrics_path in (("disabled", None, None),
+                                               ("metrics", None, os.path.join(tmp, "spans.prom")),
+                                               ("jsonl", os.path.join(tmp, "spans.jsonl"), None)):
+            tracing.configure(trace_path, metrics_path)
+            start = time.perf_counter()
+            for _ in range(args.spans):
+                with tracing.span("noop", frequency=432) as span:
+                    span.add(frames=1)
+            print(f"  {name:>8}: {(time.perf_counter() - start) / args.spans * 1e6:7.2f} us")
+
+    frequencies = [432 + 96 * index for index in range(args.frequencies)]
+    runs = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_folder = os.path.join(tmp, "audio")
+        os.makedirs(audio_folder)
+        for frequency in frequencies:
+            run_ffmpeg(["-y", "-f", "lavfi", "-i", f"sine=frequency={frequency}:sample_rate=44100",
+                        "-t", args.duration, os.path.join(audio_folder, f"{frequency}Hz.mp3")])
+        trace_path, metrics_path = os.path.join(tmp, "trace.jsonl"), os.path.join(tmp, "freqcreator.prom")
+
+        for name in ("disabled", "enabled"):
+            tracer = tracing.configure(*((trace_path, metrics_path) if name == "enabled" else (None, None)))
+            options = dict(audio_folder=audio_folder, output_folder=os.path.join(tmp, f"out_{name}"),
+                           video_duration=args.duration, image_size=args.size, progress=False)
+            start = time.perf_counter()
+            records = [_process_frequency_job(options, None, frequency) for frequency in frequencies]
+            runs[name] = time.perf_counter() - start
+            errors = [record["error"] for record in records if record["error"]]
+            assert not errors, errors
+            for record in records:
+                tracer.merge_totals(record["trace_totals"])
+        tracer.write_metrics()
+        tracing.configure()
+
+        with open(trace_path) as f:
+            spans = [json.loads(line) for line in f]
+        with open(metrics_path) as f:
+            metrics = f.read()
+
+    print(f"\nprocess_frequency for {len(frequencies)} frequencies, {args.duration:.0f}s at {args.size[0]}x{args.size[1]}:")
+    for name, seconds in runs.items():
+        print(f"  {name:>8}: {seconds:6.2f}s")
+    print(f"  {len(spans)} spans traced:")
+    for span in spans:
+        fps = f", {span['frames']} frames at {span['fps']} fps" if span["frames"] else ""
+        print(f"    {span['name']:<16} {span['frequency']:>5} Hz  {span['seconds']:6.2f}s wall, "
+              f"{span['cpu_seconds']:6.2f}s CPU, {span['bytes'] / 1e3:8.1f} kB{fps}")
+
+    frequency_spans = {span["span_id"]: span for span in spans if span["name"] == "frequency"}
+    assert len(frequency_spans) == len(frequencies), frequency_spans
+    for stage in MANIFEST_STAGES:
+        stage_spans = [span for span in spans if span["name"] == stage]
+        assert len(stage_spans) == len(frequencies), f"{len(stage_spans)} {stage} spans"
+        assert all(span["parent_id"] in frequency_spans and span["bytes"] > 0 and span["status"] == "ok"
+                   for span in stage_spans), stage_spans
+    expected_frames = int(args.duration * 30)
+    assert all(span["frames"] == expected_frames for span in spans if span["name"] == "video")
+    expected_runs = f'freqcreator_stage_runs_total{{stage="video",status="ok"}} {len(frequencies)}'
+    assert expected_runs in metrics, metrics
+    print(f"  every stage has one span per frequency under its frequency span, and the metrics file counts them")
+
+
+def bench_resume(args):
+    from frequency_video_generator import MANIFEST_STAGES, run_batch
+    from job_manifest import JobManifest
+    from ffmpeg_tools import run_ffmpeg
+
+    frequencies = [432 + 96 * index for index in range(args.frequencies)]
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_folder = os.path.join(tmp, "audio")
+        os.makedirs(audio_folder)
+        for frequency in frequencies:
+            run_ffmpeg(["-y", "-f", "lavfi", "-i", f"sine=frequency={frequency}:sample_rate=44100",
+                        "-t", args.duration, os.path.join(audio_folder, f"{frequency}Hz.mp3")])
+        output_folder = os.path.join(tmp, "out")
+        manifest_path = os.path.join(output_folder, "job_manifest.sqlite")
+        options = dict(audio_folder=audio_folder, output_folder=output_folder, video_duration=args.duration,
+                       image_size=args.size)
+
+        # Kill a batch while it renders the second frequency's video
+        script = (f"from frequency_video_generator import run_batch; "
+                  f"run_batch({frequencies!r}, manifest_path={manifest_path!r}, **{options!r})")
+        process = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        videos = Path(output_folder) / "videos"
+        start = time.perf_counter()
+        while process.poll() is None:
+            if videos.is_dir() and any(path.name.startswith(f".{frequencies[1]}Hz_video.") for path in videos.iterdir()):
+                break
+            time.sleep(0.05)
+        process.kill()
+        process.wait()
+        killed = time.perf_counter() - start
+        partial = [path.name for path in videos.iterdir() if ".tmp" in path.name]
+        manifest = JobManifest(manifest_path)
+        before = manifest.summary()
+        manifest.close()
+        print(f"\nKilled the batch after {killed:.1f}s: {dict(before)}, partial files {partial}")
+
+        start = time.perf_counter()
+        records = run_batch(frequencies, manifest_path=manifest_path, resume=True, **options)
+        resumed_seconds = time.perf_counter() - start
+        left = [path.name for path in videos.iterdir() if ".tmp" in path.name]
+        manifest = JobManifest(manifest_path)
+        after = manifest.summary()
+        manifest.close()
+
+    print(f"\nResumed {len(frequencies)} frequencies in {resumed_seconds:.1f}s:")
+    for record in records:
+        print(f"  {record['frequency']:>6} Hz: resumed {record['resumed'] or 'nothing'}")
+    assert all(record["error"] is None for record in records), [record["error"] for record in records]
+    assert records[0]["resumed"] == list(MANIFEST_STAGES), "the finished frequency was processed again"
+    assert "video" not in records[1]["resumed"], "the interrupted video was treated as done"
+    assert not left, f"partial files left behind: {left}"
+    assert after == {"done": len(frequencies) * len(MANIFEST_STAGES)}, after
+    print(f"  finished stages skipped, interrupted video rebuilt, no partial files left; manifest {dict(after)}")
+
+
+def bench_queue(args):
+    import process_videos
+    from work_queue import WorkQueue
+
+    assert args.workers >= 3, "two workers are killed, so at least three are needed"
+    frequencies = [432 + 96 * index for index in range(args.frequencies)]
+    with tempfile.TemporaryDirectory() as tmp:
+        output_folder = os.path.join(tmp, "out")
+        options = dict(output_folder=output_folder, video_duration=args.duration, image_size=args.size,
+                       writer="pipe", audio_source="synth")
+        queue = WorkQueue.create(os.path.join(tmp, "queue"), frequencies, options, transcode=True,
+                                 transcode_folder=os.path.join(tmp, "processed"), lease_ttl=args.lease_ttl)
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "work_queue.py"),
+                   "worker", str(queue.path), "--poll", "0.2", "--threads", "1",
+                   "--cache-dir", os.path.join(tmp, "cache")]
+        logs = [open(os.path.join(tmp, f"worker{index}.log"), "w") for index in range(args.workers)]
+        start = time.perf_counter()
+        workers = [subprocess.Popen(command + ["--worker-id", f"worker{index}"], stdout=log, stderr=subprocess.STDOUT)
+                   for index, log in enumerate(logs)]
+
+        # Kill worker0 while it encodes a video, then worker1 while it transcodes one
+        videos = Path(output_folder) / "videos"
+        platform_folders = [Path(queue.transcode_folder) / platform for platform in process_videos.platforms]
+        targets = {"worker0": (workers[0], "render", [videos]), "worker1": (workers[1], "transcode", platform_folders)}
+        victims = {}
+        while any(worker_id not in victims and worker.poll() is None for worker_id, (worker, _, _) in targets.items()):
+            for lease_path in queue.leases_dir.glob("*.lease"):
+                try:
+                    lease = json.loads(lease_path.read_text())
+                except (FileNotFoundError, ValueError):
+                    continue
+                if lease["worker"] not in targets or lease["worker"] in victims:
+                    continue
+                worker, stage, folders = targets[lease["worker"]]
+                if lease["job"].endswith(f"-{stage}") and any(lease["temp_owner"] in path.name for folder in folders
+                                                              if folder.is_dir() for path in folder.iterdir()):
+                    worker.kill()
+                    worker.wait()
+                    victims[lease["worker"]] = (lease["job"], time.perf_counter() - start)
+            time.sleep(0.05)
+        for worker in workers:
+            worker.wait(timeout=600)
+        seconds = time.perf_counter() - start
+        for log in logs:
+            log.close()
+
+        summary = queue.summary()
+        results = {job["id"]: queue.result(job) for job in queue.jobs}
+        left = [path.name for folder in [videos] + platform_folders for path in folder.iterdir() if ".tmp" in path.name]
+        outputs = [path for job in queue.jobs if job["stage"] == "transcode" and results[job["id"]]
+                   for path in results[job["id"]]["outputs"]]
+        missing = [path for path in outputs if not os.path.isfile(path)]
+        tombstones = [path.name for path in queue.leases_dir.glob("*.expired-*")]
+
+    print(f"\n{len(queue.jobs)} jobs for {len(frequencies)} frequencies on {args.workers} workers "
+          f"(lease TTL {args.lease_ttl:g}s); killed "
+          + ", ".join(f"{worker} during {job} after {killed:.1f}s" for worker, (job, killed) in victims.items()) + ":")
+    for job_name, result in results.items():
+        print(f"  {job_name:<18} " + (f"{result['worker']}, attempt {result['attempt']}, {result['seconds']:.1f}s"
+                                      if result else "not done"))
+    print(f"  all jobs finished in {seconds:.1f}s: {dict(summary)}")
+    assert set(victims) == {"worker0", "worker1"}, f"workers exited before they could be killed: {victims}"
+    assert summary == {"done": len(queue.jobs)}, summary
+    for job, _ in victims.values():
+        assert results[job]["worker"] not in victims and results[job]["attempt"] == 2, results[job]
+    assert len(tombstones) == len(victims), tombstones
+    assert not left, f"partial files left behind: {left}"
+    assert len(outputs) == len(process_videos.platforms) * len(frequencies) and not missing, \
+        f"missing platform videos: {missing}"
+    print("  the killed workers' render and transcode jobs were reclaimed once their leases expired and rerun; "
+          "no partial files left, every platform video written")
+
+
+def bench_preview(args):
+    from contact_sheet import make_contact_sheet
+    from frequency_video_generator import FrequencyVideoGenerator, preview_options
+
+    frequencies = [432 + 37 * index for index in range(args.frequencies)]
+    with tempfile.TemporaryDirectory() as tmp:
+        options = dict(audio_source="synth", progress=False, frame_cache_mb=0)
+        full = FrequencyVideoGenerator(output_folder=os.path.join(tmp, "full"), video_duration=args.full_duration, **options)
+        full_wall, full_cpu = time_with_cpu(lambda: full.process_frequency(frequencies[0]))
+        # The full render scales linearly with duration
+        full_cpu *= 300 / args.full_duration
+
+        preview = FrequencyVideoGenerator(output_folder=os.path.join(tmp, "preview"), **options, **preview_options())
+        results = {}
+        preview_wall, preview_cpu = time_with_cpu(
+            lambda: results.update({frequency: preview.process_frequency(frequency) for frequency in frequencies}))
+        sheet_path = os.path.join(tmp, "contact_sheet.jpg")
+        sheet_wall, _ = time_with_cpu(lambda: make_contact_sheet(
+            [(f"{frequency} Hz", results[frequency]["image_with_text"]) for frequency in frequencies], sheet_path))
+        sheet_size = Image.open(sheet_path).size
+
+        # The preview layout is the full layout scaled down
+        small = Image.open(results[frequencies[0]]["image_with_text"])
+        large = full.image_with_text(frequencies[0]).resize(small.size, Image.LANCZOS)
+        diff = np.abs(np.asarray(small, dtype=np.int16) - np.asarray(large, dtype=np.int16))
+
+    per_frequency = preview_cpu / len(frequencies)
+    print(f"\nPer frequency, {full.image_size[0]}x{full.image_size[1]} 300s vs "
+          f"{preview.image_size[0]}x{preview.image_size[1]} {preview.video_duration}s preview:")
+    print(f"  full:    {full_cpu:8.1f}s CPU (extrapolated from {args.full_duration:.0f}s)")
+    print(f"  preview: {per_frequency:8.2f}s CPU ({full_cpu / per_frequency:.0f}x cheaper)")
+    print(f"  contact sheet of {len(frequencies)} previews: {sheet_size[0]}x{sheet_size[1]} in {sheet_wall:.2f}s")
+    print(f"  preview vs downscaled full frame: mean pixel difference {diff.mean():.2f}")
+
+
+def bench_aspects(args):
+    from frequency_video_generator import FrequencyVideoGenerator, aspect_size
+
+    frequency = 432
+    options = dict(video_duration=args.duration, audio_source="synth", writer="pipe", progress=False)
+    sizes = [args.size] + [aspect_size(aspect, min(args.size)) for aspect in args.aspects]
+    separate, frames = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            generator = FrequencyVideoGenerator(output_folder=os.path.join(tmp, f"{size[0]}x{size[1]}"),
+                                                image_size=size, **options)
+            separate[size] = time_with_cpu(lambda: generator.create_video(frequency))[1]
+            frames[size] = read_frame(generator.videos_dir / f"{frequency}Hz_video.mp4", args.duration / 4, size)
+
+        generator = FrequencyVideoGenerator(output_folder=os.path.join(tmp, "aspects"), image_size=args.size,
+                                            aspects=tuple(args.aspects), **options)
+        combined = time_with_cpu(lambda: generator.create_video(frequency))[1]
+        paths = [generator.videos_dir / f"{frequency}Hz_video.mp4"] + \
+                [generator.aspect_video_path(frequency, aspect) for aspect in args.aspects]
+        diffs = [np.abs(read_frame(path, args.duration / 4, size).astype(np.int16) - frames[size]).mean()
+                 for path, size in zip(paths, sizes)]
+
+    print(f"\n{args.duration:.0f}s videos of {frequency} Hz, one render per geometry vs one pass for all:")
+    for size, diff in zip(sizes, diffs):
+        print(f"  {size[0]}x{size[1]}: separate {separate[size]:6.1f}s CPU; "
+              f"frame differs from the separate render by {diff:.2f} on average")
+    total = sum(separate.values())
+    print(f"  separate total {total:.1f}s CPU, one pass {combined:.1f}s CPU ({total / combined:.2f}x); "
+          f"each extra geometry costs {(combined - separate[sizes[0]]) / (len(sizes) - 1):.1f}s "
+          f"instead of {(total - separate[sizes[0]]) / (len(sizes) - 1):.1f}s")
+
+
+def read_frame(path, t: float, size: tuple) -> np.ndarray:
+    from ffmpeg_tools import read_ffmpeg
+
+    data = read_ffmpeg(["-ss", t, "-i", path, "-frames:v", 1, "-f", "rawvideo", "-pix_fmt", "rgb24", "-"])
+    return np.frombuffer(data, dtype=np.uint8).reshape(size[1], size[0], 3)
+
+
+def bench_upload(args):
+    from drive_uploader import ResumableUploader
+    from fake_drive import FakeDriveServer
+
+    with tempfile.TemporaryDirectory() as tmp, FakeDriveServer() as drive:
+        paths = []
+        for index in range(args.files):
+            path = os.path.join(tmp, f"{index}Hz_video.mp4")
+            with open(path, "wb") as f:
+                f.write(os.urandom(int(args.size_mb * 1024 * 1024)))
+            paths.append(path)
+
+        drive.inject_failures(args.failures)
+        uploader = ResumableUploader(
+            upload_url=drive.upload_url,
+            chunk_size=args.chunk_kb * 1024,
+            max_workers=args.jobs,
+            backoff_base=0.01
+        )
+        start = time.perf_counter()
+        records = uploader.upload_files(paths, parents=["benchmark"])
+        seconds = time.perf_counter() - start
+
+        corrupt = [record["path"] for record in records
+                   if record["error"] is None and drive.content(os.path.basename(record["path"])) != open(record["path"], "rb").read()]
+        failed = [record["path"] for record in records if record["error"] is not None]
+        retries = sum(record["file"]["retries"] for record in records if record["file"])
+        total_bytes = sum(record["bytes"] for record in records)
+
+    print(f"\nUploaded {args.files} x {args.size_mb} MB to a local fake Drive with {args.jobs} workers:")
+    print(f"  {seconds:.2f}s, {total_bytes / seconds / 1e6:.1f} MB/s")
+    print(f"  {drive.failures_served} injected failures, {retries} retries, "
+          f"{len(failed)} failed uploads, {len(corrupt)} corrupt uploads")
+    assert not failed and not corrupt, (failed, corrupt)
+    # Every injected failure was recovered from by resuming the upload
+    assert retries >= drive.failures_served, (retries, drive.failures_served)
+
+
+def bench_openai(args):
+    import asyncio
+    from fake_openai import FakeOpenAIServer
+    from openai_batch import OpenAIBatchClient, ResponseCache
+
+    frequencies = [174 + 10 * index for index in range(args.frequencies)]
+
+    async def generate(base_url, concurrency, cache):
+        async with OpenAIBatchClient("benchmark-key", base_url=base_url, concurrency=concurrency,
+                                     requests_per_minute=args.rpm, cache=cache, backoff_base=0.05) as client:
+            async def assets(frequency):
+                description = await client.chat("gpt-4", [{"role": "user", "content": f"{frequency} Hz"}])
+                return description, await client.image(f"{frequency} Hz. {description}")
+
+            await asyncio.gather(*(assets(frequency) for frequency in frequencies))
+            return dict(client.stats)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenAIServer(latency=args.latency) as openai_stub:
+        openai_stub.inject_failures(args.failures)
+        runs = [("sequential", 1, None), ("concurrent", args.concurrency, ResponseCache(tmp)),
+                ("cached", args.concurrency, ResponseCache(tmp))]
+        for name, concurrency, cache in runs:
+            start = time.perf_counter()
+            stats = asyncio.run(generate(openai_stub.base_url, concurrency, cache))
+            results[name] = (time.perf_counter() - start, stats)
+
+    print(f"\nDescriptions and images for {args.frequencies} frequencies from a local OpenAI stub "
+          f"({args.latency:.2f}s latency, {args.rpm:.0f} requests/min):")
+    for name, (seconds, stats) in results.items():
+        print(f"  {name:>10}: {seconds:6.2f}s, {stats['api_requests']} API requests, "
+              f"{stats['cache_hits']} cache hits, {stats['retries']} retries")
+    print(f"  peak concurrent requests at the stub: {openai_stub.peak_in_flight}, "
+          f"speedup: {results['sequential'][0] / results['concurrent'][0]:.1f}x "
+          f"(the old loop also slept 5s per frequency)")
+
+
+# Stages of the suite, in pipeline order
+SUITE_STAGES = ("synth", "image", "overlay_with_text", "overlay_transparent", "video", "compress")
+
+# Allowed growth over the baseline before a metric counts as a regression
+SUITE_THRESHOLDS = {"wall": 0.25, "cpu": 0.25, "peak_rss_mb": 0.20, "ffmpeg_peak_rss_mb": 0.20, "output_bytes": 0.10}
+
+# Metric changes smaller than these are noise, whatever the ratio
+SUITE_NOISE = {"wall": 0.05, "cpu": 0.05, "peak_rss_mb": 5, "ffmpeg_peak_rss_mb": 5, "output_bytes": 1024}
+
+SUITE_FREQUENCY = 432
+
+
+def _peak_rss_mb(who) -> float:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def suite_inputs(args, tmp: str):
+    """
+    Write the synthetic files the stages read: the tone's MP3 and a source video for compress.
+    """
+    from ffmpeg_tools import run_ffmpeg
+
+    os.makedirs(os.path.join(tmp, "audio"))
+    run_ffmpeg(["-y", "-f", "lavfi", "-i", f"sine=frequency={SUITE_FREQUENCY}:sample_rate=44100",
+                "-t", args.video_duration, os.path.join(tmp, "audio", f"{SUITE_FREQUENCY}Hz.mp3")])
+    make_test_video(os.path.join(tmp, "source.mp4"), args.size, args.video_duration)
+
+
+def suite_stage(name: str, args, tmp: str):
+    """
+    Prepare one stage in a fresh process. Returns (run, output paths); the in-memory
+    inputs a stage depends on are computed here, outside the measurement.
+    """
+    frequency = SUITE_FREQUENCY
+    output_folder = os.path.join(tmp, f"out_{name}")
+    if name == "synth":
+        import soundfile as sf
+        import generate_frequencies
+
+        wav_path, mp3_path = os.path.join(tmp, "synth.wav"), os.path.join(tmp, "synth.mp3")
+        sample_rate = generate_frequencies.sample_rate
+
+        def synth():
+            sf.write(wav_path, generate_frequencies.generate_sine_wave(frequency, args.audio_duration, sample_rate),
+                     sample_rate)
+            generate_frequencies.convert_wav_to_mp3(wav_path, mp3_path, sample_rate)
+        return synth, [mp3_path]
+    if name == "compress":
+        import process_videos
+
+        output_path = os.path.join(tmp, "compressed.mp4")
+        return lambda: process_videos.compress_video(os.path.join(tmp, "source.mp4"), output_path), [output_path]
+
+    from frequency_video_generator import FrequencyVideoGenerator
+
+    generator = FrequencyVideoGenerator(audio_folder=os.path.join(tmp, "audio"), output_folder=output_folder,
+                                        image_size=args.size,
+                                        video_duration=args.video_duration, progress=False)
+    if name == "image":
+        return lambda: generator.generate_image(frequency), [generator.images_dir / f"{frequency}Hz_base_image.jpg"]
+    generator.base_image(frequency)
+    generator.describe(frequency)
+    if name == "overlay_with_text":
+        return lambda: generator.create_text_overlay(frequency), [generator.images_dir / f"{frequency}Hz_with_text.jpg"]
+    if name == "overlay_transparent":
+        return (lambda: generator.create_transparent_text_overlay(frequency),
+                [generator.images_dir / f"{frequency}Hz_text_overlay.png"])
+    generator.text_layer(frequency)
+    audio_path = generator.find_audio(frequency)
+    return lambda: generator.create_video(frequency, audio_path), [generator.videos_dir / f"{frequency}Hz_video.mp4"]
+
+
+def _measure_stage(name: str, args, tmp: str, results):
+    # Runs in a child process, so peak RSS and child CPU cover this stage alone
+    try:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        run, outputs = suite_stage(name, args, tmp)
+        before = os.times()
+        start = time.perf_counter()
+        run()
+        wall = time.perf_counter() - start
+        after = os.times()
+        results.put({
+            "wall": round(wall, 4),
+            "cpu": round(sum(after[:4]) - sum(before[:4]), 4),
+            "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+            "ffmpeg_peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+            "output_bytes": sum(os.path.getsize(path) for path in outputs),
+        })
+    except BaseException as e:
+        results.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def measure_stage(name: str, args, tmp: str) -> dict:
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure_stage, args=(name, args, tmp, results))
+    process.start()
+    result = results.get()
+    process.join()
+    if "error" in result:
+        raise RuntimeError(f"stage {name} failed: {result['error']}")
+    return result
+
+
+def run_suite(args) -> dict:
+    """
+    Measure every selected stage args.repeat times and keep the run with the median wall time.
+    """
+    stages = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        suite_inputs(args, tmp)
+        for name in args.stages:
+            runs = sorted((measure_stage(name, args, tmp) for _ in range(args.repeat)), key=lambda run: run["wall"])
+            stages[name] = runs[len(runs) // 2]
+            print(f"  {name:<20} {stages[name]['wall']:8.3f}s wall {stages[name]['cpu']:8.3f}s CPU "
+                  f"{stages[name]['peak_rss_mb'] or 0:8.1f} MB peak {stages[name]['output_bytes']:>11,} bytes")
+    return {
+        "config": {"size": list(args.size), "video_duration": args.video_duration,
+                   "audio_duration": args.audio_duration},
+        "repeat": args.repeat,
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpu_count": os.cpu_count()},
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": stages,
+    }
+
+
+def compare_to_baseline(results: dict, baseline: dict, thresholds: dict) -> list:
+    """
+    Print each metric against the baseline and return the regressions: metrics that
+    grew by more than their threshold and by more than the noise floor.
+    """
+    if results["config"] != baseline["config"]:
+        raise ValueError(f"Baseline was recorded with {baseline['config']}, not {results['config']}")
+    if results["machine"] != baseline["machine"]:
+        print(f"- Baseline is from another machine ({baseline['machine']}); timings may not be comparable")
+
+    regressions = []
+    print("\nAgainst the baseline:")
+    for name, metrics in results["stages"].items():
+        reference = baseline["stages"].get(name)
+        if reference is None:
+            print(f"  {name:<20} not in the baseline")
+            continue
+        changes = []
+        for metric, threshold in thresholds.items():
+            value, base = metrics.get(metric), reference.get(metric)
+            if value is None or base is None:
+                continue
+            change = (value - base) / base if base else 0.0
+            flag = change > threshold and value - base > SUITE_NOISE[metric]
+            changes.append(f"{metric} {change:+.0%}" + (" REGRESSED" if flag else ""))
+            if flag:
+                regressions.append(f"{name} {metric}: {base} -> {value} ({change:+.0%}, threshold {threshold:.0%})")
+        print(f"  {name:<20} " + ", ".join(changes))
+    return regressions
+
+
+def bench_suite(args):
+    print(f"\nStage suite at {args.size[0]}x{args.size[1]}, {args.video_duration:g}s video, "
+          f"{args.audio_duration:g}s audio, median of {args.repeat}:")
+    results = run_suite(args)
+    Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"+ Results written to {args.output}")
+
+    if args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"+ Baseline saved to {args.baseline}")
+        return
+    if not Path(args.baseline).exists():
+        print(f"- No baseline at {args.baseline}; rerun with --save-baseline to record one")
+        return
+
+    thresholds = dict(SUITE_THRESHOLDS)
+    if args.threshold is not None:
+        thresholds.update(wall=args.threshold, cpu=args.threshold)
+    regressions = compare_to_baseline(results, json.loads(Path(args.baseline).read_text(encoding="utf-8")), thresholds)
+    if regressions:
+        print(f"\n- {len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("+ No regressions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FreqCreator stage benchmarks")
+    subparsers = parser.add_subparsers(dest="stage", required=True)
+
+    render = subparsers.add_parser("render", help="Compare background renderers")
+    render.add_argument("--size", type=parse_size, default=(1080, 1920))
+    render.add_argument("--repeat", type=int, default=5)
+    render.add_argument("--frequency", type=float, default=432)
+    render.set_defaults(func=bench_render)
+
+    text = subparsers.add_parser("text", help="Compare text overlay renderers")
+    text.add_argument("--size", type=parse_size, default=(1080, 1920))
+    text.add_argument("--repeat", type=int, default=5)
+    text.set_defaults(func=bench_text)
+
+    pulse = subparsers.add_parser("pulse", help="Compare cached and uncached pulse frames")
+    pulse.add_argument("--size", type=parse_size, default=(1080, 1920))
+    pulse.add_argument("--duration", type=float, default=20)
+    pulse.add_argument("--fps", type=int, default=30)
+    pulse.add_argument("--frequency", type=float, default=432)
+    pulse.add_argument("--cache-mb", type=int, default=1024)
+    pulse.add_argument("--policy", default="lru")
+    pulse.set_defaults(func=bench_pulse)
+
+    composite = subparsers.add_parser("composite", help="Compare CompositeVideoClip with the integer compositor")
+    composite.add_argument("--size", type=parse_size, default=(1080, 1920))
+    composite.add_argument("--frames", type=int, default=90)
+    composite.add_argument("--fps", type=int, default=30)
+    composite.add_argument("--frequency", type=float, default=432)
+    composite.set_defaults(func=bench_composite)
+
+    writer = subparsers.add_parser("writer", help="Compare write_videofile with the ffmpeg pipe writer")
+    writer.add_argument("--size", type=parse_size, default=(1080, 1920))
+    writer.add_argument("--duration", type=float, default=300)
+    writer.add_argument("--frequency", type=float, default=432)
+    writer.set_defaults(func=bench_writer)
+
+    audio = subparsers.add_parser("audio", help="Compare muxing audio from the MP3 with synthesizing it")
+    audio.add_argument("--duration", type=float, default=300)
+    audio.add_argument("--frequencies", type=lambda value: [float(f) for f in value.split(",")],
+                       default=[7.83, 432, 1222])
+    audio.add_argument("--writer", default="pipe")
+    audio.add_argument("--size", type=parse_size, default=(270, 480))
+    audio.add_argument("--video-duration", type=float, default=10)
+    audio.set_defaults(func=bench_audio)
+
+    formats = subparsers.add_parser("formats", help="Audio encode CPU with and without the stream-copied M4A")
+    formats.add_argument("--duration", type=float, default=300)
+    formats.add_argument("--frequencies", type=lambda value: [float(f) for f in value.split(",")],
+                         default=[7.83, 432, 1222])
+    formats.set_defaults(func=bench_formats)
+
+    period = subparsers.add_parser("period", help="Compare full MP3 encodes with repeated loop blocks")
+    period.add_argument("--duration", type=float, default=300)
+    period.add_argument("--frequencies", type=lambda value: [float(f) for f in value.split(",")],
+                        default=[432, 528, 100, 136.1])
+    period.set_defaults(func=bench_period)
+
+    transcode = subparsers.add_parser("transcode", help="Compare legacy and fan-out platform transcodes")
+    transcode.add_argument("--size", type=parse_size, default=(360, 640))
+    transcode.add_argument("--duration", type=float, default=120)
+    transcode.set_defaults(func=bench_transcode)
+
+    pipeline = subparsers.add_parser("pipeline", help="Check each process_frequency stage runs once")
+    pipeline.add_argument("--size", type=parse_size, default=(270, 480))
+    pipeline.add_argument("--duration", type=float, default=2)
+    pipeline.add_argument("--frequencies", type=int, default=2)
+    pipeline.set_defaults(func=bench_pipeline)
+
+    tracing = subparsers.add_parser("tracing", help="Span overhead and the trace and metrics of a small batch")
+    tracing.add_argument("--size", type=parse_size, default=(270, 480))
+    tracing.add_argument("--duration", type=float, default=2)
+    tracing.add_argument("--frequencies", type=int, default=2)
+    tracing.add_argument("--spans", type=int, default=100000)
+    tracing.set_defaults(func=bench_tracing)
+
+    resume = subparsers.add_parser("resume", help="Kill a batch mid-render and resume it from the job manifest")
+    resume.add_argument("--size", type=parse_size, default=(270, 480))
+    resume.add_argument("--duration", type=float, default=20)
+    resume.add_argument("--frequencies", type=int, default=3)
+    resume.set_defaults(func=bench_resume)
+
+    queue = subparsers.add_parser("queue", help="Kill one of several queue workers mid-job and check it is reclaimed")
+    queue.add_argument("--size", type=parse_size, default=(270, 480))
+    queue.add_argument("--duration", type=float, default=10)
+    queue.add_argument("--frequencies", type=int, default=3)
+    queue.add_argument("--workers", type=int, default=3, help="At least 3: two are killed")
+    queue.add_argument("--lease-ttl", type=float, default=5)
+    queue.set_defaults(func=bench_queue)
+
+    preview = subparsers.add_parser("preview", help="Compare full renders with previews and build a contact sheet")
+    preview.add_argument("--full-duration", type=float, default=30)
+    preview.add_argument("--frequencies", type=int, default=12)
+    preview.set_defaults(func=bench_preview)
+
+    aspects = subparsers.add_parser("aspects", help="Compare one render per geometry with one multi-aspect pass")
+    aspects.add_argument("--size", type=parse_size, default=(540, 960))
+    aspects.add_argument("--duration", type=float, default=10)
+    aspects.add_argument("--aspects", type=lambda value: value.split(","), default=["1:1", "16:9"])
+    aspects.set_defaults(func=bench_aspects)
+
+    upload = subparsers.add_parser("upload", help="Resumable uploads against a local fake Drive")
+    upload.add_argument("--files", type=int, default=8)
+    upload.add_argument("--size-mb", type=float, default=16)
+    upload.add_argument("--chunk-kb", type=int, default=1024)
+    upload.add_argument("--jobs", type=int, default=4)
+    upload.add_argument("--failures", type=int, default=6)
+    upload.set_defaults(func=bench_upload)
+
+    openai = subparsers.add_parser("openai", help="Batched OpenAI requests against a local stub server")
+    openai.add_argument("--frequencies", type=int, default=12)
+    openai.add_argument("--latency", type=float, default=0.5)
+    openai.add_argument("--concurrency", type=int, default=4)
+    openai.add_argument("--rpm", type=float, default=600)
+    openai.add_argument("--failures", type=int, default=3)
+    openai.set_defaults(func=bench_openai)
+
+    suite = subparsers.add_parser("suite", help="Measure every stage and compare against a stored baseline")
+    suite.add_argument("--size", type=parse_size, default=(540, 960))
+    suite.add_argument("--video-duration", type=float, default=10)
+    suite.add_argument("--audio-duration", type=float, default=60)
+    suite.add_argument("--repeat", type=int, default=3)
+    suite.add_argument("--stages", type=lambda value: value.split(","), default=list(SUITE_STAGES),
+                       help=f"Comma-separated subset of {','.join(SUITE_STAGES)}")
+    suite.add_argument("--output", default="benchmark_results.json")
+    suite.add_argument("--baseline", default="benchmark_baseline.json")
+    suite.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    suite.add_argument("--threshold", type=float, default=None,
+                       help=f"Allowed wall and CPU time growth (default {SUITE_THRESHOLDS['wall']:.0%}%)")
+    suite.set_defaults(func=bench_suite)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
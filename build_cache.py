@@ -0,0 +1,238 @@
+"""
+Content-addressed cache for generated pipeline artifacts.
+
+Every artifact is keyed on a hash of the inputs that determine its content
+(frequency, duration, sample rate, bitrate, image size, font file, renderer
+version, ...). A cached artifact is hard-linked back into place instead of
+being rebuilt, so duplicate frequencies and unchanged outputs cost no work.
+
+Usage:
+    python build_cache.py stats [--cache-dir .build_cache]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import socket
+from collections import defaultdict
+from pathlib import Path
+
+CACHE_DIR = ".build_cache"
+
+_file_digests = {}
+
+
+def file_digest(path) -> str:
+    """
+    Return the SHA-256 of a file's content, memoized on (path, size, mtime).
+    """
+    path = Path(path)
+    stat = path.stat()
+    memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_digests:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _file_digests[memo_key] = digest.hexdigest()
+    return _file_digests[memo_key]
+
+
+def temp_owner() -> str:
+    """
+    host-pid of this process, unique among the workers sharing an output tree.
+    """
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def temp_path_for(output_path) -> Path:
+    """
+    A hidden temporary name next to output_path. It keeps the extension for writers
+    that infer the file format from it.
+    """
+    output_path = Path(output_path)
+    return output_path.with_name(f".{output_path.stem}.{temp_owner()}.tmp{output_path.suffix}")
+
+
+def atomic_write(output_path, writer):
+    """
+    Call writer(temp_path) and rename the result into place, so output_path only ever
+    holds a complete file. The temporary file is removed if writer fails.
+    """
+    temp_path = temp_path_for(output_path)
+    try:
+        writer(temp_path)
+        os.replace(temp_path, output_path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+def atomic_write_all(output_paths: list, writer):
+    """
+    atomic_write for several files written by one writer(temp_paths) call. Every file
+    is renamed into place only once the writer has completed all of them.
+    """
+    temp_paths = [temp_path_for(output_path) for output_path in output_paths]
+    try:
+        writer(temp_paths)
+        for temp_path, output_path in zip(temp_paths, output_paths):
+            os.replace(temp_path, output_path)
+    finally:
+        for temp_path in temp_paths:
+            if temp_path.exists():
+                temp_path.unlink()
+
+
+def remove_temp_files(directory, owner: str = "*") -> int:
+    """
+    Delete temporary files left in directory by writes that were interrupted, or only
+    those of one temp_owner(). Returns the number of files removed.
+    """
+    stale = [path for path in Path(directory).glob(f".*.{owner}.tmp*") if path.is_file()]
+    for path in stale:
+        path.unlink()
+    return len(stale)
+
+
+def _link_or_copy(source: Path, target: Path):
+    """
+    Hard-link source to target, falling back to a copy across filesystems.
+    The link is made under a temporary name and renamed into place.
+    """
+    temp_path = target.with_name(f".{target.name}.{temp_owner()}.tmp")
+    if temp_path.exists():
+        temp_path.unlink()
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copy2(source, temp_path)
+    os.replace(temp_path, target)
+
+
+class BuildCache:
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.stats = defaultdict(lambda: {"hits": 0, "misses": 0, "bytes_saved": 0})
+
+    def key(self, kind: str, **inputs) -> str:
+        """
+        Hash the artifact kind and its inputs into a cache key.
+        """
+        payload = json.dumps({"kind": kind, **inputs}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _object_path(self, key: str) -> Path:
+        return self.objects_dir / key[:2] / key
+
+    def contains(self, kind: str, inputs: dict) -> bool:
+        """
+        True if an artifact with these inputs is cached, without placing it anywhere.
+        """
+        return self._object_path(self.key(kind, **inputs)).exists()
+
+    def fetch(self, kind: str, key: str, output_path) -> bool:
+        """
+        Place the cached artifact for key at output_path. Returns False on a miss.
+        """
+        output_path = Path(output_path)
+        object_path = self._object_path(key)
+        if not object_path.exists():
+            self.stats[kind]["misses"] += 1
+            return False
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        if not (output_path.exists() and os.path.samefile(object_path, output_path)):
+            _link_or_copy(object_path, output_path)
+
+        self.stats[kind]["hits"] += 1
+        self.stats[kind]["bytes_saved"] += object_path.stat().st_size
+        return True
+
+    def store(self, key: str, output_path):
+        """
+        Record a freshly built artifact under key.
+        """
+        object_path = self._object_path(key)
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        _link_or_copy(Path(output_path), object_path)
+
+    def build(self, kind: str, output_path, inputs: dict, builder) -> str:
+        """
+        Return output_path, running builder() only if no artifact with these inputs is cached.
+        builder must write the artifact to output_path.
+        """
+        key = self.key(kind, **inputs)
+        if self.fetch(kind, key, output_path):
+            return str(output_path)
+
+        # Never write through a hard link into the object store
+        if os.path.lexists(output_path):
+            os.remove(output_path)
+
+        builder()
+        self.store(key, output_path)
+        return str(output_path)
+
+    def build_all(self, artifacts: dict, builder) -> dict:
+        """
+        build() for several artifacts written by one builder call. artifacts maps
+        kind -> (output_path, inputs); builder(kinds) must write the artifacts of the
+        given kinds and is only called with the ones that are not cached.
+        Returns kind -> output_path.
+        """
+        keys = {kind: self.key(kind, **inputs) for kind, (_, inputs) in artifacts.items()}
+        missing = [kind for kind, (output_path, _) in artifacts.items()
+                   if not self.fetch(kind, keys[kind], output_path)]
+        if missing:
+            for kind in missing:
+                output_path = artifacts[kind][0]
+                if os.path.lexists(output_path):
+                    os.remove(output_path)
+            builder(missing)
+            for kind in missing:
+                self.store(keys[kind], artifacts[kind][0])
+        return {kind: str(output_path) for kind, (output_path, _) in artifacts.items()}
+
+    def merge_stats(self, stats: dict):
+        """
+        Add counters collected by another BuildCache, e.g. one in a worker process.
+        """
+        for kind, entry in stats.items():
+            for name, value in entry.items():
+                self.stats[kind][name] += value
+
+    def report(self) -> str:
+        lines = ["Cache stats:"]
+        totals = {"hits": 0, "misses": 0, "bytes_saved": 0}
+        for kind in sorted(self.stats):
+            entry = self.stats[kind]
+            lines.append(
+                f"  {kind:>14}: {entry['hits']} hits, {entry['misses']} misses, "
+                f"{entry['bytes_saved'] / 1e6:.1f} MB saved"
+            )
+            for name in totals:
+                totals[name] += entry[name]
+        lines.append(
+            f"  {'total':>14}: {totals['hits']} hits, {totals['misses']} misses, "
+            f"{totals['bytes_saved'] / 1e6:.1f} MB saved"
+        )
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the artifact cache")
+    parser.add_argument("command", choices=["stats"])
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    objects = [p for p in Path(args.cache_dir, "objects").glob("*/*") if p.is_file()]
+    total_bytes = sum(p.stat().st_size for p in objects)
+    print(f"{args.cache_dir}: {len(objects)} cached artifacts, {total_bytes / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
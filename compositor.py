@@ -0,0 +1,76 @@
+"""
+Blends a static RGBA overlay over video frames with integer NumPy math.
+
+CompositeVideoClip rebuilds the overlay's float mask and alpha-blends whole float
+frames for every output frame. OverlayCompositor converts the overlay once into a
+premultiplied color plane and an inverse alpha plane, blends only the rows the overlay
+covers, and writes every frame into the same preallocated buffers. Like
+CompositeVideoClip it truncates the blend to uint8; the two differ by one level only
+where MoviePy's float blend lands just below an exact integer.
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+
+def _spans(rows: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Group the indices of the true entries of a boolean array into [start, stop) runs.
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], rows.astype(np.int8), [0]))))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+class OverlayCompositor:
+    def __init__(self, overlay: np.ndarray):
+        """
+        overlay is a straight-alpha (height, width, 4) uint8 array; it sets the output size.
+        """
+        self.height, self.width = overlay.shape[:2]
+        alpha = overlay[..., 3:].astype(np.uint16)
+
+        # Premultiplied color, kept at 255x scale so the final division rounds exactly once
+        self.premultiplied = overlay[..., :3] * alpha
+        self.inverse_alpha = np.broadcast_to(255 - alpha, self.premultiplied.shape).copy()
+
+        self.spans = _spans(overlay[..., 3].any(axis=1))
+        self.frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self._blend = {span: np.empty((span[1] - span[0], self.width, 3), dtype=np.uint16) for span in self.spans}
+        self._carry = {span: np.empty_like(buffer) for span, buffer in self._blend.items()}
+
+    def composite(self, background: np.ndarray) -> np.ndarray:
+        """
+        Blend the overlay over a background frame anchored at the top-left corner,
+        cropping a larger background and padding a smaller one with black.
+        The returned frame is reused by the next call.
+        """
+        frame = self.frame
+        height = min(self.height, background.shape[0])
+        width = min(self.width, background.shape[1])
+        if height < self.height or width < self.width:
+            frame.fill(0)
+        frame[:height, :width] = background[:height, :width]
+
+        for span in self.spans:
+            start, stop = span
+            rows = frame[start:stop]
+            blend, carry = self._blend[span], self._carry[span]
+
+            # floor((a * c + (255 - a) * b) / 255) with x / 255 computed as (x + 1 + (x >> 8)) >> 8
+            np.multiply(rows, self.inverse_alpha[start:stop], out=blend)
+            np.add(blend, self.premultiplied[start:stop], out=blend)
+            np.right_shift(blend, 8, out=carry)
+            np.add(blend, carry, out=blend)
+            np.add(blend, 1, out=blend)
+            np.right_shift(blend, 8, out=blend)
+            np.copyto(rows, blend, casting="unsafe")
+        return frame
+
+    def clip(self, background_clip):
+        """
+        Wrap a background clip in a MoviePy clip whose frames have the overlay composited on top.
+        """
+        from moviepy.editor import VideoClip
+
+        return VideoClip(lambda t: self.composite(background_clip.get_frame(t)),
+                         duration=background_clip.duration)
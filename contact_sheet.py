@@ -0,0 +1,83 @@
+"""
+Contact sheets: a whole batch of rendered images on one grid, each tile labelled with
+its frequency, so a new visual style can be reviewed at a glance instead of opening
+every image or video.
+
+Usage:
+    python contact_sheet.py output_videos/preview/contact_sheet.jpg output_videos/preview/images/*_with_text.jpg
+"""
+import argparse
+import math
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+from build_cache import atomic_write
+from text_layout import DEFAULT_FONT_PATH, load_font
+
+TILE_WIDTH = 216
+TILE_GAP = 8
+LABEL_HEIGHT = 24
+BACKGROUND = (24, 24, 24)
+
+
+def make_contact_sheet(tiles: List[Tuple[str, str]], output_path, columns: Optional[int] = None,
+                       tile_width: int = TILE_WIDTH, font_path: str = DEFAULT_FONT_PATH) -> str:
+    """
+    Write a grid of (label, image path) tiles to output_path. Every tile is scaled to
+    tile_width with the first image's aspect ratio; columns defaults to a roughly
+    square sheet.
+    """
+    if not tiles:
+        raise ValueError("No images for the contact sheet")
+    with Image.open(tiles[0][1]) as first:
+        tile_height = round(tile_width * first.height / first.width)
+    if columns is None:
+        columns = math.ceil(math.sqrt(len(tiles) * (tile_height + LABEL_HEIGHT) / tile_width))
+    columns = max(1, min(columns, len(tiles)))
+    rows = math.ceil(len(tiles) / columns)
+
+    cell_width, cell_height = tile_width + TILE_GAP, tile_height + LABEL_HEIGHT + TILE_GAP
+    sheet = Image.new("RGB", (columns * cell_width + TILE_GAP, rows * cell_height + TILE_GAP), BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+    font = load_font(font_path, LABEL_HEIGHT * 3 // 4)
+    for index, (label, path) in enumerate(tiles):
+        x = TILE_GAP + index % columns * cell_width
+        y = TILE_GAP + index // columns * cell_height
+        with Image.open(path) as image:
+            image.draft("RGB", (tile_width, tile_height))  # JPEGs decode at a reduced scale
+            sheet.paste(image.convert("RGB").resize((tile_width, tile_height), Image.BILINEAR), (x, y))
+        bbox = draw.textbbox((0, 0), label, font=font)
+        draw.text((x + (tile_width - (bbox[2] - bbox[0])) // 2, y + tile_height + 2), label,
+                  font=font, fill=(230, 230, 230))
+
+    atomic_write(Path(output_path), lambda path: sheet.save(path, quality=90))
+    return str(output_path)
+
+
+def frequency_of(path) -> Optional[str]:
+    """
+    "432" for output files named like 432Hz_with_text.jpg, None for other names.
+    """
+    match = re.match(r"(\d+(?:\.\d+)?)Hz", Path(path).name)
+    return match.group(1) if match else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Combine rendered images into one contact sheet")
+    parser.add_argument("output", help="Contact sheet image to write")
+    parser.add_argument("images", nargs="+", help="Images to include, e.g. output_videos/images/*_with_text.jpg")
+    parser.add_argument("--columns", type=int, default=None)
+    parser.add_argument("--tile-width", type=int, default=TILE_WIDTH)
+    args = parser.parse_args()
+
+    tiles = [(f"{frequency_of(path)} Hz" if frequency_of(path) else Path(path).stem, path) for path in args.images]
+    tiles.sort(key=lambda tile: float(frequency_of(tile[1]) or math.inf))
+    output = make_contact_sheet(tiles, args.output, columns=args.columns, tile_width=args.tile_width)
+    print(f"+ Contact sheet of {len(tiles)} images: {output}")
+
+
+if __name__ == "__main__":
+    main()
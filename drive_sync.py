@@ -0,0 +1,184 @@
+"""
+Checksum-based upload deduplication for Google Drive.
+
+A local manifest records the MD5 and size of every uploaded artifact together with
+its Drive file id. Before a sync it is reconciled against the destination folder's
+remote listing, fetched with one paginated files.list call. Files whose content is
+already on Drive are skipped, changed files update their existing Drive file, and
+identical files within a batch are uploaded once.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+MANIFEST_FILE = ".upload_manifest.json"
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files"
+
+
+def md5_file(path: str) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class UploadManifest:
+    def __init__(self, path: str = MANIFEST_FILE):
+        self.path = path
+        self.uploads = {}  # local path -> {"md5", "size", "file_id", "name"}
+        self.digests = {}  # local path -> {"md5", "size", "mtime_ns"}, to avoid rehashing
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.uploads = data.get("uploads", {})
+            self.digests = data.get("digests", {})
+
+    def local_digest(self, path: str) -> Tuple[str, int]:
+        """
+        Return (md5, size) for a local file, rehashing only if its size or mtime changed.
+        """
+        stat = os.stat(path)
+        cached = self.digests.get(path)
+        if cached is None or cached["size"] != stat.st_size or cached["mtime_ns"] != stat.st_mtime_ns:
+            cached = {"md5": md5_file(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            self.digests[path] = cached
+        return cached["md5"], cached["size"]
+
+    def record_upload(self, path: str, resource: dict):
+        md5, size = self.local_digest(path)
+        self.uploads[path] = {"md5": md5, "size": size, "file_id": resource["id"], "name": resource["name"]}
+
+    def reconcile(self, remote_files: List[dict]) -> int:
+        """
+        Drop entries whose Drive file is gone or no longer has the recorded content.
+        Returns the number of entries dropped.
+        """
+        remote = {resource["id"]: resource for resource in remote_files}
+        stale = [path for path, entry in self.uploads.items()
+                 if entry["file_id"] not in remote
+                 or remote[entry["file_id"]].get("md5Checksum") != entry["md5"]]
+        for path in stale:
+            del self.uploads[path]
+        return len(stale)
+
+    def as_remote_files(self) -> List[dict]:
+        """
+        The manifest's view of Drive, for syncing without a remote listing.
+        """
+        return [{"id": entry["file_id"], "name": entry["name"], "md5Checksum": entry["md5"],
+                 "size": str(entry["size"])} for entry in self.uploads.values()]
+
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"uploads": self.uploads, "digests": self.digests}, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+
+def list_remote_files(session: requests.Session, folder_id: str, files_url: str = DRIVE_FILES_URL,
+                      page_size: int = 1000) -> List[dict]:
+    """
+    Fetch id, name, size and MD5 of every file in a Drive folder, following nextPageToken.
+    """
+    files = []
+    params = {
+        "q": f"'{folder_id}' in parents and trashed = false",
+        "fields": "nextPageToken, files(id, name, size, md5Checksum)",
+        "pageSize": page_size,
+    }
+    while True:
+        response = session.get(files_url, params=params)
+        response.raise_for_status()
+        page = response.json()
+        files.extend(page.get("files", []))
+        if "nextPageToken" not in page:
+            return files
+        params["pageToken"] = page["nextPageToken"]
+
+
+def plan_sync(paths: List[str], manifest: UploadManifest,
+              remote_files: List[dict]) -> Tuple[List[Tuple[str, Optional[str]]], List[Tuple[str, str]]]:
+    """
+    Decide what to transfer. Returns (uploads, skipped): uploads holds (path, file id
+    to update or None to create), skipped holds (path, reason).
+    """
+    by_checksum = {(resource.get("md5Checksum"), int(resource.get("size", -1))): resource
+                   for resource in remote_files}
+    by_name = {resource["name"]: resource for resource in remote_files}
+
+    uploads = []
+    skipped = []
+    batch = {}
+    for path in paths:
+        checksum = manifest.local_digest(path)
+        if checksum in by_checksum:
+            remote = by_checksum[checksum]
+            manifest.record_upload(path, remote)
+            skipped.append((path, f"already on Drive as {remote['name']}"))
+        elif checksum in batch:
+            skipped.append((path, f"same content as {batch[checksum]}"))
+        else:
+            batch[checksum] = path
+            existing = by_name.get(os.path.basename(path))
+            uploads.append((path, existing["id"] if existing else None))
+    return uploads, skipped
+
+
+def sync_files(uploader, paths: List[str], folder_id: str, manifest: UploadManifest,
+               remote_files: Optional[List[dict]] = None) -> Dict:
+    """
+    Upload only new or changed content and record the results in the manifest.
+    Without remote_files, the manifest alone stands in for the remote listing.
+    """
+    if remote_files is None:
+        remote_files = manifest.as_remote_files()
+    else:
+        dropped = manifest.reconcile(remote_files)
+        if dropped:
+            print(f"- Dropped {dropped} manifest entries no longer matching Drive")
+
+    uploads, skipped = plan_sync(paths, manifest, remote_files)
+    for path, reason in skipped:
+        print(f"= Skipped {path}: {reason}")
+
+    records = []
+    if uploads:
+        records = uploader.upload_files([path for path, _ in uploads], parents=[folder_id],
+                                        file_ids={path: file_id for path, file_id in uploads if file_id})
+
+    failed = 0
+    for record in records:
+        resource = record["file"]
+        if resource is None:
+            failed += 1
+            continue
+        md5, _ = manifest.local_digest(record["path"])
+        if resource.get("md5Checksum", md5) != md5:
+            print(f"- Checksum mismatch after uploading {record['path']}")
+            failed += 1
+            continue
+        manifest.record_upload(record["path"], resource)
+
+    # Batch duplicates point at the copy that was uploaded
+    uploaded = {manifest.local_digest(path): manifest.uploads[path] for path, _ in uploads if path in manifest.uploads}
+    for path, _ in skipped:
+        checksum = manifest.local_digest(path)
+        if path not in manifest.uploads and checksum in uploaded:
+            entry = uploaded[checksum]
+            manifest.record_upload(path, {"id": entry["file_id"], "name": entry["name"]})
+    manifest.save()
+
+    summary = {
+        "uploaded": len(uploads) - failed,
+        "failed": failed,
+        "skipped": len(skipped),
+        "bytes_uploaded": sum(record["bytes"] for record in records if record["file"]),
+        "bytes_skipped": sum(manifest.local_digest(path)[1] for path, _ in skipped),
+    }
+    print(f"Sync: {summary['uploaded']} uploaded ({summary['bytes_uploaded'] / 1e6:.1f} MB), "
+          f"{summary['skipped']} skipped ({summary['bytes_skipped'] / 1e6:.1f} MB), {summary['failed']} failed")
+    return summary
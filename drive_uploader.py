@@ -0,0 +1,247 @@
+"""
+Concurrent, resumable uploads to Google Drive.
+
+Each file is sent through a Drive resumable upload session in fixed-size chunks.
+After a failure the uploader asks the server how many bytes it has acknowledged and
+continues from there, retrying with exponential backoff. Several files upload at once
+on a bounded thread pool, with aggregate throughput and progress reporting.
+"""
+import json
+import mimetypes
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+import tracing
+
+DRIVE_UPLOAD_URL = "https://www.googleapis.com/upload/drive/v3/files"
+
+# Drive requires every chunk except the last to be a multiple of 256 KiB
+CHUNK_ALIGNMENT = 256 * 1024
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+MIMETYPES = {
+    ".mp3": "audio/mpeg",
+    ".mp4": "video/mp4",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".txt": "text/plain",
+}
+
+
+class UploadError(Exception):
+    pass
+
+
+def guess_mimetype(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in MIMETYPES:
+        return MIMETYPES[extension]
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+class UploadProgress:
+    """
+    Thread-safe byte and file counters shared by all uploads in a batch.
+    """
+    def __init__(self, total_files: int, total_bytes: int, interval: float = 2.0):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.files_done = 0
+        self.bytes_done = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+        self._lock = threading.Lock()
+
+    def advance(self, byte_count: int):
+        with self._lock:
+            self.bytes_done += byte_count
+            now = time.perf_counter()
+            if now - self._last_report >= self.interval:
+                self._last_report = now
+                print(f"  {self.summary()}")
+
+    def file_done(self):
+        with self._lock:
+            self.files_done += 1
+
+    @property
+    def throughput(self) -> float:
+        elapsed = time.perf_counter() - self.start
+        return self.bytes_done / elapsed if elapsed else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.files_done}/{self.total_files} files, "
+            f"{self.bytes_done / 1e6:.1f}/{self.total_bytes / 1e6:.1f} MB, "
+            f"{self.throughput / 1e6:.2f} MB/s"
+        )
+
+
+class ResumableUploader:
+    def __init__(
+        self,
+        session_factory: Callable[[], requests.Session] = requests.Session,
+        upload_url: str = DRIVE_UPLOAD_URL,
+        chunk_size: int = 8 * 1024 * 1024,
+        max_workers: int = 4,
+        max_retries: int = 8,
+        backoff_base: float = 1.0,
+        backoff_max: float = 64.0
+    ):
+        if chunk_size % CHUNK_ALIGNMENT:
+            raise ValueError(f"chunk_size must be a multiple of {CHUNK_ALIGNMENT} bytes")
+
+        self.session_factory = session_factory
+        self.upload_url = upload_url
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        # One session per worker thread; requests sessions are not thread-safe
+        if not hasattr(self._local, "session"):
+            self._local.session = self.session_factory()
+        return self._local.session
+
+    def _backoff(self, attempt: int):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def _start_session(self, path: str, metadata: dict, mimetype: str, total: int,
+                       file_id: Optional[str] = None) -> str:
+        # A file id starts an update session that replaces that file's content in place
+        request = self._session().patch if file_id else self._session().post
+        response = request(
+            f"{self.upload_url}/{file_id}" if file_id else self.upload_url,
+            params={"uploadType": "resumable", "fields": "id,name,mimeType,size,md5Checksum"},
+            data=json.dumps(metadata),
+            headers={
+                "Content-Type": "application/json; charset=UTF-8",
+                "X-Upload-Content-Type": mimetype,
+                "X-Upload-Content-Length": str(total),
+            },
+        )
+        if response.status_code != 200 or "Location" not in response.headers:
+            raise UploadError(f"Could not start upload session for {path}: HTTP {response.status_code}")
+        return response.headers["Location"]
+
+    def _put(self, session_url: str, body: bytes, content_range: str) -> Optional[requests.Response]:
+        try:
+            return self._session().put(session_url, data=body, headers={"Content-Range": content_range})
+        except requests.RequestException:
+            return None
+
+    @staticmethod
+    def _acknowledged(response: requests.Response) -> int:
+        # "Range: bytes=0-N" means bytes 0..N are stored; no header means nothing is
+        byte_range = response.headers.get("Range")
+        return int(byte_range.rsplit("-", 1)[1]) + 1 if byte_range else 0
+
+    def upload_file(self, path: str, parents: Optional[List[str]] = None, name: Optional[str] = None,
+                    progress: Optional[UploadProgress] = None, file_id: Optional[str] = None) -> dict:
+        """
+        Upload one file and return the created Drive file resource, with the
+        number of retries it took under "retries". With file_id, the existing
+        Drive file is updated instead of a new one being created.
+        """
+        total = os.path.getsize(path)
+        mimetype = guess_mimetype(path)
+        metadata = {"name": name or os.path.basename(path)}
+        if parents and not file_id:
+            metadata["parents"] = parents
+
+        session_url = self._start_session(path, metadata, mimetype, total, file_id)
+        offset = 0
+        reported = 0
+        attempt = 0
+        retries = 0
+        needs_sync = False
+
+        with open(path, "rb") as f:
+            while True:
+                if needs_sync:
+                    # Ask the server how far it got before sending more data
+                    response = self._put(session_url, b"", f"bytes */{total}")
+                else:
+                    f.seek(offset)
+                    chunk = f.read(self.chunk_size)
+                    content_range = f"bytes {offset}-{offset + len(chunk) - 1}/{total}" if chunk else f"bytes */{total}"
+                    response = self._put(session_url, chunk, content_range)
+
+                status = response.status_code if response is not None else None
+                if status in (200, 201):
+                    if progress is not None:
+                        progress.advance(total - reported)
+                    resource = response.json()
+                    resource["retries"] = retries
+                    return resource
+
+                if status == 308:
+                    offset = self._acknowledged(response)
+                    if progress is not None:
+                        progress.advance(offset - reported)
+                    reported = offset
+                    needs_sync = False
+                    attempt = 0
+                    continue
+
+                if status == 404:
+                    # The session expired; start over with a new one
+                    session_url = self._start_session(path, metadata, mimetype, total, file_id)
+                    offset = 0
+                elif status is not None and status not in RETRYABLE_STATUSES:
+                    raise UploadError(f"Upload of {path} failed: HTTP {status} {response.text[:200]}")
+
+                attempt += 1
+                retries += 1
+                if attempt > self.max_retries:
+                    raise UploadError(f"Upload of {path} failed after {self.max_retries} retries")
+                self._backoff(attempt)
+                needs_sync = status != 404
+
+    def upload_files(self, paths: List[str], parents: Optional[List[str]] = None,
+                     file_ids: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """
+        Upload files concurrently. Returns one record per path, in input order, with
+        the Drive resource or the error, elapsed seconds and size. Paths found in
+        file_ids update that Drive file rather than creating a new one.
+        """
+        file_ids = file_ids or {}
+        progress = UploadProgress(len(paths), sum(os.path.getsize(path) for path in paths))
+
+        def upload(path):
+            start = time.perf_counter()
+            record = {"path": path, "bytes": os.path.getsize(path), "file": None, "error": None}
+            with tracing.span("upload", file=path) as span:
+                try:
+                    record["file"] = self.upload_file(path, parents, progress=progress, file_id=file_ids.get(path))
+                    span.add(bytes=record["bytes"])
+                    print(f"Uploaded {path}")
+                except (UploadError, requests.RequestException, OSError) as e:
+                    record["error"] = str(e)
+                    span.set_status("error", str(e))
+                    print(f"- Failed to upload {path}: {e}")
+            progress.file_done()
+            record["seconds"] = time.perf_counter() - start
+            return record
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(upload, path): index for index, path in enumerate(paths)}
+            records = [None] * len(paths)
+            for future in as_completed(futures):
+                records[futures[future]] = future.result()
+
+        print(f"Upload finished: {progress.summary()}")
+        return records
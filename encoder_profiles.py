@@ -0,0 +1,214 @@
+"""
+Named, versioned video encoder settings shared by the render and platform transcode stages.
+
+A profile fixes the codec, preset, rate control (a bitrate, or a CRF with an optional
+bitrate cap), x264 tune and keyframe interval. Its version is bumped whenever its
+settings change, and the whole profile goes into build cache keys and the job
+manifest, so outputs encoded under an old version are rebuilt.
+
+Frames are a still image with a slow pulse, so constant-quality encodes with
+tune=stillimage and long keyframe intervals are far smaller than the fixed bitrates
+the pipeline started with, and faster presets lose little. `tune` encodes a short
+sample of a real render with every candidate profile and picks the fastest one whose
+full-length file stays under a size limit with an SSIM against the lossless sample
+of at least a target score.
+
+Usage:
+    python encoder_profiles.py list
+    python encoder_profiles.py tune [--frequency 432] [--source output_videos/videos/432Hz_video.mp4]
+                                    [--seconds 10] [--max-mb 100] [--min-ssim 0.98]
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+# Frames between keyframes for profiles tuned for still content, 10 s at 30 fps
+STILL_KEYINT = 300
+
+
+class EncoderProfile(NamedTuple):
+    name: str
+    version: int
+    codec: str = "libx264"
+    preset: str = "medium"
+    bitrate: Optional[str] = None  # Average bitrate, e.g. "8000k"; None with crf
+    crf: Optional[int] = None  # Constant quality; None with bitrate
+    maxrate: Optional[str] = None  # Bitrate cap of a CRF encode, with a two-second buffer
+    tune: Optional[str] = None  # x264 tune, e.g. "stillimage"
+    keyint: Optional[int] = None  # Frames between keyframes; None keeps x264's default
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@{self.version}"
+
+    def ffmpeg_params(self) -> List[str]:
+        """
+        Encoder options beyond codec, bitrate and preset, for write_videofile and the pipe writer.
+        """
+        params = []
+        if self.crf is not None:
+            params += ["-crf", str(self.crf)]
+        if self.maxrate is not None:
+            bufsize = f"{2 * int(self.maxrate.rstrip('k'))}k"
+            params += ["-maxrate", self.maxrate, "-bufsize", bufsize]
+        if self.tune is not None:
+            params += ["-tune", self.tune]
+        if self.keyint is not None:
+            params += ["-g", str(self.keyint)]
+        return params
+
+    def output_args(self) -> List[str]:
+        """
+        The complete video encoder arguments of an ffmpeg command line.
+        """
+        args = ["-c:v", self.codec, "-preset", self.preset]
+        if self.bitrate is not None:
+            args += ["-b:v", self.bitrate]
+        return args + self.ffmpeg_params()
+
+
+PROFILES: Dict[str, EncoderProfile] = {profile.name: profile for profile in [
+    # The settings the render and platform stages used before profiles existed
+    EncoderProfile("x264-8m", 1, bitrate="8000k"),
+    EncoderProfile("x264-1m", 1, bitrate="1000k"),
+    EncoderProfile("preview", 1, preset="ultrafast", bitrate="500k"),
+    # Tuning samples that every trial encode is compared against
+    EncoderProfile("lossless", 1, preset="ultrafast", crf=0),
+    # Constant quality for still content
+    EncoderProfile("still-hq", 1, preset="medium", crf=18, tune="stillimage", keyint=STILL_KEYINT),
+    EncoderProfile("still", 1, preset="veryfast", crf=20, tune="stillimage", keyint=STILL_KEYINT),
+    EncoderProfile("still-fast", 1, preset="superfast", crf=21, tune="stillimage", keyint=STILL_KEYINT),
+    EncoderProfile("still-ultrafast", 1, preset="ultrafast", crf=22, tune="stillimage", keyint=STILL_KEYINT),
+    # Platform uploads: constant quality capped at the old 1000k average
+    EncoderProfile("still-platform", 1, preset="veryfast", crf=24, maxrate="1000k", tune="stillimage",
+                   keyint=STILL_KEYINT),
+]}
+
+DEFAULT_RENDER_PROFILE = "x264-8m"
+DEFAULT_PLATFORM_PROFILE = "x264-1m"
+
+# Profiles tune tries by default; preview and lossless are not meant for output
+TUNE_CANDIDATES = ("x264-8m", "still-hq", "still", "still-fast", "still-ultrafast")
+
+
+def get_profile(name: str) -> EncoderProfile:
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoder profile: {name} (expected one of {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def trial_encode(profile: EncoderProfile, reference: str, output_path: str) -> dict:
+    """
+    Encode the reference's video with the profile. Returns the encode's wall and CPU
+    seconds (ffmpeg's own) and the output size.
+    """
+    from ffmpeg_tools import run_ffmpeg
+
+    before = os.times()
+    start = time.perf_counter()
+    run_ffmpeg(["-y", "-i", reference, "-an", *profile.output_args(), "-pix_fmt", "yuv420p", output_path])
+    wall = time.perf_counter() - start
+    after = os.times()
+    return {"wall": wall, "cpu": (after.children_user + after.children_system)
+            - (before.children_user + before.children_system), "bytes": os.path.getsize(output_path)}
+
+
+def render_reference(frequency: float, seconds: float, output_folder: str, font_path: Optional[str] = None) -> str:
+    """
+    Render `seconds` of a frequency's video with the lossless profile, as the sample
+    every trial encode is compared against. Returns its path.
+    """
+    from frequency_video_generator import FrequencyVideoGenerator
+    from text_layout import DEFAULT_FONT_PATH
+
+    generator = FrequencyVideoGenerator(output_folder=output_folder, font_path=font_path or DEFAULT_FONT_PATH,
+                                        video_duration=seconds, progress=False, writer="pipe",
+                                        audio_source="synth", profile="lossless")
+    return generator.create_video(frequency)
+
+
+def tune(reference: str, sample_seconds: float, duration: float, max_mb: float, min_ssim: float,
+         candidates: List[str]) -> List[dict]:
+    """
+    Trial-encode the reference with each candidate and return one result per profile,
+    fastest CPU first, with "selected" set on the fastest one meeting both targets.
+    """
+    from ffmpeg_tools import ssim
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in candidates:
+            profile = get_profile(name)
+            trial_path = os.path.join(tmp, f"{name}.mp4")
+            result = trial_encode(profile, reference, trial_path)
+            result.update(
+                profile=profile.key,
+                name=name,
+                ssim=ssim(trial_path, reference),
+                full_mb=result["bytes"] * duration / sample_seconds / 1e6,
+                selected=False
+            )
+            result["meets_targets"] = result["full_mb"] <= max_mb and result["ssim"] >= min_ssim
+            results.append(result)
+
+    results.sort(key=lambda result: result["cpu"])
+    for result in results:
+        if result["meets_targets"]:
+            result["selected"] = True
+            break
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List encoder profiles or pick one by trial encodes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="Show every profile's encoder arguments")
+    tune_parser = subparsers.add_parser("tune", help="Pick the fastest profile meeting size and quality targets")
+    tune_parser.add_argument("--frequency", type=float, default=432, help="Frequency whose video is rendered as the sample")
+    tune_parser.add_argument("--source", default=None,
+                             help="Use the start of this rendered video as the sample instead of rendering one")
+    tune_parser.add_argument("--seconds", type=float, default=10, help="Sample length; one pulse period by default")
+    tune_parser.add_argument("--duration", type=float, default=300, help="Length of the real videos, for sizes")
+    tune_parser.add_argument("--max-mb", type=float, default=100, help="Largest acceptable full-length video")
+    tune_parser.add_argument("--min-ssim", type=float, default=0.98, help="Lowest acceptable SSIM against the sample")
+    tune_parser.add_argument("--profiles", type=lambda value: [name for name in value.split(",") if name],
+                             default=list(TUNE_CANDIDATES), help="Comma-separated candidate profiles")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for profile in PROFILES.values():
+            print(f"  {profile.key:<20} {' '.join(profile.output_args())}")
+        return
+
+    for name in args.profiles:
+        get_profile(name)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.source:
+            from ffmpeg_tools import run_ffmpeg
+
+            print(f"Sample: the first {args.seconds:g}s of {args.source}, losslessly re-encoded")
+            reference = os.path.join(tmp, "reference.mp4")
+            run_ffmpeg(["-y", "-i", args.source, "-t", args.seconds, "-an", *get_profile("lossless").output_args(),
+                        reference])
+        else:
+            print(f"Sample: {args.seconds:g}s of the {args.frequency:g} Hz video, rendered losslessly")
+            reference = render_reference(args.frequency, args.seconds, tmp)
+        results = tune(reference, args.seconds, args.duration, args.max_mb, args.min_ssim, args.profiles)
+
+    print(f"\nTrial encodes, sizes scaled to {args.duration:g}s (targets: <= {args.max_mb:g} MB, SSIM >= {args.min_ssim}):")
+    for result in results:
+        mark = "*" if result["selected"] else ("+" if result["meets_targets"] else "-")
+        print(f"  {mark} {result['profile']:<20} {result['cpu']:6.2f}s CPU {result['wall']:6.2f}s wall "
+              f"{result['full_mb']:8.1f} MB  SSIM {result['ssim']:.4f}")
+    selected = [result for result in results if result["selected"]]
+    if not selected:
+        print("- No profile meets both targets; relax --max-mb or --min-ssim")
+        raise SystemExit(1)
+    print(f"+ Fastest profile meeting both targets: {selected[0]['profile']} "
+          f"(use --profile {selected[0]['name']})")
+
+
+if __name__ == "__main__":
+    main()
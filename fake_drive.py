@@ -0,0 +1,207 @@
+"""
+Local stand-in for the Google Drive v3 resumable upload protocol, for offline testing.
+
+Implements session initiation (POST ...?uploadType=resumable, or PATCH .../{fileId}
+to update a file), chunk uploads with Content-Range, 308 "Resume Incomplete" responses
+with a Range header, upload status queries (Content-Range: bytes */total), paginated
+file listings (GET /drive/v3/files) and injected failures.
+
+Usage:
+    with FakeDriveServer() as drive:
+        drive.inject_failures(3, status=503)
+        ResumableUploader(requests.Session, upload_url=drive.upload_url).upload_file("a.mp4")
+"""
+import hashlib
+import json
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeDriveServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.files = {}  # file id -> resource dict plus "content"
+        self.sessions = {}  # upload id -> in-progress upload
+        self.failures = []  # pending injected failures as (status, partial)
+        self.failures_served = 0
+        self.list_requests = 0
+        self.lock = threading.Lock()
+
+        handler = type("FakeDriveHandler", (_FakeDriveHandler,), {"drive": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def upload_url(self) -> str:
+        return f"{self.url}/upload/drive/v3/files"
+
+    @property
+    def files_url(self) -> str:
+        return f"{self.url}/drive/v3/files"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def inject_failures(self, count: int, status: int = 503, partial: bool = True):
+        """
+        Fail the next `count` chunk uploads with `status`. With partial=True the server
+        keeps the first half of each failed chunk, as if the connection dropped mid-body.
+        """
+        with self.lock:
+            self.failures.extend([(status, partial)] * count)
+
+    def content(self, name: str) -> bytes:
+        for resource in self.files.values():
+            if resource["name"] == name:
+                return resource["content"]
+        raise KeyError(name)
+
+    def _resource(self, file_id: str) -> dict:
+        resource = self.files[file_id]
+        return {key: value for key, value in resource.items() if key != "content"}
+
+
+class _FakeDriveHandler(BaseHTTPRequestHandler):
+    drive: FakeDriveServer = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: dict = None, headers: dict = None):
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path != "/drive/v3/files":
+            return self._send(404, {"error": {"code": 404, "message": "Not Found"}})
+
+        # Only the "'<folder id>' in parents" filter is understood
+        parent = re.search(r"'([^']+)' in parents", query.get("q", [""])[0])
+        page_size = int(query.get("pageSize", ["100"])[0])
+        start = int(query.get("pageToken", ["0"])[0])
+        with self.drive.lock:
+            self.drive.list_requests += 1
+            resources = [self.drive._resource(file_id) for file_id, resource in self.drive.files.items()
+                         if parent is None or parent.group(1) in resource["parents"]]
+
+        page = {"files": resources[start:start + page_size]}
+        if start + page_size < len(resources):
+            page["nextPageToken"] = str(start + page_size)
+        self._send(200, page)
+
+    def do_PATCH(self):
+        url = urlparse(self.path)
+        file_id = url.path.rsplit("/", 1)[1]
+        if not url.path.startswith("/upload/drive/v3/files/") or file_id not in self.drive.files:
+            self._read_body()
+            return self._send(404, {"error": {"code": 404, "message": "File not found"}})
+        self._start_upload(file_id)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/upload/drive/v3/files":
+            self._read_body()
+            return self._send(404, {"error": {"code": 404, "message": "Not Found"}})
+        self._start_upload(None)
+
+    def _start_upload(self, target_id):
+        query = parse_qs(urlparse(self.path).query)
+        body = self._read_body()
+        if query.get("uploadType") != ["resumable"]:
+            return self._send(400, {"error": {"code": 400, "message": "Only resumable uploads are supported"}})
+
+        metadata = json.loads(body or b"{}")
+        upload_id = uuid.uuid4().hex
+        with self.drive.lock:
+            self.drive.sessions[upload_id] = {
+                "metadata": metadata,
+                "mimeType": self.headers.get("X-Upload-Content-Type", "application/octet-stream"),
+                "total": int(self.headers.get("X-Upload-Content-Length", 0)),
+                "data": bytearray(),
+                "target_id": target_id,
+                "file_id": None,
+            }
+        location = f"{self.drive.upload_url}?uploadType=resumable&upload_id={upload_id}"
+        self._send(200, headers={"Location": location})
+
+    def do_PUT(self):
+        query = parse_qs(urlparse(self.path).query)
+        body = self._read_body()
+        upload_id = query.get("upload_id", [""])[0]
+
+        with self.drive.lock:
+            session = self.drive.sessions.get(upload_id)
+            if session is None:
+                return self._send(404, {"error": {"code": 404, "message": "Upload session not found"}})
+
+            content_range = self.headers.get("Content-Range", "")
+            span, _, _ = content_range.replace("bytes ", "").partition("/")
+
+            if span != "*" and self.drive.failures:
+                status, partial = self.drive.failures.pop(0)
+                self.drive.failures_served += 1
+                start = int(span.split("-")[0])
+                if partial and start == len(session["data"]):
+                    session["data"] += body[:len(body) // 2]
+                return self._send(status, {"error": {"code": status, "message": "Injected failure"}})
+
+            if span != "*":
+                start = int(span.split("-")[0])
+                if start != len(session["data"]):
+                    return self._send(400, {"error": {"code": 400, "message": "Chunk does not start at the acknowledged offset"}})
+                session["data"] += body
+
+            if session["file_id"] is None and len(session["data"]) >= session["total"]:
+                session["file_id"] = self._complete(session)
+            if session["file_id"] is not None:
+                return self._send(200, self.drive._resource(session["file_id"]))
+
+            headers = {"Range": f"bytes=0-{len(session['data']) - 1}"} if session["data"] else {}
+            self._send(308, headers=headers)
+
+    def _complete(self, session: dict) -> str:
+        file_id = session["target_id"] or uuid.uuid4().hex[:28]
+        previous = self.drive.files.get(file_id, {})
+        content = bytes(session["data"])
+        self.drive.files[file_id] = {
+            "id": file_id,
+            "name": session["metadata"].get("name", previous.get("name", "Untitled")),
+            "parents": session["metadata"].get("parents", previous.get("parents", [])),
+            "mimeType": session["mimeType"],
+            "size": str(len(content)),
+            "md5Checksum": hashlib.md5(content).hexdigest(),
+            "content": content,
+        }
+        return file_id
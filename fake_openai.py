@@ -0,0 +1,156 @@
+"""
+Local stand-in for the OpenAI chat completion and image generation endpoints, for
+offline testing and benchmarking.
+
+Implements POST /v1/chat/completions and POST /v1/images/generations with the
+response shapes of the real API, serves the generated images from the URLs it hands
+out, and can add latency and inject failures such as 429 rate limit errors.
+
+Usage:
+    with FakeOpenAIServer(latency=0.5) as openai_stub:
+        async with OpenAIBatchClient("test-key", base_url=openai_stub.base_url) as client:
+            ...
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import urlparse
+
+from PIL import Image
+
+
+class FakeOpenAIServer:
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.images = {}  # image id -> PNG bytes
+        self.failures = []  # pending injected failure statuses
+        self.requests = {"chat": 0, "images": 0, "downloads": 0}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+
+        handler = type("FakeOpenAIHandler", (_FakeOpenAIHandler,), {"server_state": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def inject_failures(self, count: int, status: int = 429):
+        """
+        Fail the next `count` API requests with `status`.
+        """
+        with self.lock:
+            self.failures.extend([status] * count)
+
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    server_state: FakeOpenAIServer = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body=None, headers: dict = None, content_type: str = "application/json"):
+        if isinstance(body, bytes):
+            payload = body
+        else:
+            payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status: int, message: str, error_type: str, headers: dict = None):
+        self._send(status, {"error": {"message": message, "type": error_type, "param": None, "code": None}}, headers)
+
+    def do_GET(self):
+        state = self.server_state
+        path = urlparse(self.path).path
+        image_id = path.rsplit("/", 1)[1].replace(".png", "")
+        if not path.startswith("/images/") or image_id not in state.images:
+            return self._error(404, "Not found", "invalid_request_error")
+        with state.lock:
+            state.requests["downloads"] += 1
+        self._send(200, state.images[image_id], content_type="image/png")
+
+    def do_POST(self):
+        state = self.server_state
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        path = urlparse(self.path).path
+
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._error(401, "You didn't provide an API key.", "invalid_request_error")
+
+        with state.lock:
+            failure = state.failures.pop(0) if state.failures else None
+            state.in_flight += 1
+            state.peak_in_flight = max(state.peak_in_flight, state.in_flight)
+        try:
+            time.sleep(state.latency)
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+        if failure == 429:
+            return self._error(429, "Rate limit reached", "requests", headers={"Retry-After": "0.05"})
+        if failure is not None:
+            return self._error(failure, "Injected failure", "server_error")
+
+        if path == "/v1/chat/completions":
+            with state.lock:
+                state.requests["chat"] += 1
+            prompt = payload["messages"][-1]["content"]
+            content = f"A calm description in response to: {prompt}"
+            return self._send(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split()),
+                          "total_tokens": len(prompt.split()) + len(content.split())},
+            })
+
+        if path == "/v1/images/generations":
+            with state.lock:
+                state.requests["images"] += 1
+            width, height = (int(side) for side in payload.get("size", "1024x1024").split("x"))
+            color = tuple(hashlib.md5(payload["prompt"].encode("utf-8")).digest()[:3])
+            buffer = BytesIO()
+            Image.new("RGB", (width, height), color).save(buffer, "PNG")
+            image_id = uuid.uuid4().hex
+            with state.lock:
+                state.images[image_id] = buffer.getvalue()
+            return self._send(200, {"created": int(time.time()),
+                                    "data": [{"url": f"{state.url}/images/{image_id}.png"}]})
+
+        self._error(404, f"Unknown endpoint {path}", "invalid_request_error")
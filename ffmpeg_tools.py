@@ -0,0 +1,60 @@
+"""
+Thin helpers for calling the ffmpeg binary that MoviePy is configured to use.
+"""
+import re
+import subprocess
+from typing import Dict, List, Optional
+
+
+def ffmpeg_binary() -> str:
+    # Imported on first use: loading MoviePy's config locates the ffmpeg binary
+    from moviepy.config import get_setting
+
+    return get_setting("FFMPEG_BINARY")
+
+
+def read_ffmpeg(arguments: List[str], input: Optional[bytes] = None) -> bytes:
+    """
+    Run ffmpeg with the given arguments, optionally feeding `input` to its stdin, and
+    return its raw stdout, e.g. decoded samples.
+    Raises RuntimeError carrying ffmpeg's error output on failure.
+    """
+    command = [ffmpeg_binary(), "-v", "error"] + [str(argument) for argument in arguments]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, input=input)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg failed: {e.stderr.decode(errors='replace').strip()}") from e
+    return result.stdout
+
+
+def run_ffmpeg(arguments: List[str]) -> str:
+    """
+    Run ffmpeg with the given arguments and return its stdout as text.
+    """
+    return read_ffmpeg(arguments).decode(errors="replace")
+
+
+def ssim(distorted, reference) -> float:
+    """
+    Mean SSIM of every frame of distorted against reference (1.0 for identical frames),
+    from the summary line ffmpeg's ssim filter prints.
+    """
+    result = subprocess.run([ffmpeg_binary(), "-hide_banner", "-i", str(distorted), "-i", str(reference),
+                             "-lavfi", "[0:v][1:v]ssim", "-f", "null", "-"], capture_output=True)
+    match = re.search(r"SSIM .*All:([\d.]+)", result.stderr.decode(errors="replace"))
+    if result.returncode != 0 or match is None:
+        raise RuntimeError(f"ffmpeg ssim failed: {result.stderr.decode(errors='replace').strip()[-500:]}")
+    return float(match.group(1))
+
+
+def probe_codecs(path) -> Dict[str, str]:
+    """
+    Return the codec of the first video and audio stream, e.g. {"video": "h264", "audio": "aac"},
+    parsed from the stream summary ffmpeg prints for an input.
+    """
+    # Without an output ffmpeg exits with an error after printing the summary
+    result = subprocess.run([ffmpeg_binary(), "-hide_banner", "-i", str(path)], capture_output=True)
+    codecs = {}
+    for kind, codec in re.findall(r"Stream #\d+:\d+.*?: (Video|Audio): (\w+)", result.stderr.decode(errors="replace")):
+        codecs.setdefault(kind.lower(), codec)
+    return codecs
@@ -0,0 +1,75 @@
+"""
+Bounded in-memory cache for rendered video frames.
+
+Periodic effects such as the background pulse in FrequencyVideoGenerator.create_video
+only ever produce a small set of distinct frames, so each one is rendered once and
+replayed for every later frame that maps to the same key.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+# Eviction policies once the memory budget is reached:
+#   lru  - drop the least recently used frame
+#   fifo - drop the oldest inserted frame
+#   keep - keep what is cached and render further misses without storing them,
+#          which avoids thrashing when a cyclic sequence is larger than the budget
+EVICTION_POLICIES = ("lru", "fifo", "keep")
+
+
+class FrameCache:
+    def __init__(self, max_bytes: int = 1024 * 2**20, policy: str = "lru"):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {policy} (expected one of {EVICTION_POLICIES})")
+
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.frames = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, render) -> np.ndarray:
+        """
+        Return the frame cached under key, calling render() to produce it on a miss.
+        Cached frames are read-only and shared between lookups.
+        """
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.hits += 1
+            if self.policy == "lru":
+                self.frames.move_to_end(key)
+            return frame
+
+        self.misses += 1
+        frame = render()
+        frame.flags.writeable = False
+        self._insert(key, frame)
+        return frame
+
+    def _insert(self, key, frame: np.ndarray):
+        if frame.nbytes > self.max_bytes:
+            return
+
+        while self.bytes + frame.nbytes > self.max_bytes:
+            if self.policy == "keep":
+                return
+            _, evicted = self.frames.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+
+        self.frames[key] = frame
+        self.bytes += frame.nbytes
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self) -> str:
+        return (
+            f"Frame cache ({self.policy}): {self.hits + self.misses} lookups, "
+            f"{self.misses} rendered, {self.hit_rate:.1%} hit rate, "
+            f"{len(self.frames)} frames / {self.bytes / 2**20:.0f} MB held, {self.evictions} evictions"
+        )
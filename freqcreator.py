@@ -0,0 +1,81 @@
+"""
+One command line for the whole pipeline.
+
+Each subcommand runs one stage script with the same options as running the script
+directly. The stage modules import MoviePy, the audio encoders and the Google client
+libraries only inside the functions that use them, so the CLI starts quickly and
+`plan`, or any stage with --dry-run, lists the outstanding work without loading them.
+
+Usage:
+    python freqcreator.py synth [--period] [--formats mp3,m4a]
+    python freqcreator.py render [--jobs 0] [--resume] [--dry-run]
+    python freqcreator.py transcode [--legacy]
+    python freqcreator.py upload [--sync] "output_videos/videos/*.mp4"
+    python freqcreator.py plan [synth render transcode upload]
+"""
+import argparse
+import importlib
+import time
+
+# Subcommand -> (stage module, description)
+STAGES = {
+    "synth": ("generate_frequencies", "Synthesize the tones to MP3 and M4A"),
+    "render": ("frequency_video_generator", "Render the frequency videos"),
+    "transcode": ("process_videos", "Trim and compress the videos for each platform"),
+    "upload": ("upload_to_drive", "Upload files to Google Drive"),
+}
+
+
+def print_plan(stage: str, work: list):
+    """
+    Print (item, None) entries as work to do and (item, reason) entries as skipped.
+    """
+    todo = sum(1 for _, reason in work if reason is None)
+    print(f"{stage}: {todo} to do, {len(work) - todo} skipped")
+    for item, reason in work:
+        print(f"  + {item}" if reason is None else f"  = {item} ({reason})")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate, render, transcode and upload frequency videos")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (module_name, description) in STAGES.items():
+        module = importlib.import_module(module_name)
+        stage = subparsers.add_parser(name, help=description, description=description)
+        module.add_arguments(stage)
+        stage.add_argument("--dry-run", action="store_true", help="List the work this stage would do and exit")
+        stage.set_defaults(module=module, stage_parser=stage)
+
+    plan = subparsers.add_parser("plan", help="List the outstanding work of each stage with its default options")
+    plan.add_argument("stages", nargs="*", help=f"Stages to plan: any of {', '.join(STAGES)} (default: all)")
+    plan.set_defaults(stage_parsers={name: subparsers.choices[name] for name in STAGES}, plan_parser=plan)
+    return parser
+
+
+def main():
+    start = time.perf_counter()
+    args = build_parser().parse_args()
+
+    if args.command == "plan":
+        unknown = [name for name in args.stages if name not in STAGES]
+        if unknown:
+            args.plan_parser.error(f"unknown stage(s) {', '.join(unknown)} (expected any of {', '.join(STAGES)})")
+        for name in args.stages or STAGES:
+            stage_parser = args.stage_parsers[name]
+            stage_args = stage_parser.parse_args([])
+            print_plan(name, stage_args.module.plan_work(stage_args))
+        print(f"Planned in {time.perf_counter() - start:.2f}s")
+        return
+
+    check_arguments = getattr(args.module, "check_arguments", None)
+    if check_arguments is not None:
+        check_arguments(args.stage_parser, args)
+    if args.dry_run:
+        print_plan(args.command, args.module.plan_work(args))
+        print(f"Planned in {time.perf_counter() - start:.2f}s")
+        return
+    args.module.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,419 +1,1137 @@
-import os
-import shutil
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
-from moviepy.editor import ImageClip, AudioFileClip, CompositeVideoClip, vfx
-from pathlib import Path
-import math
-import colorsys
-from typing import Dict
-
-def cleanup_directories(except_dir="generated_frequencies"):
-    """
-    Clean up all directories except the specified one.
-    """
-    current_dir = Path.cwd()
-    
-    for item in current_dir.iterdir():
-        if item.is_dir() and item.name != except_dir:
-            try:
-                shutil.rmtree(item)
-                print(f"+ Cleaned directory: {item.name}")
-            except Exception as e:
-                print(f"- Error cleaning {item.name}: {e}")
-
-class FrequencyVideoGenerator:
-    def __init__(
-        self,
-        audio_folder: str = "generated_frequencies",
-        output_folder: str = "output_videos",
-        font_path: str = "Roboto-Light.ttf",
-        video_duration: int = 300,
-        image_size: tuple = (1080, 1920)  # TikTok vertical format
-    ):
-        self.audio_folder = Path(audio_folder)
-        self.output_folder = Path(output_folder)
-        self.font_path = font_path
-        self.video_duration = video_duration
-        self.image_size = image_size
-        
-        # Create fresh output directories
-        self.images_dir = self.output_folder / "images"
-        self.descriptions_dir = self.output_folder / "descriptions"
-        self.videos_dir = self.output_folder / "videos"
-        
-        for directory in [self.images_dir, self.descriptions_dir, self.videos_dir]:
-            directory.mkdir(parents=True, exist_ok=True)
-        print("+ Created fresh output directories")
-
-    def get_frequency_category(self, freq: float) -> str:
-        if freq < 4:
-            return "Delta waves (0.5-4 Hz): Deep meditation and healing frequency"
-        elif freq < 8:
-            return "Theta waves (4-8 Hz): Deep relaxation and spiritual connection"
-        elif freq < 14:
-            return "Alpha waves (8-14 Hz): Relaxation and stress reduction"
-        elif freq < 30:
-            return "Beta waves (14-30 Hz): Focus and concentration"
-        elif freq < 100:
-            return "Low frequency: Physical and emotional healing"
-        elif freq < 400:
-            return "Medium frequency: Balancing and harmonizing"
-        else:
-            return "High frequency: Spiritual awakening and transformation"
-
-    def generate_description(self, frequency: float) -> str:
-        special_frequencies = {
-            7.83: "Schumann Resonance: Earth's natural heartbeat frequency. Aligns you with nature's rhythm and promotes deep grounding.",
-            174: "Natural Pain Relief: Known to reduce physical and energetic pain. Supports natural healing processes.",
-            285: "Energy Field Healing: Influences cellular memory and tissue regeneration.",
-            396: "Liberation Frequency: Releases trauma and negative patterns. Grounds and strengthens.",
-            417: "Facilitating Change: Clears past trauma and initiates positive transformation.",
-            432: "Universal Frequency: Nature's healing frequency. Brings harmony and peace.",
-            444: "DNA Healing: Supports cellular repair and spiritual awakening.",
-            528: "Miracle Tone: Love frequency. Repairs DNA and brings transformation.",
-            639: "Heart Chakra: Enhances love, harmony, and emotional healing.",
-            741: "Expression: Awakens intuition and spiritual awareness.",
-            852: "Third Eye: Connects to spiritual guidance and inner wisdom.",
-            963: "Crown Chakra: Pure divine connection and enlightenment."
-        }
-
-        if frequency in special_frequencies:
-            description = special_frequencies[frequency]
-        else:
-            category = self.get_frequency_category(frequency)
-            description = f"{frequency} Hz\n\n{category}\n\nThis sacred frequency promotes harmony, balance, and healing. Experience deep transformation through sound."
-
-        description_path = self.descriptions_dir / f"{frequency}Hz_description.txt"
-        with open(description_path, 'w', encoding='utf-8') as f:
-            f.write(description)
-        
-        return description
-
-    def generate_image(self, frequency: float) -> str:
-        img = Image.new('RGB', self.image_size, 'black')
-        draw = ImageDraw.Draw(img)
-        
-        # Generate color scheme based on frequency
-        hue = (frequency % 360) / 360.0
-        golden_ratio = 0.618033988749895
-        main_hue = (hue + golden_ratio) % 1
-        complement_hue = (main_hue + 0.5) % 1
-        
-        main_color = tuple(int(x * 255) for x in colorsys.hsv_to_rgb(main_hue, 0.8, 0.9))
-        complement_color = tuple(int(x * 255) for x in colorsys.hsv_to_rgb(complement_hue, 0.7, 0.8))
-        
-        center_x, center_y = self.image_size[0] // 2, self.image_size[1] // 2
-        max_radius = min(center_x, center_y) * 1.8
-        
-        num_layers = 100
-        for i in range(num_layers):
-            phase = (i / num_layers) * 2 * math.pi
-            radius = max_radius * (0.2 + 0.8 * (i / num_layers))
-            points = []
-            
-            num_points = 360
-            frequency_factor = min(frequency / 200, 5)
-            
-            for angle in range(num_points):
-                rad = math.radians(angle)
-                r = radius * (1 + 0.15 * math.sin(frequency_factor * rad + phase))
-                r *= (1 + 0.1 * math.cos(3 * frequency_factor * rad + phase))
-                r *= (1 + 0.05 * math.sin(5 * frequency_factor * rad + phase))
-                
-                x = center_x + r * math.cos(rad)
-                y = center_y + r * math.sin(rad)
-                points.append((x, y))
-            
-            fade = 1 - (i / num_layers) ** 1.5
-            color = main_color if i % 2 == 0 else complement_color
-            color = tuple(int(c * fade) for c in color)
-            
-            if len(points) > 2:
-                draw.line(points + [points[0]], fill=color, width=3)
-        
-        img = img.filter(ImageFilter.GaussianBlur(radius=2))
-        enhancer = ImageEnhance.Brightness(img)
-        img = enhancer.enhance(1.2)
-        
-        image_path = self.images_dir / f"{frequency}Hz_base_image.jpg"
-        img.save(image_path, quality=95)
-        return str(image_path)
-
-    def create_text_overlay(self, image_path: str, frequency: float, description: str) -> str:
-        image = Image.open(image_path)
-        draw = ImageDraw.Draw(image)
-        
-        try:
-            title_font = ImageFont.truetype(self.font_path, 140)
-            desc_font = ImageFont.truetype(self.font_path, 80)
-        except OSError:
-            print("Warning: Using default font")
-            title_font = desc_font = ImageFont.load_default()
-        
-        # Add gradient overlays
-        gradient_height = 400
-        for y in range(gradient_height):
-            alpha = int(180 * (1 - y / gradient_height))
-            draw.rectangle(
-                [(0, y), (self.image_size[0], y)],
-                fill=(0, 0, 0, alpha)
-            )
-        
-        for y in range(gradient_height):
-            alpha = int(180 * (y / gradient_height))
-            y_pos = self.image_size[1] - gradient_height + y
-            draw.rectangle(
-                [(0, y_pos), (self.image_size[0], y_pos)],
-                fill=(0, 0, 0, alpha)
-            )
-        
-        freq_text = f"{frequency} Hz"
-        bbox = draw.textbbox((0, 0), freq_text, font=title_font)
-        text_width = bbox[2] - bbox[0]
-        x_position = (self.image_size[0] - text_width) // 2
-        y_position = 100
-        
-        # Glow effect
-        glow_color = (255, 255, 255, 30)
-        for offset in [-2, -1, 1, 2]:
-            draw.text((x_position + offset, y_position), freq_text, font=title_font, fill=glow_color)
-            draw.text((x_position, y_position + offset), freq_text, font=title_font, fill=glow_color)
-        
-        draw.text((x_position, y_position), freq_text, font=title_font, fill=(255, 255, 255, 255))
-        
-        lines = []
-        current_line = []
-        words = description.split()
-        max_width = self.image_size[0] - 120
-        
-        for word in words:
-            current_line.append(word)
-            bbox = draw.textbbox((0, 0), " ".join(current_line), font=desc_font)
-            if bbox[2] > max_width:
-                current_line.pop()
-                lines.append(" ".join(current_line))
-                current_line = [word]
-        
-        if current_line:
-            lines.append(" ".join(current_line))
-        
-        y_position = self.image_size[1] - (len(lines) * (desc_font.size + 20)) - 150
-        for line in lines:
-            bbox = draw.textbbox((0, 0), line, font=desc_font)
-            text_width = bbox[2] - bbox[0]
-            x_position = (self.image_size[0] - text_width) // 2
-            
-            for offset in [-1, 1]:
-                draw.text((x_position + offset, y_position), line, font=desc_font, fill=(255, 255, 255, 30))
-                draw.text((x_position, y_position + offset), line, font=desc_font, fill=(255, 255, 255, 30))
-            
-            draw.text((x_position, y_position), line, font=desc_font, fill=(255, 255, 255, 255))
-            y_position += desc_font.size + 20
-        
-        output_path = self.images_dir / f"{frequency}Hz_with_text.jpg"
-        image.save(output_path, quality=95)
-        return str(output_path)
-
-    def create_transparent_text_overlay(self, frequency: float, description: str) -> str:
-        # Create a transparent image for text
-        img = Image.new('RGBA', self.image_size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-        
-        try:
-            title_font = ImageFont.truetype(self.font_path, 140)
-            desc_font = ImageFont.truetype(self.font_path, 80)
-        except OSError:
-            print("Warning: Using default font")
-            title_font = desc_font = ImageFont.load_default()
-        
-        # Add gradient overlays
-        gradient_height = 400
-        for y in range(gradient_height):
-            alpha = int(180 * (1 - y / gradient_height))
-            draw.rectangle(
-                [(0, y), (self.image_size[0], y)],
-                fill=(0, 0, 0, alpha)
-            )
-        
-        for y in range(gradient_height):
-            alpha = int(180 * (y / gradient_height))
-            y_pos = self.image_size[1] - gradient_height + y
-            draw.rectangle(
-                [(0, y_pos), (self.image_size[0], y_pos)],
-                fill=(0, 0, 0, alpha)
-            )
-        
-        # Draw frequency text with glow
-        freq_text = f"{frequency} Hz"
-        bbox = draw.textbbox((0, 0), freq_text, font=title_font)
-        text_width = bbox[2] - bbox[0]
-        x_position = (self.image_size[0] - text_width) // 2
-        y_position = 100
-        
-        # Glow effect
-        for offset in [-2, -1, 1, 2]:
-            draw.text((x_position + offset, y_position), freq_text, font=title_font, fill=(255, 255, 255, 30))
-            draw.text((x_position, y_position + offset), freq_text, font=title_font, fill=(255, 255, 255, 30))
-        
-        draw.text((x_position, y_position), freq_text, font=title_font, fill=(255, 255, 255, 255))
-        
-        # Draw description with word wrap
-        lines = []
-        current_line = []
-        words = description.split()
-        max_width = self.image_size[0] - 120
-        
-        for word in words:
-            current_line.append(word)
-            bbox = draw.textbbox((0, 0), " ".join(current_line), font=desc_font)
-            if bbox[2] > max_width:
-                current_line.pop()
-                lines.append(" ".join(current_line))
-                current_line = [word]
-        
-        if current_line:
-            lines.append(" ".join(current_line))
-        
-        y_position = self.image_size[1] - (len(lines) * (desc_font.size + 20)) - 150
-        for line in lines:
-            bbox = draw.textbbox((0, 0), line, font=desc_font)
-            text_width = bbox[2] - bbox[0]
-            x_position = (self.image_size[0] - text_width) // 2
-            
-            for offset in [-1, 1]:
-                draw.text((x_position + offset, y_position), line, font=desc_font, fill=(255, 255, 255, 30))
-                draw.text((x_position, y_position + offset), line, font=desc_font, fill=(255, 255, 255, 30))
-            
-            draw.text((x_position, y_position), line, font=desc_font, fill=(255, 255, 255, 255))
-            y_position += desc_font.size + 20
-        
-        text_overlay_path = self.images_dir / f"{frequency}Hz_text_overlay.png"
-        img.save(text_overlay_path, format='PNG')
-        return str(text_overlay_path)
-
-    def create_video(self, frequency: float, audio_path: str, image_path: str) -> str:
-        audio_clip = AudioFileClip(audio_path).set_duration(self.video_duration)
-        
-        # Create base image without text
-        base_image_path = self.generate_image(frequency)
-        base_clip = ImageClip(base_image_path).set_duration(self.video_duration)
-        
-        # Create text overlay
-        description = self.generate_description(frequency)
-        text_overlay_path = self.create_transparent_text_overlay(frequency, description)
-        text_clip = ImageClip(text_overlay_path).set_duration(self.video_duration)
-        
-        # Apply pulse effect only to base image
-        def modify_time(t):
-            pulse = 1 + 0.02 * math.sin(2 * math.pi * t / 10)  # Subtle pulse
-            return pulse
-        
-        # Create pulsing background
-        pulsing_clip = base_clip.fx(vfx.resize, modify_time)
-        
-        # Composite the stable text over the pulsing background
-        final_clip = CompositeVideoClip([pulsing_clip, text_clip]).set_audio(audio_clip)
-        
-        video_path = self.videos_dir / f"{frequency}Hz_video.mp4"
-        
-        final_clip.write_videofile(
-            str(video_path),
-            fps=30,
-            codec="libx264",
-            audio_codec="aac",
-            bitrate="8000k",
-            threads=4
-        )
-        
-        return str(video_path)
-
-    def process_frequency(self, frequency: float) -> Dict[str, str]:
-        print(f"\nProcessing {frequency} Hz...")
-        
-        try:
-            description = self.generate_description(frequency)
-            print(f"+ Generated description")
-            
-            image_path = self.generate_image(frequency)
-            print(f"+ Generated image")
-            
-            image_with_text = self.create_text_overlay(image_path, frequency, description)
-            print(f"+ Added text overlay")
-            
-            audio_path = self.audio_folder / f"{frequency}Hz.mp3"
-            if not audio_path.exists():
-                raise FileNotFoundError(f"Audio file not found: {audio_path}")
-                
-            video_path = self.create_video(frequency, str(audio_path), image_with_text)
-            print(f"+ Created video: {video_path}")
-            
-            return {
-                "description": str(self.descriptions_dir / f"{frequency}Hz_description.txt"),
-                "image": image_path,
-                "image_with_text": image_with_text,
-                "video": video_path
-            }
-        except Exception as e:
-            print(f"Error processing {frequency} Hz: {str(e)}")
-            raise
-
-def main():
-    print("\nCleaning up directories...")
-    cleanup_directories()
-
-    if not Path("generated_frequencies").exists():
-        print("Error: 'generated_frequencies' folder not found!")
-        print("Please make sure your audio files are in the 'generated_frequencies' folder.")
-        return
-
-    frequencies = [
-        174, 285, 396, 417, 432, 444, 528, 639, 741, 852,
-        963, 100, 111, 120, 144, 174, 200, 210, 222, 285,
-        300, 333, 350, 396, 417, 432, 444, 480, 500, 528,
-        540, 555, 582, 600, 639, 693, 700, 741, 777, 800,
-        852, 888, 900, 936, 963, 1000, 1020, 1111, 1200, 1222,
-        136.1, 150, 174, 194, 210, 285, 324, 417, 528, 600,
-        639, 852, 963, 7.83, 3, 6, 8, 10, 12, 15,
-        20, 25, 30, 40, 50, 60, 70, 80, 90, 100,
-        150, 200, 250, 300, 350, 400, 450, 500, 550, 600
-    ]
-    
-    print("\nInitializing video generator...")
-    
-    generator = FrequencyVideoGenerator(
-        audio_folder="generated_frequencies",
-        output_folder="output_videos",
-        video_duration=300
-    )
-    
-    print("\nStarting video generation process...")
-    
-    for freq in frequencies:
-        try:
-            results = generator.process_frequency(freq)
-            print(f"\nSuccessfully processed {freq} Hz:")
-            for key, path in results.items():
-                print(f"  + {key}: {path}")
-        except Exception as e:
-            print(f"- Failed to process {freq} Hz: {str(e)}")
-            continue
-
-if __name__ == "__main__":
-    try:
-        print("\n=== Frequency Video Generator for TikTok ===")
-        print("Initializing with cleanup...")
-        main()
-        print("\nProcess completed!")
-        
-    except KeyboardInterrupt:
-        print("\n\nProcess interrupted by user")
-        print("Partial results have been saved")
-    except Exception as e:
-        print(f"\n\nAn error occurred: {str(e)}")
-        print("Please check your input files and try again")
-    finally:
-        print("\n=== Summary ===")
-        print("- Check the output_videos folder for your generated content")
-        print("- Each frequency has its own video file")
-        print("- Videos are optimized for TikTok (1080x1920)")
+import os
+import shutil
+import time
+import argparse
+import io
+from collections import Counter
+from contextlib import ExitStack, nullcontext, redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image, ImageDraw, ImageFilter, ImageEnhance
+from pathlib import Path
+import math
+import colorsys
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from build_cache import BuildCache, atomic_write, atomic_write_all, file_digest, remove_temp_files
+from job_manifest import JobManifest, MANIFEST_FILE
+from frame_cache import FrameCache, EVICTION_POLICIES
+from loop_render import closed_gop_params, concat_segments, check_loop_timing
+from text_layout import DEFAULT_FONT_PATH, REFERENCE_SIZE, LayoutMetrics, TextRenderer, load_font, scaled
+from compositor import OverlayCompositor
+from pipe_writer import PipeOutput, write_video_pipe, write_video_pipes
+from contact_sheet import make_contact_sheet
+from encoder_profiles import DEFAULT_RENDER_PROFILE, PROFILES, get_profile
+from audio_source import SineSource, check_audio_frequency
+import tracing
+
+# Available background renderers; "pil" is the original per-point implementation
+RENDERERS = ("numpy", "pil")
+
+# Bump whenever a change to the drawing code alters rendered pixels
+RENDERER_VERSION = 3
+
+# "full" encodes every frame; "loop" encodes one pulse period and repeats it by stream copy
+RENDER_MODES = ("full", "loop")
+
+# "moviepy" encodes through write_videofile; "pipe" streams raw frames straight into ffmpeg
+VIDEO_WRITERS = ("moviepy", "pipe")
+
+# "file" muxes the M4A or MP3 from audio_folder; "synth" synthesizes the same tone while encoding
+AUDIO_SOURCES = ("file", "synth")
+
+# Audio files looked up per frequency, in order; AAC tracks are muxed by stream copy
+AUDIO_EXTENSIONS = ("m4a", "mp3")
+
+# Seconds per background pulse; the whole video repeats with this period
+PULSE_PERIOD = 10
+
+# Frequencies rendered by a batch run, in Hz; repeated values are processed once
+FREQUENCIES = [
+    174, 285, 396, 417, 432, 444, 528, 639, 741, 852,
+    963, 100, 111, 120, 144, 174, 200, 210, 222, 285,
+    300, 333, 350, 396, 417, 432, 444, 480, 500, 528,
+    540, 555, 582, 600, 639, 693, 700, 741, 777, 800,
+    852, 888, 900, 936, 963, 1000, 1020, 1111, 1200, 1222,
+    136.1, 150, 174, 194, 210, 285, 324, 417, 528, 600,
+    639, 852, 963, 7.83, 3, 6, 8, 10, 12, 15,
+    20, 25, 30, 40, 50, 60, 70, 80, 90, 100,
+    150, 200, 250, 300, 350, 400, 450, 500, 550, 600
+]
+
+# Extra output geometries as width:height; each shares the short side of image_size
+ASPECT_RATIOS = {"9:16": (9, 16), "1:1": (1, 1), "16:9": (16, 9)}
+
+def aspect_size(aspect: str, short_side: int) -> tuple:
+    """
+    Frame size of an aspect ratio with the given short side, e.g. (1920, 1080) for
+    16:9 at 1080. Both sides are even for yuv420p.
+    """
+    ratio_w, ratio_h = ASPECT_RATIOS[aspect]
+    unit = short_side / min(ratio_w, ratio_h)
+    return int(unit * ratio_w) // 2 * 2, int(unit * ratio_h) // 2 * 2
+
+def pulse_scale(t: float) -> float:
+    """
+    Zoom of the background at time t: a subtle pulse with period PULSE_PERIOD.
+    """
+    return 1 + 0.02 * math.sin(2 * math.pi * t / PULSE_PERIOD)
+
+# In-memory stages of process_frequency; each runs at most once per frequency
+PIPELINE_STAGES = ("description", "image", "image_with_text", "text_overlay", "video")
+
+# Stages of process_frequency whose outputs are tracked in the job manifest
+MANIFEST_STAGES = ("description", "image", "image_with_text", "video")
+
+# Settings passed to write_videofile for every generated video; the encoder profile sets the rest
+VIDEO_SETTINGS = {
+    "fps": 30,
+    "audio_codec": "aac",
+    "threads": 4
+}
+
+# Preview renders: quarter resolution, one pulse period, and a fast encode; about 1% of the full cost
+PREVIEW_SCALE = 0.25
+PREVIEW_DURATION = PULSE_PERIOD
+PREVIEW_VIDEO_SETTINGS = {
+    "fps": 15
+}
+PREVIEW_PROFILE = "preview"
+
+def preview_options(image_size: tuple = (1080, 1920)) -> dict:
+    """
+    FrequencyVideoGenerator arguments for a preview of the given full-size format.
+    Width and height stay even for yuv420p.
+    """
+    width, height = (max(2, int(side * PREVIEW_SCALE) // 2 * 2) for side in image_size)
+    return {
+        "image_size": (width, height),
+        "video_duration": PREVIEW_DURATION,
+        "video_settings": PREVIEW_VIDEO_SETTINGS,
+        "profile": PREVIEW_PROFILE,
+    }
+
+def cleanup_directories(except_dir="generated_frequencies"):
+    """
+    Clean up all directories except the specified one.
+    Only runs with --clean; batches are resumable and keep their outputs by default.
+    """
+    current_dir = Path.cwd()
+    
+    for item in current_dir.iterdir():
+        # Hidden directories (the build cache, VCS metadata) are left alone
+        if item.is_dir() and item.name != except_dir and not item.name.startswith("."):
+            try:
+                shutil.rmtree(item)
+                print(f"+ Cleaned directory: {item.name}")
+            except Exception as e:
+                print(f"- Error cleaning {item.name}: {e}")
+
+class FrequencyVideoGenerator:
+    def __init__(
+        self,
+        audio_folder: str = "generated_frequencies",
+        output_folder: str = "output_videos",
+        font_path: str = DEFAULT_FONT_PATH,
+        video_duration: int = 300,
+        image_size: tuple = (1080, 1920),  # TikTok vertical format
+        renderer: str = "numpy",
+        cache: Optional[BuildCache] = None,
+        threads: int = VIDEO_SETTINGS["threads"],  # ffmpeg threads per video
+        progress: bool = True,
+        frame_cache_mb: int = 1024,  # 0 disables the pulse frame cache
+        frame_cache_policy: str = "lru",
+        render_mode: str = "full",
+        writer: str = "moviepy",
+        audio_source: str = "file",
+        manifest: Optional[JobManifest] = None,
+        video_settings: Optional[dict] = None,  # Overrides of VIDEO_SETTINGS, e.g. PREVIEW_VIDEO_SETTINGS
+        aspects: Tuple[str, ...] = (),  # Extra geometries rendered in the same pass, keys of ASPECT_RATIOS
+        profile: str = DEFAULT_RENDER_PROFILE  # Encoder profile name, see encoder_profiles.PROFILES
+    ):
+        if renderer not in RENDERERS:
+            raise ValueError(f"Unknown renderer: {renderer} (expected one of {RENDERERS})")
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {render_mode} (expected one of {RENDER_MODES})")
+        if writer not in VIDEO_WRITERS:
+            raise ValueError(f"Unknown video writer: {writer} (expected one of {VIDEO_WRITERS})")
+        if audio_source not in AUDIO_SOURCES:
+            raise ValueError(f"Unknown audio source: {audio_source} (expected one of {AUDIO_SOURCES})")
+        for aspect in aspects:
+            if aspect not in ASPECT_RATIOS:
+                raise ValueError(f"Unknown aspect ratio: {aspect} (expected one of {tuple(ASPECT_RATIOS)})")
+
+        self.audio_folder = Path(audio_folder)
+        self.output_folder = Path(output_folder)
+        self.font_path = font_path
+        self.video_duration = video_duration
+        self.image_size = image_size
+        self.renderer = renderer
+        self.cache = cache
+        self.threads = threads
+        self.progress = progress
+        self.frame_cache_mb = frame_cache_mb
+        self.frame_cache_policy = frame_cache_policy
+        self.render_mode = render_mode
+        self.writer = writer
+        self.audio_source = audio_source
+        self.manifest = manifest
+        self.video_settings = dict(VIDEO_SETTINGS, **(video_settings or {}))
+        self.profile = get_profile(profile)
+        # Geometries other than image_size itself
+        self.aspect_sizes = {}
+        for aspect in aspects:
+            size = aspect_size(aspect, min(image_size))
+            if size != tuple(image_size) and size not in self.aspect_sizes.values():
+                self.aspect_sizes[aspect] = size
+        if self.aspect_sizes and render_mode == "loop":
+            raise ValueError("Extra aspect ratios are rendered in one frame loop and cannot use the loop render mode")
+        self.resumed = []  # Stages skipped because the manifest shows them done
+        self.text_renderer = TextRenderer(font_path, image_size)
+        
+        # In-memory artifacts shared between stages, and how often each stage ran per frequency
+        self._artifacts = {}
+        self.stage_runs = Counter()
+        
+        # Create fresh output directories
+        self.images_dir = self.output_folder / "images"
+        self.descriptions_dir = self.output_folder / "descriptions"
+        self.videos_dir = self.output_folder / "videos"
+        
+        for directory in [self.images_dir, self.descriptions_dir, self.videos_dir]:
+            directory.mkdir(parents=True, exist_ok=True)
+        print("+ Created fresh output directories")
+
+    def _build(self, kind: str, output_path: Path, inputs: dict, builder) -> str:
+        """
+        Run builder(path) to write output_path atomically, or reuse a cached artifact with identical inputs.
+        """
+        write = lambda: atomic_write(output_path, builder)
+        if self.cache is None:
+            write()
+            return str(output_path)
+        return self.cache.build(kind, output_path, inputs, write)
+
+    def manifest_config(self) -> dict:
+        """
+        The settings that determine a frequency's outputs, recorded with every manifest job.
+        """
+        font_file = Path(self.font_path)
+        return {
+            "image_size": list(self.image_size),
+            "renderer": self.renderer,
+            "renderer_version": RENDERER_VERSION,
+            "font": file_digest(font_file) if font_file.is_file() else "default",
+            "video_duration": self.video_duration,
+            "video_settings": self.video_settings,
+            "encoder_profile": self.profile._asdict(),
+            "render_mode": self.render_mode,
+            "writer": self.writer,
+            "audio_source": self.audio_source,
+            "aspects": self.aspect_sizes,
+            "output_folder": str(self.output_folder.resolve()),
+        }
+
+    def _stage(self, stage: str, frequency: float, run) -> str:
+        """
+        Run a persisted stage and record it in the job manifest, or skip it if the manifest
+        shows it already finished. run() returns the stage's output path.
+        Each stage is traced as a span counting the bytes of its output.
+        """
+        with tracing.span(stage, frequency=frequency) as span:
+            if self.manifest is None:
+                output = run()
+                span.add(bytes=os.path.getsize(output))
+                return output
+            if self.manifest.is_done(frequency, stage):
+                print(f"+ Resumed: {stage} already done")
+                self.resumed.append(stage)
+                span.set_status("resumed")
+                return self.manifest.output(frequency, stage)
+            self.manifest.start(frequency, stage)
+            try:
+                output = run()
+            except BaseException as e:
+                self.manifest.fail(frequency, stage, str(e) or type(e).__name__)
+                raise
+            self.manifest.finish(frequency, stage, output)
+            span.add(bytes=os.path.getsize(output))
+            return output
+
+    def _artifact(self, stage: str, frequency: float, compute):
+        """
+        Compute a stage's in-memory artifact once per frequency and reuse it for every later stage.
+        """
+        key = (stage, frequency)
+        if key not in self._artifacts:
+            self.stage_runs[key] += 1
+            self._artifacts[key] = compute()
+        return self._artifacts[key]
+
+    def release(self, frequency: float):
+        """
+        Drop the in-memory artifacts of a finished frequency.
+        """
+        for key in [key for key in self._artifacts if key[1] == frequency]:
+            del self._artifacts[key]
+
+    def _render_inputs(self, frequency: float) -> dict:
+        font_file = Path(self.font_path)
+        return {
+            "frequency": frequency,
+            "image_size": list(self.image_size),
+            "renderer": self.renderer,
+            "renderer_version": RENDERER_VERSION,
+            "font": file_digest(font_file) if font_file.is_file() else "default",
+        }
+
+    def get_frequency_category(self, freq: float) -> str:
+        if freq < 4:
+            return "Delta waves (0.5-4 Hz): Deep meditation and healing frequency"
+        elif freq < 8:
+            return "Theta waves (4-8 Hz): Deep relaxation and spiritual connection"
+        elif freq < 14:
+            return "Alpha waves (8-14 Hz): Relaxation and stress reduction"
+        elif freq < 30:
+            return "Beta waves (14-30 Hz): Focus and concentration"
+        elif freq < 100:
+            return "Low frequency: Physical and emotional healing"
+        elif freq < 400:
+            return "Medium frequency: Balancing and harmonizing"
+        else:
+            return "High frequency: Spiritual awakening and transformation"
+
+    def describe(self, frequency: float) -> str:
+        return self._artifact("description", frequency, lambda: self._compose_description(frequency))
+
+    def _compose_description(self, frequency: float) -> str:
+        special_frequencies = {
+            7.83: "Schumann Resonance: Earth's natural heartbeat frequency. Aligns you with nature's rhythm and promotes deep grounding.",
+            174: "Natural Pain Relief: Known to reduce physical and energetic pain. Supports natural healing processes.",
+            285: "Energy Field Healing: Influences cellular memory and tissue regeneration.",
+            396: "Liberation Frequency: Releases trauma and negative patterns. Grounds and strengthens.",
+            417: "Facilitating Change: Clears past trauma and initiates positive transformation.",
+            432: "Universal Frequency: Nature's healing frequency. Brings harmony and peace.",
+            444: "DNA Healing: Supports cellular repair and spiritual awakening.",
+            528: "Miracle Tone: Love frequency. Repairs DNA and brings transformation.",
+            639: "Heart Chakra: Enhances love, harmony, and emotional healing.",
+            741: "Expression: Awakens intuition and spiritual awareness.",
+            852: "Third Eye: Connects to spiritual guidance and inner wisdom.",
+            963: "Crown Chakra: Pure divine connection and enlightenment."
+        }
+
+        if frequency in special_frequencies:
+            description = special_frequencies[frequency]
+        else:
+            category = self.get_frequency_category(frequency)
+            description = f"{frequency} Hz\n\n{category}\n\nThis sacred frequency promotes harmony, balance, and healing. Experience deep transformation through sound."
+        return description
+
+    def generate_description(self, frequency: float) -> str:
+        description = self.describe(frequency)
+        description_path = self.descriptions_dir / f"{frequency}Hz_description.txt"
+        atomic_write(description_path, lambda path: path.write_text(description, encoding='utf-8'))
+        
+        return description
+
+    def base_image(self, frequency: float) -> Image.Image:
+        return self._artifact("image", frequency, lambda: self._render_image(frequency))
+
+    def generate_image(self, frequency: float) -> str:
+        image_path = self.images_dir / f"{frequency}Hz_base_image.jpg"
+        return self._build("image", image_path, self._render_inputs(frequency),
+                           lambda path: self.base_image(frequency).save(path, quality=95))
+
+    def master_image(self, frequency: float) -> Image.Image:
+        """
+        The background centred on a canvas that covers image_size and every extra aspect
+        ratio, so each geometry is a crop of one render.
+        """
+        sizes = [tuple(self.image_size), *self.aspect_sizes.values()]
+        canvas_size = (max(size[0] for size in sizes), max(size[1] for size in sizes))
+        return self._artifact("master", frequency, lambda: self._render_image(frequency, canvas_size))
+
+    def _render_image(self, frequency: float, canvas_size: Optional[tuple] = None) -> Image.Image:
+        """
+        The background at image_size, or the same pattern centred on a larger canvas.
+        """
+        canvas_size = canvas_size or self.image_size
+        img = Image.new('RGB', canvas_size, 'black')
+        draw = ImageDraw.Draw(img)
+        
+        # Generate color scheme based on frequency
+        hue = (frequency % 360) / 360.0
+        golden_ratio = 0.618033988749895
+        main_hue = (hue + golden_ratio) % 1
+        complement_hue = (main_hue + 0.5) % 1
+        
+        main_color = tuple(int(x * 255) for x in colorsys.hsv_to_rgb(main_hue, 0.8, 0.9))
+        complement_color = tuple(int(x * 255) for x in colorsys.hsv_to_rgb(complement_hue, 0.7, 0.8))
+        
+        center_x, center_y = canvas_size[0] // 2, canvas_size[1] // 2
+        max_radius = min(self.image_size) // 2 * 1.8
+        
+        # Line width and blur follow the pattern's size, set by the short side; 3 and 2 pixels at 1080
+        scale = min(self.image_size) / min(REFERENCE_SIZE)
+        line_width = scaled(3, scale)
+        
+        if self.renderer == "numpy":
+            self._draw_layers_numpy(draw, frequency, center_x, center_y, max_radius, main_color, complement_color, line_width)
+        else:
+            self._draw_layers_pil(draw, frequency, center_x, center_y, max_radius, main_color, complement_color, line_width)
+        
+        img = img.filter(ImageFilter.GaussianBlur(radius=2 * scale))
+        enhancer = ImageEnhance.Brightness(img)
+        return enhancer.enhance(1.2)
+
+    def _draw_layers_numpy(self, draw, frequency, center_x, center_y, max_radius, main_color, complement_color,
+                           line_width=3):
+        """
+        Vectorized renderer: computes all layer/angle radii as a single (layers, points)
+        array. Only the coordinates are batched; PIL has no call that draws polylines of
+        different colours at once, so each layer is still one draw.line, in order, which
+        keeps the output identical to the pil renderer.
+        """
+        num_layers = 100
+        num_points = 360
+        frequency_factor = min(frequency / 200, 5)
+        
+        layer = np.arange(num_layers)[:, np.newaxis]
+        phase = (layer / num_layers) * 2 * np.pi
+        radius = max_radius * (0.2 + 0.8 * (layer / num_layers))
+        rad = np.radians(np.arange(num_points))[np.newaxis, :]
+        
+        r = radius * (1 + 0.15 * np.sin(frequency_factor * rad + phase))
+        r *= (1 + 0.1 * np.cos(3 * frequency_factor * rad + phase))
+        r *= (1 + 0.05 * np.sin(5 * frequency_factor * rad + phase))
+        
+        points = np.empty((num_layers, num_points + 1, 2))
+        points[:, :num_points, 0] = center_x + r * np.cos(rad)
+        points[:, :num_points, 1] = center_y + r * np.sin(rad)
+        points[:, num_points] = points[:, 0]  # Close each polyline
+        
+        for i in range(num_layers):
+            fade = 1 - (i / num_layers) ** 1.5
+            color = main_color if i % 2 == 0 else complement_color
+            color = tuple(int(c * fade) for c in color)
+            draw.line(points[i].ravel().tolist(), fill=color, width=line_width)
+
+    def _draw_layers_pil(self, draw, frequency, center_x, center_y, max_radius, main_color, complement_color,
+                         line_width=3):
+        """
+        Original renderer: computes every point with scalar math and draws one layer at a time.
+        """
+        num_layers = 100
+        for i in range(num_layers):
+            phase = (i / num_layers) * 2 * math.pi
+            radius = max_radius * (0.2 + 0.8 * (i / num_layers))
+            points = []
+            
+            num_points = 360
+            frequency_factor = min(frequency / 200, 5)
+            
+            for angle in range(num_points):
+                rad = math.radians(angle)
+                r = radius * (1 + 0.15 * math.sin(frequency_factor * rad + phase))
+                r *= (1 + 0.1 * math.cos(3 * frequency_factor * rad + phase))
+                r *= (1 + 0.05 * math.sin(5 * frequency_factor * rad + phase))
+                
+                x = center_x + r * math.cos(rad)
+                y = center_y + r * math.sin(rad)
+                points.append((x, y))
+            
+            fade = 1 - (i / num_layers) ** 1.5
+            color = main_color if i % 2 == 0 else complement_color
+            color = tuple(int(c * fade) for c in color)
+            
+            if len(points) > 2:
+                draw.line(points + [points[0]], fill=color, width=line_width)
+
+    def image_with_text(self, frequency: float) -> Image.Image:
+        return self._artifact("image_with_text", frequency,
+                              lambda: self._render_text_overlay(frequency, self.describe(frequency)))
+
+    def create_text_overlay(self, frequency: float) -> str:
+        output_path = self.images_dir / f"{frequency}Hz_with_text.jpg"
+        inputs = dict(self._render_inputs(frequency), description=self.describe(frequency))
+        return self._build("image_with_text", output_path, inputs,
+                           lambda path: self.image_with_text(frequency).save(path, quality=95))
+
+    def _render_text_overlay(self, frequency: float, description: str) -> Image.Image:
+        if self.renderer == "numpy":
+            return self.text_renderer.draw_onto(self.base_image(frequency), f"{frequency} Hz", description)
+        
+        image = self.base_image(frequency).copy()
+        self._draw_text_pil(ImageDraw.Draw(image), frequency, description)
+        return image
+
+    def text_layer(self, frequency: float) -> Image.Image:
+        return self._artifact("text_overlay", frequency,
+                              lambda: self._render_transparent_text_overlay(frequency, self.describe(frequency)))
+
+    def create_transparent_text_overlay(self, frequency: float) -> str:
+        text_overlay_path = self.images_dir / f"{frequency}Hz_text_overlay.png"
+        inputs = dict(self._render_inputs(frequency), description=self.describe(frequency))
+        return self._build("text_overlay", text_overlay_path, inputs,
+                           lambda path: self.text_layer(frequency).save(path, format='PNG'))
+
+    def _render_transparent_text_overlay(self, frequency: float, description: str) -> Image.Image:
+        if self.renderer == "numpy":
+            return Image.fromarray(self.text_renderer.render_layer(f"{frequency} Hz", description), "RGBA")
+        
+        # Create a transparent image for text
+        img = Image.new('RGBA', self.image_size, (0, 0, 0, 0))
+        self._draw_text_pil(ImageDraw.Draw(img), frequency, description)
+        return img
+
+    def _draw_text_pil(self, draw, frequency: float, description: str):
+        """
+        Original text drawing: per-row gradient rectangles, per-word wrap measurement
+        and the glow drawn as offset copies of every string.
+        """
+        metrics = LayoutMetrics.for_size(tuple(self.image_size))
+        title_font = load_font(self.font_path, metrics.title_size)
+        desc_font = load_font(self.font_path, metrics.description_size)
+        
+        # Add gradient overlays
+        gradient_height = metrics.gradient_height
+        for y in range(gradient_height):
+            alpha = int(180 * (1 - y / gradient_height))
+            draw.rectangle(
+                [(0, y), (self.image_size[0], y)],
+                fill=(0, 0, 0, alpha)
+            )
+        
+        for y in range(gradient_height):
+            alpha = int(180 * (y / gradient_height))
+            y_pos = self.image_size[1] - gradient_height + y
+            draw.rectangle(
+                [(0, y_pos), (self.image_size[0], y_pos)],
+                fill=(0, 0, 0, alpha)
+            )
+        
+        # Draw frequency text with glow
+        freq_text = f"{frequency} Hz"
+        bbox = draw.textbbox((0, 0), freq_text, font=title_font)
+        text_width = bbox[2] - bbox[0]
+        x_position = (self.image_size[0] - text_width) // 2
+        y_position = metrics.title_top
+        
+        # Glow effect
+        for offset in metrics.title_glow_offsets:
+            draw.text((x_position + offset, y_position), freq_text, font=title_font, fill=(255, 255, 255, 30))
+            draw.text((x_position, y_position + offset), freq_text, font=title_font, fill=(255, 255, 255, 30))
+        
+        draw.text((x_position, y_position), freq_text, font=title_font, fill=(255, 255, 255, 255))
+        
+        # Draw description with word wrap
+        lines = []
+        current_line = []
+        words = description.split()
+        max_width = self.image_size[0] - 2 * metrics.side_margin
+        
+        for word in words:
+            current_line.append(word)
+            bbox = draw.textbbox((0, 0), " ".join(current_line), font=desc_font)
+            if bbox[2] > max_width:
+                current_line.pop()
+                lines.append(" ".join(current_line))
+                current_line = [word]
+        
+        if current_line:
+            lines.append(" ".join(current_line))
+        
+        line_height = metrics.description_size + metrics.line_spacing
+        y_position = self.image_size[1] - len(lines) * line_height - metrics.description_bottom
+        for line in lines:
+            bbox = draw.textbbox((0, 0), line, font=desc_font)
+            text_width = bbox[2] - bbox[0]
+            x_position = (self.image_size[0] - text_width) // 2
+            
+            for offset in metrics.description_glow_offsets:
+                draw.text((x_position + offset, y_position), line, font=desc_font, fill=(255, 255, 255, 30))
+                draw.text((x_position, y_position + offset), line, font=desc_font, fill=(255, 255, 255, 30))
+            
+            draw.text((x_position, y_position), line, font=desc_font, fill=(255, 255, 255, 255))
+            y_position += line_height
+        
+    def _encoder_settings(self) -> dict:
+        """
+        The encoder profile as keyword arguments of write_videofile and the pipe writers.
+        """
+        return {"codec": self.profile.codec, "bitrate": self.profile.bitrate, "preset": self.profile.preset,
+                "ffmpeg_params": self.profile.ffmpeg_params()}
+
+    def _sine_source(self, frequency: float) -> Optional[SineSource]:
+        return SineSource(frequency, self.video_duration) if self.audio_source == "synth" else None
+
+    def _audio_input(self, frequency: float, audio_path: Optional[str]):
+        """
+        Context manager yielding the ffmpeg input arguments of the video's audio track.
+        """
+        source = self._sine_source(frequency)
+        return source.serve() if source is not None else nullcontext(["-i", audio_path])
+
+    def _audio_codec(self, audio_path: Optional[str]) -> str:
+        if audio_path is not None and Path(audio_path).suffix == ".m4a":
+            return "copy"
+        return self.video_settings["audio_codec"]
+
+    def find_audio(self, frequency: float) -> str:
+        for extension in AUDIO_EXTENSIONS:
+            audio_path = self.audio_folder / f"{frequency}Hz.{extension}"
+            if audio_path.exists():
+                return str(audio_path)
+        raise FileNotFoundError(f"Audio file not found: {self.audio_folder / f'{frequency}Hz.mp3'}")
+
+    def create_video(self, frequency: float, audio_path: Optional[str] = None) -> str:
+        """
+        audio_path is only read with the "file" audio source.
+        """
+        video_path = self.videos_dir / f"{frequency}Hz_video.mp4"
+        source = self._sine_source(frequency)
+        inputs = dict(
+            self._render_inputs(frequency),
+            description=self.describe(frequency),
+            audio=source.params if source is not None else file_digest(audio_path),
+            video_duration=self.video_duration,
+            video_settings=self.video_settings,
+            encoder_profile=self.profile._asdict(),
+            render_mode=self.render_mode,
+            writer=self.writer
+        )
+        if self.aspect_sizes:
+            return self._create_aspect_videos(frequency, audio_path, inputs)
+        return self._build("video", video_path, inputs,
+                           lambda path: self._artifact("video", frequency,
+                                                       lambda: self._render_video(frequency, audio_path, path)))
+
+    def aspect_video_path(self, frequency: float, aspect: str) -> Path:
+        return self.videos_dir / f"{frequency}Hz_video_{aspect.replace(':', 'x')}.mp4"
+
+    def _create_aspect_videos(self, frequency: float, audio_path: Optional[str], inputs: dict) -> str:
+        """
+        Build the image_size video and one video per extra aspect ratio in one render,
+        caching each separately. Returns the image_size video's path.
+        """
+        inputs = dict(inputs, aspects=self.aspect_sizes)
+        targets = {"video": (self.videos_dir / f"{frequency}Hz_video.mp4", tuple(self.image_size))}
+        for aspect, size in self.aspect_sizes.items():
+            targets[f"video_{aspect}"] = (self.aspect_video_path(frequency, aspect), size)
+        artifacts = {kind: (path, dict(inputs, size=list(size))) for kind, (path, size) in targets.items()}
+        
+        def build(kinds):
+            selected = {kind: targets[kind] for kind in kinds}
+            atomic_write_all([path for path, _ in selected.values()],
+                             lambda paths: self._artifact("video", frequency, lambda: self._render_aspect_videos(
+                                 frequency, audio_path, {kind: (path, size) for (kind, (_, size)), path
+                                                         in zip(selected.items(), paths)})))
+        
+        if self.cache is None:
+            build(list(artifacts))
+        else:
+            self.cache.build_all(artifacts, build)
+        tracing.add(bytes=sum(os.path.getsize(path) for kind, (path, _) in targets.items() if kind != "video"))
+        return str(targets["video"][0])
+
+    def _pulsing_clip(self, image: Image.Image):
+        """
+        The image zooming with pulse_scale, anchored at its top-left corner. Returns the
+        clip and its frame cache, if enabled.
+        """
+        from moviepy.editor import ImageClip, vfx
+
+        base_clip = ImageClip(np.asarray(image)).set_duration(self.video_duration)
+        if self.frame_cache_mb > 0:
+            frame_cache = FrameCache(self.frame_cache_mb * 2**20, self.frame_cache_policy)
+            return self._cached_pulse(base_clip, pulse_scale, frame_cache), frame_cache
+        return base_clip.fx(vfx.resize, pulse_scale), None
+
+    def _render_aspect_videos(self, frequency: float, audio_path: Optional[str], targets: Dict[str, tuple]):
+        """
+        Render every target from one frame loop. Each frame's pulsing background is
+        computed once at the master size; a target crops its centre, with the crop origin
+        scaled by the pulse so each geometry zooms about its own top-left corner as a
+        separate render would, and composites its own reflowed text layer.
+        """
+        from moviepy.editor import VideoClip
+
+        master = self.master_image(frequency)
+        pulsing_clip, frame_cache = self._pulsing_clip(master)
+        
+        # Every target reads the same background frame at each t
+        last = {}
+        def background(t):
+            if last.get("t") != t:
+                last.update(t=t, frame=pulsing_clip.get_frame(t))
+            return last["frame"]
+        
+        outputs = []
+        with ExitStack() as stack:
+            for kind, (path, size) in targets.items():
+                if kind == "video":
+                    layer = np.asarray(self.text_layer(frequency))
+                else:
+                    layer = TextRenderer(self.font_path, size).render_layer(f"{frequency} Hz", self.describe(frequency))
+                offset_x, offset_y = (master.size[0] - size[0]) // 2, (master.size[1] - size[1]) // 2
+                
+                def crop(t, offset_x=offset_x, offset_y=offset_y, size=size):
+                    frame, scale = background(t), pulse_scale(t)
+                    x = min(int(round(offset_x * scale)), frame.shape[1] - size[0])
+                    y = min(int(round(offset_y * scale)), frame.shape[0] - size[1])
+                    return frame[y:y + size[1], x:x + size[0]]
+                
+                clip = OverlayCompositor(layer).clip(VideoClip(crop, duration=self.video_duration))
+                audio_input = stack.enter_context(self._audio_input(frequency, audio_path))
+                outputs.append(PipeOutput(clip, path, audio_input, self._audio_codec(audio_path)))
+            
+            stats = write_video_pipes(
+                outputs,
+                fps=self.video_settings["fps"],
+                **self._encoder_settings(),
+                threads=self.threads,
+                progress=self.progress
+            )
+        tracing.add(frames=stats["frames"] * len(outputs))
+        
+        if frame_cache is not None:
+            print(f"+ {frame_cache.report()}")
+        print(f"+ Rendered {len(targets)} geometries in one pass: "
+              + ", ".join(f"{size[0]}x{size[1]}" for _, size in targets.values()))
+        
+        if self.audio_source == "synth":
+            for path, _ in targets.values():
+                problems = check_audio_frequency(path, frequency, seconds=min(10, self.video_duration))
+                if problems:
+                    raise RuntimeError(f"Synthesized audio failed frequency check: {'; '.join(problems)}")
+            print(f"+ Audio frequency check passed ({frequency} Hz)")
+
+    def _render_video(self, frequency: float, audio_path: Optional[str], video_path: Path):
+        # Pulsing background from the base image without text, straight from memory
+        pulsing_clip, frame_cache = self._pulsing_clip(self.base_image(frequency))
+        
+        # Composite the stable text over the pulsing background
+        final_clip = OverlayCompositor(np.asarray(self.text_layer(frequency))).clip(pulsing_clip)
+        
+        if self.render_mode == "loop":
+            self._write_looped_video(final_clip, frequency, audio_path, video_path)
+        elif self.writer == "pipe":
+            with self._audio_input(frequency, audio_path) as audio_input:
+                write_video_pipe(
+                    final_clip,
+                    video_path,
+                    fps=self.video_settings["fps"],
+                    **self._encoder_settings(),
+                    threads=self.threads,
+                    audio_input=audio_input,
+                    audio_codec=self._audio_codec(audio_path),
+                    progress=self.progress
+                )
+        else:
+            source = self._sine_source(frequency)
+            # MoviePy's intermediate audio goes next to the temporary video, not the working directory
+            settings = dict(self.video_settings, **self._encoder_settings(), threads=self.threads,
+                            temp_audiofile=str(video_path.with_name(f"{video_path.stem}_audio.m4a")))
+            if source is not None:
+                final_clip = final_clip.set_audio(source.audio_clip())
+            elif self._audio_codec(audio_path) == "copy":
+                # write_videofile muxes an audio file name with -acodec copy
+                settings.update(audio=audio_path, ffmpeg_params=settings["ffmpeg_params"] + ["-t", str(self.video_duration)])
+            else:
+                from moviepy.editor import AudioFileClip
+
+                final_clip = final_clip.set_audio(AudioFileClip(audio_path).set_duration(self.video_duration))
+            final_clip.write_videofile(
+                str(video_path),
+                **settings,
+                logger="bar" if self.progress else None
+            )
+        if self.render_mode != "loop":
+            tracing.add(frames=int(self.video_duration * self.video_settings["fps"]))
+        
+        if frame_cache is not None:
+            print(f"+ {frame_cache.report()}")
+        
+        if self.audio_source == "synth":
+            problems = check_audio_frequency(video_path, frequency, seconds=min(10, self.video_duration))
+            if problems:
+                raise RuntimeError(f"Synthesized audio failed frequency check: {'; '.join(problems)}")
+            print(f"+ Audio frequency check passed ({frequency} Hz)")
+
+    def _write_looped_video(self, final_clip, frequency: float, audio_path: Optional[str], video_path: Path):
+        """
+        Encode one pulse period (plus a partial tail if the duration is not a whole
+        number of periods) with closed GOPs, then assemble the full video by stream copy.
+        """
+        fps = self.video_settings["fps"]
+        loop_frames = int(round(PULSE_PERIOD * fps))
+        # The closed GOPs come last, so they override the profile's keyframe interval
+        settings = self._encoder_settings()
+        settings["ffmpeg_params"] += closed_gop_params(loop_frames)
+        full_loops, remainder = divmod(self.video_duration, PULSE_PERIOD)
+        
+        def write_segment(duration, path):
+            tracing.add(frames=int(duration * fps))
+            if self.writer == "pipe":
+                write_video_pipe(final_clip.subclip(0, duration), path, fps=fps, **settings, threads=self.threads,
+                                 progress=self.progress)
+                return
+            final_clip.subclip(0, duration).write_videofile(
+                str(path),
+                fps=fps,
+                **settings,
+                threads=self.threads,
+                audio=False,
+                logger="bar" if self.progress else None
+            )
+        
+        segments = []
+        loop_path = video_path.with_name(f"{video_path.stem}_loop.mp4")
+        tail_path = video_path.with_name(f"{video_path.stem}_tail.mp4")
+        if full_loops:
+            write_segment(PULSE_PERIOD, loop_path)
+            segments += [loop_path] * int(full_loops)
+        if remainder:
+            write_segment(remainder, tail_path)
+            segments.append(tail_path)
+        
+        try:
+            with self._audio_input(frequency, audio_path) as audio_input:
+                concat_segments(segments, audio_input, self.video_duration, video_path,
+                                audio_codec=self._audio_codec(audio_path))
+        finally:
+            for segment in set(segments):
+                segment.unlink()
+        
+        problems = check_loop_timing(video_path, fps, self.video_duration, loop_frames)
+        if problems:
+            raise RuntimeError(f"Looped video failed timing check: {'; '.join(problems)}")
+        print(f"+ Loop timing check passed ({int(full_loops)} loops, {remainder}s tail)")
+
+    def _cached_pulse(self, base_clip, modify_time, frame_cache: FrameCache):
+        """
+        Equivalent of base_clip.fx(vfx.resize, modify_time) that resamples each distinct
+        frame once. The resizer output depends only on the integer target size, so
+        frames are keyed on that size and every later frame with the same size is replayed.
+        """
+        from moviepy.video.fx.resize import resizer
+
+        w, h = base_clip.size
+        
+        def pulse_frame(get_frame, t):
+            scale = modify_time(t)
+            size = (int(scale * w), int(scale * h))
+            return frame_cache.get(size, lambda: resizer(get_frame(t).astype('uint8'), size))
+        
+        return base_clip.fl(pulse_frame, keep_duration=True)
+
+    def process_frequency(self, frequency: float) -> Dict[str, str]:
+        print(f"\nProcessing {frequency} Hz...")
+        
+        description_path = str(self.descriptions_dir / f"{frequency}Hz_description.txt")
+        
+        def write_description():
+            self.generate_description(frequency)
+            return description_path
+        
+        try:
+            with tracing.span("frequency", frequency=frequency):
+                self._stage("description", frequency, write_description)
+                print(f"+ Generated description")
+            
+                image_path = self._stage("image", frequency, lambda: self.generate_image(frequency))
+                print(f"+ Generated image")
+            
+                image_with_text = self._stage("image_with_text", frequency, lambda: self.create_text_overlay(frequency))
+                print(f"+ Added text overlay")
+            
+                audio_path = self.find_audio(frequency) if self.audio_source == "file" else None
+                
+                video_path = self._stage("video", frequency, lambda: self.create_video(frequency, audio_path))
+                print(f"+ Created video: {video_path}")
+            
+                results = {
+                    "description": description_path,
+                    "image": image_path,
+                    "image_with_text": image_with_text,
+                    "video": video_path
+                }
+                for aspect in self.aspect_sizes:
+                    results[f"video_{aspect}"] = str(self.aspect_video_path(frequency, aspect))
+                return results
+        except Exception as e:
+            print(f"Error processing {frequency} Hz: {str(e)}")
+            raise
+        finally:
+            self.release(frequency)
+
+def plan_workers(jobs: int, cpu_count: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Split the available cores between parallel jobs and ffmpeg threads per job,
+    so that jobs * threads never exceeds the core count.
+    jobs <= 0 picks one job per VIDEO_SETTINGS["threads"] cores.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    if jobs <= 0:
+        jobs = max(1, cpu_count // VIDEO_SETTINGS["threads"])
+    threads = max(1, cpu_count // jobs)
+    return jobs, threads
+
+def _process_frequency_job(generator_options: dict, cache_dir: Optional[str], frequency: float,
+                           manifest_path: Optional[str] = None) -> dict:
+    """
+    Run process_frequency for one frequency with its own generator, cache and manifest handles.
+    Module-level so it can be sent to pool workers.
+    """
+    cache = BuildCache(cache_dir) if cache_dir is not None else None
+    generator = FrequencyVideoGenerator(cache=cache, **generator_options)
+    if manifest_path is not None:
+        generator.manifest = JobManifest(manifest_path, generator.manifest_config())
+    start = time.perf_counter()
+    try:
+        results = generator.process_frequency(frequency)
+        error = None
+    except Exception as e:
+        results = {}
+        error = str(e)
+    finally:
+        if generator.manifest is not None:
+            generator.manifest.close()
+    return {
+        "frequency": frequency,
+        "results": results,
+        "error": error,
+        "seconds": time.perf_counter() - start,
+        "cache_stats": dict(cache.stats) if cache is not None else {},
+        "stage_runs": {stage: count for (stage, _), count in generator.stage_runs.items()},
+        "resumed": generator.resumed,
+        "trace_totals": tracing.tracer.take_totals()
+    }
+
+def run_batch(frequencies: List[float], jobs: int = 1, cache: Optional[BuildCache] = None,
+              manifest_path: Optional[str] = None, resume: bool = False,
+              **generator_options) -> List[dict]:
+    """
+    Process every distinct frequency, in parallel when jobs != 1.
+    Each frequency is processed exactly once and its outputs are named by frequency
+    alone, so parallel and serial runs produce the same files.
+    With a manifest_path every stage is recorded as it runs; resume=True skips the
+    stages a previous run finished, otherwise the manifest starts empty.
+    Returns one record per frequency in input order.
+    """
+    unique_frequencies = list(dict.fromkeys(frequencies))
+    if not unique_frequencies:
+        return []
+
+    if manifest_path is not None:
+        manifest = JobManifest(manifest_path)
+        if resume:
+            print(f"\nResuming from {manifest_path}: " +
+                  (", ".join(f"{count} {status}" for status, count in sorted(manifest.summary().items())) or "empty"))
+            output_folder = Path(generator_options.get("output_folder", "output_videos"))
+            removed = sum(remove_temp_files(output_folder / name) for name in ("descriptions", "images", "videos")
+                          if (output_folder / name).is_dir())
+            if removed:
+                print(f"- Removed {removed} partial file(s) from the interrupted run")
+        else:
+            manifest.reset()
+        manifest.close()
+
+    jobs = min(plan_workers(jobs)[0], len(unique_frequencies))
+    jobs, threads = plan_workers(jobs)
+    generator_options = dict(generator_options, threads=threads, progress=jobs == 1)
+    cache_dir = str(cache.cache_dir) if cache is not None else None
+    print(f"\nRunning {len(unique_frequencies)} frequencies with {jobs} job(s) x {threads} ffmpeg thread(s)")
+
+    if jobs == 1:
+        records = [_process_frequency_job(generator_options, cache_dir, freq, manifest_path) for freq in unique_frequencies]
+    else:
+        records = []
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_process_frequency_job, generator_options, cache_dir, freq, manifest_path)
+                       for freq in unique_frequencies]
+            for future in as_completed(futures):
+                record = future.result()
+                status = "+ Finished" if record["error"] is None else "- Failed"
+                print(f"{status} {record['frequency']} Hz in {record['seconds']:.1f}s")
+                records.append(record)
+        records.sort(key=lambda record: unique_frequencies.index(record["frequency"]))
+
+    for record in records:
+        if cache is not None:
+            cache.merge_stats(record["cache_stats"])
+        tracing.tracer.merge_totals(record["trace_totals"])
+    return records
+
+def print_batch_summary(records: List[dict], wall_seconds: float, duplicates: int = 0):
+    succeeded = [record for record in records if record["error"] is None]
+    failed = [record for record in records if record["error"] is not None]
+    job_seconds = sum(record["seconds"] for record in records)
+
+    print("\n=== Batch Summary ===")
+    for record in records:
+        status = "ok" if record["error"] is None else f"FAILED: {record['error']}"
+        print(f"  {record['frequency']:>8} Hz  {record['seconds']:8.1f}s  {status}")
+    print(f"- {len(succeeded)} succeeded, {len(failed)} failed, {duplicates} duplicate(s) skipped")
+    resumed = sum(len(record.get("resumed", [])) for record in records)
+    if resumed:
+        print(f"- {resumed} stage(s) resumed from the job manifest")
+    print(f"- Wall time {wall_seconds:.1f}s, summed job time {job_seconds:.1f}s "
+          f"({job_seconds / wall_seconds if wall_seconds else 0:.2f}x parallelism)")
+
+def add_arguments(parser):
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Frequencies processed in parallel (0 = one per 4 cores)")
+    parser.add_argument("--frame-cache-mb", type=int, default=1024,
+                        help="Memory budget per video for cached pulse frames (0 disables)")
+    parser.add_argument("--frame-cache-policy", choices=EVICTION_POLICIES, default="lru")
+    parser.add_argument("--render-mode", choices=RENDER_MODES, default="full",
+                        help="'loop' encodes one pulse period and repeats it by stream copy")
+    parser.add_argument("--writer", choices=VIDEO_WRITERS, default="moviepy",
+                        help="'pipe' streams frames straight into ffmpeg instead of write_videofile")
+    parser.add_argument("--audio-source", choices=AUDIO_SOURCES, default="file",
+                        help="'synth' synthesizes each tone while encoding instead of reading its MP3")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip every stage the job manifest records as finished in an earlier run")
+    parser.add_argument("--clean", action="store_true",
+                        help="Delete every directory except generated_frequencies before starting")
+    parser.add_argument("--preview", action="store_true",
+                        help=f"Render {PREVIEW_SCALE:g}x scale, {PREVIEW_DURATION}s previews into output_videos/preview "
+                             f"with a fast encode, plus a contact sheet")
+    parser.add_argument("--contact-sheet", action="store_true",
+                        help="Write contact_sheet.jpg of every frequency's image into the output folder")
+    parser.add_argument("--aspects", type=lambda value: tuple(aspect for aspect in value.split(",") if aspect),
+                        default=(), help=f"Extra geometries rendered in the same frame loop as the 9:16 video, "
+                                     f"e.g. 1:1,16:9 (any of {', '.join(ASPECT_RATIOS)})")
+    parser.add_argument("--profile", choices=PROFILES, default=None,
+                        help=f"Encoder profile (default {DEFAULT_RENDER_PROFILE}, or {PREVIEW_PROFILE} with --preview); "
+                             f"python encoder_profiles.py tune picks one")
+    tracing.add_arguments(parser)
+
+def check_arguments(parser, args):
+    for aspect in args.aspects:
+        if aspect not in ASPECT_RATIOS:
+            parser.error(f"unknown aspect ratio {aspect!r} (expected one of {', '.join(ASPECT_RATIOS)})")
+    if args.aspects and args.render_mode == "loop":
+        parser.error("--aspects cannot be combined with --render-mode loop")
+    if args.resume and args.clean:
+        parser.error("--resume and --clean cannot be combined")
+
+def generator_options(args) -> dict:
+    """
+    The FrequencyVideoGenerator settings of a batch run with these arguments.
+    """
+    output_folder = Path("output_videos")
+    options = {"video_duration": 300}
+    if args.preview:
+        output_folder /= "preview"
+        options = preview_options()
+    if args.profile is not None:
+        options["profile"] = args.profile
+    return dict(
+        audio_folder="generated_frequencies",
+        output_folder=str(output_folder),
+        **options,
+        frame_cache_mb=args.frame_cache_mb,
+        frame_cache_policy=args.frame_cache_policy,
+        render_mode=args.render_mode,
+        writer=args.writer,
+        audio_source=args.audio_source,
+        aspects=args.aspects
+    )
+
+def plan_work(args) -> List[Tuple[str, Optional[str]]]:
+    """
+    (stage, None) for every stage run(args) would process and (stage, reason) for the
+    ones it would resume, without rendering anything.
+    """
+    options = generator_options(args)
+    manifest_path = Path(options["output_folder"]) / Path(MANIFEST_FILE).name
+    frequencies = list(dict.fromkeys(FREQUENCIES))
+    done = set()
+    if args.resume and manifest_path.exists():
+        # A previous run created the output directories; the generator would only announce them
+        with redirect_stdout(io.StringIO()):
+            config = FrequencyVideoGenerator(**options).manifest_config()
+        manifest = JobManifest(str(manifest_path), config)
+        done = {(frequency, stage) for frequency in frequencies for stage in MANIFEST_STAGES
+                if manifest.is_done(frequency, stage)}
+        manifest.close()
+    return [(f"{frequency} Hz {stage}", "done in the job manifest" if (frequency, stage) in done else None)
+            for frequency in frequencies for stage in MANIFEST_STAGES]
+
+def run(args):
+    tracing.configure(args.trace, args.metrics)
+
+    if args.clean:
+        print("\nCleaning up directories...")
+        cleanup_directories()
+
+    if args.audio_source == "file" and not Path("generated_frequencies").exists():
+        print("Error: 'generated_frequencies' folder not found!")
+        print("Please make sure your audio files are in the 'generated_frequencies' folder.")
+        return
+
+    options = generator_options(args)
+    output_folder = Path(options["output_folder"])
+    if args.preview:
+        print(f"\nPreview mode: {options['image_size'][0]}x{options['image_size'][1]}, "
+              f"{options['video_duration']}s at {PREVIEW_VIDEO_SETTINGS['fps']} fps")
+    
+    print("\nStarting video generation process...")
+    
+    cache = BuildCache()
+    start = time.perf_counter()
+    records = run_batch(
+        FREQUENCIES,
+        jobs=args.jobs,
+        cache=cache,
+        manifest_path=str(output_folder / Path(MANIFEST_FILE).name),
+        resume=args.resume,
+        **options
+    )
+    
+    for record in records:
+        if record["error"] is None:
+            print(f"\nSuccessfully processed {record['frequency']} Hz:")
+            for key, path in record["results"].items():
+                print(f"  + {key}: {path}")
+    
+    print_batch_summary(records, time.perf_counter() - start, len(FREQUENCIES) - len(records))
+    print(f"\n{cache.report()}")
+    if args.metrics:
+        tracing.tracer.write_metrics()
+        print(f"+ Stage metrics written to {args.metrics}")
+    
+    if args.preview or args.contact_sheet:
+        tiles = [(f"{record['frequency']} Hz", record["results"]["image_with_text"])
+                 for record in records if record["error"] is None]
+        if tiles:
+            sheet = make_contact_sheet(tiles, output_folder / "contact_sheet.jpg")
+            print(f"+ Contact sheet of {len(tiles)} frequencies: {sheet}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate frequency videos")
+    add_arguments(parser)
+    args = parser.parse_args()
+    check_arguments(parser, args)
+    run(args)
+
+if __name__ == "__main__":
+    try:
+        print("\n=== Frequency Video Generator for TikTok ===")
+        print("Initializing...")
+        main()
+        print("\nProcess completed!")
+        
+    except KeyboardInterrupt:
+        print("\n\nProcess interrupted by user")
+        print("Partial results have been saved; run with --resume to continue where this run stopped")
+    except Exception as e:
+        print(f"\n\nAn error occurred: {str(e)}")
+        print("Please check your input files and try again")
+    finally:
+        print("\n=== Summary ===")
+        print("- Check the output_videos folder for your generated content")
+        print("- Each frequency has its own video file")
+        print("- Videos are optimized for TikTok (1080x1920)")
         print("\nThank you for using the Frequency Video Generator!")
\ No newline at end of file
@@ -1,65 +1,249 @@
-import numpy as np
-import soundfile as sf
-import lameenc
-import os
-
-# Directory to save the MP3 output files
-output_folder = "generated_frequencies"
-os.makedirs(output_folder, exist_ok=True)
-
-# Frequencies in Hz
-frequencies = [
-    174, 285, 396, 417, 432, 444, 528, 639, 741, 852,
-    963, 100, 111, 120, 144, 174, 200, 210, 222, 285,
-    300, 333, 350, 396, 417, 432, 444, 480, 500, 528,
-    540, 555, 582, 600, 639, 693, 700, 741, 777, 800,
-    852, 888, 900, 936, 963, 1000, 1020, 1111, 1200, 1222,
-    136.1, 150, 174, 194, 210, 285, 324, 417, 528, 600,
-    639, 852, 963, 7.83, 3, 6, 8, 10, 12, 15,
-    20, 25, 30, 40, 50, 60, 70, 80, 90, 100,
-    150, 200, 250, 300, 350, 400, 450, 500, 550, 600
-]
-
-
-# Audio properties
-duration = 300  # Duration in seconds (5 minutes)
-sample_rate = 44100  # Sample rate
-
-def generate_sine_wave(frequency, duration, sample_rate):
-    t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-    audio_data = 0.5 * np.sin(2 * np.pi * frequency * t)
-    return (audio_data * 32767).astype(np.int16)  # Convert to 16-bit PCM format
-
-def convert_wav_to_mp3(wav_filename, mp3_filename, sample_rate):
-    # Read WAV file data for encoding
-    audio_data, _ = sf.read(wav_filename, dtype='int16')
-    
-    # Encode to MP3
-    encoder = lameenc.Encoder()
-    encoder.set_bit_rate(192)
-    encoder.set_in_sample_rate(sample_rate)
-    encoder.set_channels(1)
-    encoder.set_quality(2)  # Highest quality
-
-    mp3_data = encoder.encode(audio_data) + encoder.flush()
-
-    with open(mp3_filename, "wb") as f:
-        f.write(mp3_data)
-
-# Generate and convert each frequency directly to MP3
-for freq in frequencies:
-    # Generate sine wave audio data
-    audio_data = generate_sine_wave(freq, duration, sample_rate)
-
-    # Save as temporary WAV file
-    wav_filename = os.path.join(output_folder, f"{freq}Hz.wav")
-    sf.write(wav_filename, audio_data, sample_rate)
-
-    # Define MP3 filename and convert WAV to MP3
-    mp3_filename = os.path.join(output_folder, f"{freq}Hz.mp3")
-    convert_wav_to_mp3(wav_filename, mp3_filename, sample_rate)
-
-    print(f"Generated {mp3_filename}")
-
-    # Remove the intermediate WAV file
-    os.remove(wav_filename)
+import numpy as np
+import argparse
+import os
+import subprocess
+from build_cache import BuildCache, CACHE_DIR, temp_path_for
+from audio_source import generate_sine_chunks
+from mp3_period import encode_periodic_mp3
+from ffmpeg_tools import ffmpeg_binary
+
+# Directory to save the audio output files
+output_folder = "generated_frequencies"
+
+# Frequencies in Hz
+frequencies = [
+    174, 285, 396, 417, 432, 444, 528, 639, 741, 852,
+    963, 100, 111, 120, 144, 174, 200, 210, 222, 285,
+    300, 333, 350, 396, 417, 432, 444, 480, 500, 528,
+    540, 555, 582, 600, 639, 693, 700, 741, 777, 800,
+    852, 888, 900, 936, 963, 1000, 1020, 1111, 1200, 1222,
+    136.1, 150, 174, 194, 210, 285, 324, 417, 528, 600,
+    639, 852, 963, 7.83, 3, 6, 8, 10, 12, 15,
+    20, 25, 30, 40, 50, 60, 70, 80, 90, 100,
+    150, 200, 250, 300, 350, 400, 450, 500, 550, 600
+]
+
+
+# Audio properties
+duration = 300  # Duration in seconds (5 minutes)
+sample_rate = 44100  # Sample rate
+bit_rate = 192  # MP3 bitrate in kbps
+chunk_size = 65536  # Samples synthesized and encoded per block in streaming mode
+
+# ffmpeg encoder settings per output format; MP3 is encoded in-process by lameenc.
+# The M4A is stream-copied into the videos and platform outputs instead of re-encoded,
+# so it uses the same default-bitrate AAC encode the video stage used to run.
+audio_formats = {
+    "mp3": None,
+    "m4a": ["-c:a", "aac"],
+    "opus": ["-c:a", "libopus", "-b:a", "96k"],
+}
+default_formats = ["mp3", "m4a"]
+
+def generate_sine_wave(frequency, duration, sample_rate):
+    t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
+    audio_data = 0.5 * np.sin(2 * np.pi * frequency * t)
+    return (audio_data * 32767).astype(np.int16)  # Convert to 16-bit PCM format
+
+def create_mp3_encoder(sample_rate):
+    import lameenc
+
+    encoder = lameenc.Encoder()
+    encoder.set_bit_rate(bit_rate)
+    encoder.set_in_sample_rate(sample_rate)
+    encoder.set_channels(1)
+    encoder.set_quality(2)  # Highest quality
+    return encoder
+
+def convert_wav_to_mp3(wav_filename, mp3_filename, sample_rate):
+    import soundfile as sf
+
+    # Read WAV file data for encoding
+    audio_data, _ = sf.read(wav_filename, dtype='int16')
+    
+    # Encode to MP3
+    encoder = create_mp3_encoder(sample_rate)
+    mp3_data = encoder.encode(audio_data) + encoder.flush()
+
+    with open(mp3_filename, "wb") as f:
+        f.write(mp3_data)
+
+def stream_sine_to_mp3(frequency, duration, sample_rate, mp3_filename, chunk_size=chunk_size):
+    """
+    Synthesize the tone block by block and write MP3 frames as the encoder emits them,
+    without an intermediate WAV file or a full-length sample buffer.
+    """
+    encode_tone(generate_sine_chunks(frequency, duration, sample_rate, chunk_size), sample_rate,
+                {"mp3": mp3_filename})
+
+def encode_tone(chunks, sample_rate, paths):
+    """
+    Encode one pass over 16-bit PCM blocks into every format in paths (format -> file name).
+    MP3 goes through lameenc; all other formats share one ffmpeg process fed on stdin.
+    """
+    ffmpeg_outputs = []
+    for audio_format, path in paths.items():
+        if audio_format != "mp3":
+            ffmpeg_outputs += audio_formats[audio_format] + [path]
+
+    process = None
+    if ffmpeg_outputs:
+        process = subprocess.Popen(
+            [ffmpeg_binary(), "-y", "-v", "error", "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "-"]
+            + ffmpeg_outputs,
+            stdin=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+    encoder = create_mp3_encoder(sample_rate) if "mp3" in paths else None
+    mp3_file = open(paths["mp3"], "wb") if encoder is not None else None
+
+    try:
+        for chunk in chunks:
+            if encoder is not None:
+                mp3_file.write(encoder.encode(chunk))
+            if process is not None:
+                process.stdin.write(chunk.astype("<i2", copy=False).tobytes())
+        if encoder is not None:
+            mp3_file.write(encoder.flush())
+    except BrokenPipeError:
+        pass  # ffmpeg exited early; its error output is reported below
+    finally:
+        if mp3_file is not None:
+            mp3_file.close()
+        if process is not None:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            error = process.stderr.read()
+            if process.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed: {error.decode(errors='replace').strip()}")
+
+def parse_formats(value):
+    formats = [audio_format.strip() for audio_format in value.split(",") if audio_format.strip()]
+    unknown = [audio_format for audio_format in formats if audio_format not in audio_formats]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown format(s) {unknown}, expected some of {list(audio_formats)}")
+    return formats
+
+def format_inputs(freq, audio_format, args):
+    """
+    Everything that determines one output file, for cache keys.
+    """
+    inputs = {
+        "frequency": freq,
+        "duration": args.duration,
+        "sample_rate": sample_rate,
+        "bit_rate": bit_rate,
+        "synthesis": "stream" if args.stream else "wav",
+    }
+    if audio_format == "mp3" and args.period:
+        inputs["synthesis"] = "period"
+        inputs["gapless_header"] = not args.no_gapless_header
+    if audio_format != "mp3":
+        inputs["encoder"] = audio_formats[audio_format]
+    return inputs
+
+def output_path(freq, audio_format):
+    return os.path.join(output_folder, f"{freq}Hz.{audio_format}")
+
+def add_arguments(parser):
+    parser.add_argument("--stream", action="store_true",
+                        help="Synthesize and encode in blocks without a temporary WAV file")
+    parser.add_argument("--duration", type=float, default=duration,
+                        help="Duration of each file in seconds")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Rebuild every file instead of reusing cached artifacts")
+    parser.add_argument("--formats", type=parse_formats, default=default_formats,
+                        help=f"Comma-separated output formats, encoded in one synthesis pass "
+                             f"(any of {', '.join(audio_formats)}; default {','.join(default_formats)})")
+    parser.add_argument("--period", action="store_true",
+                        help="Encode one loop block of each tone's MP3 and repeat its frames for the full "
+                             "duration, when the tone's period allows it")
+    parser.add_argument("--no-gapless-header", action="store_true",
+                        help="Omit the LAME Info header with encoder delay and padding in --period mode")
+
+def plan_work(args):
+    """
+    (file, None) for every file run(args) would encode and (file, reason) for the
+    ones it would take from the cache, without writing anything.
+    """
+    cache = BuildCache() if not args.no_cache and os.path.isdir(CACHE_DIR) else None
+    work = []
+    for freq in dict.fromkeys(frequencies):
+        for audio_format in args.formats:
+            cached = cache is not None and cache.contains(audio_format, format_inputs(freq, audio_format, args))
+            work.append((output_path(freq, audio_format), "cached" if cached else None))
+    return work
+
+def run(args):
+    os.makedirs(output_folder, exist_ok=True)
+
+    cache = None if args.no_cache else BuildCache()
+
+    # Generate each frequency and encode it to every requested format
+    for freq in frequencies:
+        paths = {audio_format: output_path(freq, audio_format) for audio_format in args.formats}
+
+        def write_formats(targets):
+            if args.period and "mp3" in targets:
+                seams = encode_periodic_mp3(freq, args.duration, sample_rate, bit_rate, targets["mp3"],
+                                            gapless_header=not args.no_gapless_header)
+                if seams is not None:
+                    del targets["mp3"]
+                    if not targets:
+                        return
+            if args.stream:
+                encode_tone(generate_sine_chunks(freq, args.duration, sample_rate, chunk_size), sample_rate, targets)
+                return
+
+            # Generate sine wave audio data
+            audio_data = generate_sine_wave(freq, args.duration, sample_rate)
+
+            if "mp3" in targets:
+                import soundfile as sf
+
+                # Save as temporary WAV file
+                wav_filename = os.path.join(output_folder, f"{freq}Hz.wav")
+                sf.write(wav_filename, audio_data, sample_rate)
+
+                # Convert WAV to MP3
+                convert_wav_to_mp3(wav_filename, targets.pop("mp3"), sample_rate)
+
+                # Remove the intermediate WAV file
+                os.remove(wav_filename)
+
+            # The other formats are encoded from the same samples
+            if targets:
+                encode_tone([audio_data], sample_rate, targets)
+
+        def build_formats(formats):
+            # Write under temporary names and rename, so an interrupted run leaves no partial files
+            temp_paths = {audio_format: str(temp_path_for(paths[audio_format])) for audio_format in formats}
+            try:
+                write_formats(dict(temp_paths))
+                for audio_format, temp_path in temp_paths.items():
+                    os.replace(temp_path, paths[audio_format])
+            finally:
+                for temp_path in temp_paths.values():
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+
+        if cache is None:
+            build_formats(args.formats)
+        else:
+            artifacts = {audio_format: (paths[audio_format], format_inputs(freq, audio_format, args))
+                         for audio_format in args.formats}
+            cache.build_all(artifacts, build_formats)
+
+        print(f"Generated {', '.join(paths.values())}")
+
+    if cache is not None:
+        print(cache.report())
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate sine tone audio files")
+    add_arguments(parser)
+    run(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
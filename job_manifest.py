@@ -0,0 +1,128 @@
+"""
+Persistent per-stage state of a frequency video batch, for resuming interrupted runs.
+
+Every (frequency, stage) job has one row in a SQLite database holding its status
+(running, done or failed), its output file and size, the attempt count and the last
+error. Each update is its own transaction, so the manifest survives a crash at any
+point, and parallel worker processes share it safely. A run started with --resume
+skips every stage that finished under the same generator settings and whose output
+is still on disk with the recorded size.
+
+Usage:
+    python job_manifest.py status [--manifest output_videos/job_manifest.sqlite]
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+MANIFEST_FILE = "output_videos/job_manifest.sqlite"
+
+
+class JobManifest:
+    def __init__(self, path: str = MANIFEST_FILE, config: Optional[dict] = None):
+        """
+        config holds the settings that determine the outputs; jobs recorded under
+        different settings are never treated as done.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps(config or {}, sort_keys=True, default=str)
+        self.config = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        self.connection = sqlite3.connect(str(self.path), timeout=60)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " frequency TEXT, stage TEXT, status TEXT, output TEXT, size INTEGER,"
+                " config TEXT, attempts INTEGER DEFAULT 0, error TEXT, updated REAL,"
+                " PRIMARY KEY (frequency, stage))"
+            )
+
+    def close(self):
+        self.connection.close()
+
+    def reset(self):
+        """
+        Forget every job, e.g. at the start of a run that does not resume.
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM jobs")
+
+    def state(self, frequency: float, stage: str) -> Optional[dict]:
+        cursor = self.connection.execute(
+            "SELECT status, output, size, config, attempts, error FROM jobs WHERE frequency = ? AND stage = ?",
+            (str(frequency), stage)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip(("status", "output", "size", "config", "attempts", "error"), row))
+
+    def is_done(self, frequency: float, stage: str) -> bool:
+        """
+        True if the stage finished under the current settings and its output is intact.
+        """
+        state = self.state(frequency, stage)
+        if state is None or state["status"] != "done" or state["config"] != self.config:
+            return False
+        output = Path(state["output"])
+        return output.is_file() and output.stat().st_size == state["size"]
+
+    def output(self, frequency: float, stage: str) -> str:
+        return self.state(frequency, stage)["output"]
+
+    def start(self, frequency: float, stage: str):
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO jobs (frequency, stage, status, config, attempts, updated) VALUES (?, ?, 'running', ?, 1, ?)"
+                " ON CONFLICT (frequency, stage) DO UPDATE SET status = 'running', config = excluded.config,"
+                " attempts = attempts + 1, error = NULL, updated = excluded.updated",
+                (str(frequency), stage, self.config, time.time())
+            )
+
+    def finish(self, frequency: float, stage: str, output):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = 'done', output = ?, size = ?, updated = ? WHERE frequency = ? AND stage = ?",
+                (str(output), Path(output).stat().st_size, time.time(), str(frequency), stage)
+            )
+
+    def fail(self, frequency: float, stage: str, error: str):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE frequency = ? AND stage = ?",
+                (error, time.time(), str(frequency), stage)
+            )
+
+    def summary(self) -> Counter:
+        """
+        Number of jobs per status.
+        """
+        return Counter(dict(self.connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the batch job manifest")
+    parser.add_argument("command", choices=["status"])
+    parser.add_argument("--manifest", default=MANIFEST_FILE)
+    args = parser.parse_args()
+
+    if not Path(args.manifest).exists():
+        print(f"{args.manifest}: no manifest")
+        return
+    manifest = JobManifest(args.manifest)
+    rows = manifest.connection.execute(
+        "SELECT frequency, stage, status, attempts, error FROM jobs ORDER BY CAST(frequency AS REAL), stage"
+    ).fetchall()
+    for frequency, stage, status, attempts, error in rows:
+        print(f"  {frequency:>8} Hz  {stage:<16} {status:<8} {attempts} attempt(s)" + (f"  {error}" if error else ""))
+    print(f"{args.manifest}: " + ", ".join(f"{count} {status}" for status, count in sorted(manifest.summary().items())))
+    manifest.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Helpers for the "loop" render mode of FrequencyVideoGenerator.
+
+The generated videos are visually periodic, so one loop segment is encoded with
+closed GOPs and the full-length MP4 is assembled from copies of it with ffmpeg's
+concat demuxer and stream copy. Only the audio track is encoded at mux time.
+"""
+from fractions import Fraction
+from pathlib import Path
+from typing import List, Union
+
+from ffmpeg_tools import run_ffmpeg
+
+
+def closed_gop_params(gop_frames: int) -> List[str]:
+    """
+    x264 options that start the segment with an IDR frame and keep every GOP
+    self-contained, so segments can be concatenated without re-encoding.
+    """
+    return [
+        "-g", str(gop_frames),
+        "-keyint_min", str(gop_frames),
+        "-sc_threshold", "0",
+        "-flags", "+cgop"
+    ]
+
+
+def concat_segments(segment_paths: List[Path], audio: Union[str, List[str]], duration: float, output_path: Path,
+                    audio_codec: str = "aac"):
+    """
+    Stream-copy the video segments back to back and mux in the first `duration`
+    seconds of audio, encoded with audio_codec ("copy" for AAC sources). audio is a
+    file path or the ffmpeg input arguments of any other source, such as a SineSource socket.
+    """
+    audio_input = ["-i", audio] if isinstance(audio, (str, Path)) else audio
+    output_path = Path(output_path)
+    list_path = output_path.with_name(f"{output_path.stem}_segments.txt")
+    list_path.write_text("".join(f"file '{Path(p).resolve().as_posix()}'\n" for p in segment_paths))
+
+    try:
+        run_ffmpeg([
+            "-y",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-t", duration, *audio_input,
+            "-map", "0:v", "-map", "1:a",
+            "-c:v", "copy", "-c:a", audio_codec,
+            output_path
+        ])
+    finally:
+        list_path.unlink()
+
+
+def probe_packets(path, stream: str) -> tuple:
+    """
+    Read one stream ("v" or "a") without decoding it and return
+    (time_base, [(pts, duration, crc, keyframe), ...]) in presentation order.
+    """
+    output = run_ffmpeg(["-i", path, "-map", f"0:{stream}", "-c", "copy", "-f", "framecrc", "-"])
+
+    time_base = None
+    packets = []
+    for line in output.splitlines():
+        if line.startswith("#tb 0:"):
+            time_base = Fraction(line.split(":", 1)[1].strip())
+        elif line and not line.startswith("#"):
+            fields = [field.strip() for field in line.split(",")]
+            # framecrc only prints packet flags when they differ from "keyframe"
+            keyframe = len(fields) == 6
+            packets.append((int(fields[2]), int(fields[3]), fields[5], keyframe))
+    return time_base, sorted(packets)
+
+
+def check_loop_timing(video_path, fps: int, duration: float, loop_frames: int) -> List[str]:
+    """
+    Verify a looped video from its packets: video timestamps advance by exactly one
+    frame across every loop boundary, each loop restarts on the same IDR frame, and
+    the audio track starts and ends with the video. Returns a list of problems.
+    """
+    problems = []
+    expected_frames = int(round(duration * fps))
+
+    video_base, video_frames = probe_packets(video_path, "v")
+    if len(video_frames) != expected_frames:
+        problems.append(f"expected {expected_frames} video frames, found {len(video_frames)}")
+
+    frame_step = 1 / (fps * video_base)
+    for index, (pts, _, _, _) in enumerate(video_frames):
+        if pts != index * frame_step:
+            problems.append(f"video frame {index} has pts {pts}, expected {index * frame_step}")
+            break
+
+    first_crc = video_frames[0][2] if video_frames else None
+    for index in range(loop_frames, len(video_frames), loop_frames):
+        _, _, crc, keyframe = video_frames[index]
+        # A trailing partial loop is encoded separately, so only its IDR flag can be compared
+        full_loop = index + loop_frames <= len(video_frames)
+        if not keyframe or (full_loop and crc != first_crc):
+            problems.append(f"loop boundary at frame {index} does not restart on the loop's first keyframe")
+
+    audio_base, audio_frames = probe_packets(video_path, "a")
+    if not audio_frames:
+        problems.append("no audio frames")
+    else:
+        audio_start = audio_frames[0][0] * audio_base
+        audio_end = (audio_frames[-1][0] + audio_frames[-1][1]) * audio_base
+        tolerance = Fraction(1, fps)
+        if abs(audio_start) > tolerance:
+            problems.append(f"audio starts at {float(audio_start):.3f}s")
+        if abs(audio_end - Fraction(duration)) > tolerance:
+            problems.append(f"audio ends at {float(audio_end):.3f}s, video ends at {duration}s")
+
+    return problems
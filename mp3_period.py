@@ -0,0 +1,223 @@
+"""
+Period-based MP3 encoding for constant tones.
+
+A sine at a rational frequency repeats exactly every `tone_period` samples (1225 samples
+for 432 Hz at 44.1 kHz). A loop block that is a whole number of tone periods and of
+CBR padding cycles (49 frames of 1152 samples at 192 kbps and 44.1 kHz) therefore starts
+every MP3 frame on the same phase and with the same frame size. With the bit reservoir disabled each frame holds only
+its own bits, so once the encoder has settled the frames of one block repeat byte for
+byte. encode_periodic_mp3 encodes just enough of the tone to reach that steady block
+and the file's ending, then builds the full duration by repeating the block's frames.
+Encoding cost depends on the block length instead of the duration.
+
+An optional LAME "Info" header records the encoder delay and padding, so decoders trim
+the output to the exact sample count. check_seams decodes a file and verifies the phase
+of the tone is continuous across every repeated-block boundary.
+"""
+import math
+from fractions import Fraction
+from typing import List, Optional
+
+import numpy as np
+
+from ffmpeg_tools import read_ffmpeg
+
+SAMPLES_PER_FRAME = 1152  # MPEG-1 Layer III
+ENCODER_DELAY = 576  # Samples LAME prepends before the first input sample
+DECODER_DELAY = 529  # Samples of MDCT delay added by decoders
+MPEG1_BITRATES = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+MPEG1_SAMPLE_RATES = [44100, 48000, 32000]
+SIDE_INFO_BYTES = {1: 17, 2: 32}  # MPEG-1 side information size per channel count
+
+
+def tone_period(frequency, sample_rate: int) -> int:
+    """
+    Samples after which a sine of this frequency repeats exactly, e.g. 1225 for 432 Hz
+    at 44.1 kHz. Decimal frequencies such as 136.1 are taken at their written value.
+    """
+    return (Fraction(str(frequency)) / sample_rate).denominator
+
+
+def padding_cycle(sample_rate: int, bit_rate: int) -> int:
+    """
+    Frames after which a CBR stream's padding slots repeat, e.g. 49 for 192 kbps at
+    44.1 kHz, where frames average 626 46/49 bytes.
+    """
+    return Fraction(144 * bit_rate * 1000, sample_rate).denominator
+
+
+def loop_block_samples(frequency, sample_rate: int, bit_rate: int) -> int:
+    """
+    Shortest whole number of tone periods that is also a whole number of padding cycles,
+    so every frame of one block has the phase and frame size of the next block's.
+    """
+    period = tone_period(frequency, sample_rate)
+    cycle = SAMPLES_PER_FRAME * padding_cycle(sample_rate, bit_rate)
+    return period * cycle // math.gcd(period, cycle)
+
+
+def periodic_tone(frequency, sample_rate: int, count: int, amplitude: float = 0.5) -> np.ndarray:
+    """
+    16-bit samples of the tone with the phase computed in exact integer arithmetic,
+    so every period is bit-identical.
+    """
+    step = Fraction(str(frequency)) / sample_rate
+    period = step.denominator
+    cycles = (step.numerator * np.arange(period, dtype=np.int64)) % period / period
+    one_period = (amplitude * np.sin(2 * np.pi * cycles) * 32767).astype(np.int16)
+    return np.resize(one_period, count)
+
+
+def split_frames(data: bytes) -> List[bytes]:
+    """
+    Split an MPEG-1 Layer III stream without tags into its frames.
+    """
+    frames = []
+    position = 0
+    while position + 4 <= len(data):
+        header = int.from_bytes(data[position:position + 4], "big")
+        if header >> 21 != 0x7FF or (header >> 19) & 3 != 3 or (header >> 17) & 3 != 1:
+            raise ValueError(f"not an MPEG-1 Layer III frame at byte {position}")
+        bitrate = MPEG1_BITRATES[(header >> 12) & 15] * 1000
+        sample_rate = MPEG1_SAMPLE_RATES[(header >> 10) & 3]
+        size = 144 * bitrate // sample_rate + ((header >> 9) & 1)
+        frames.append(data[position:position + size])
+        position += size
+    return frames
+
+
+def _crc16(data: bytes) -> int:
+    # CRC-16/ARC, the checksum of the LAME tag
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def info_frame(first_frame: bytes, frame_count: int, audio_bytes: int, padding: int, bit_rate: int) -> bytes:
+    """
+    A CBR "Info" frame with a LAME tag: frame and byte counts, a linear seek table, and
+    the encoder delay and padding that gapless decoders trim.
+    """
+    header = bytearray(first_frame[:4])
+    header[2] &= ~0x02  # No padding slot
+    channels = 1 if header[3] >> 6 == 3 else 2
+    sample_rate = MPEG1_SAMPLE_RATES[(header[2] >> 2) & 3]
+    size = 144 * bit_rate * 1000 // sample_rate
+    total_bytes = size + audio_bytes
+
+    tag = bytearray(b"Info")
+    tag += (0x0F).to_bytes(4, "big")  # Frames, bytes, TOC and quality fields present
+    tag += frame_count.to_bytes(4, "big")
+    tag += total_bytes.to_bytes(4, "big")
+    tag += bytes(index * 256 // 100 for index in range(100))
+    tag += (0).to_bytes(4, "big")
+
+    lame = bytearray(b"LAME3.100")
+    lame += bytes([0x01, 0])  # Tag revision 0, CBR; lowpass unknown
+    lame += bytes(4 + 2 + 2)  # Peak and ReplayGain not computed
+    lame += bytes([0, min(bit_rate, 255)])
+    lame += ((ENCODER_DELAY << 12) | padding).to_bytes(3, "big")
+    lame += bytes(1 + 1 + 2)  # Misc, MP3 gain, preset
+    lame += total_bytes.to_bytes(4, "big")
+    lame += bytes(2)  # Music CRC not computed
+
+    frame = bytearray(header) + bytes(SIDE_INFO_BYTES[channels]) + tag + lame
+    frame += _crc16(frame).to_bytes(2, "big")
+    return bytes(frame + bytes(size - len(frame)))
+
+
+def _encode(samples: np.ndarray, sample_rate: int, bit_rate: int, quality: int) -> bytes:
+    # LAME through ffmpeg, because lameenc cannot turn the bit reservoir off
+    return read_ffmpeg([
+        "-f", "s16le", "-ar", sample_rate, "-ac", 1, "-i", "-",
+        "-c:a", "libmp3lame", "-b:a", f"{bit_rate}k", "-compression_level", quality, "-reservoir", 0,
+        "-write_xing", 0, "-id3v2_version", 0, "-f", "mp3", "-"
+    ], input=samples.astype("<i2", copy=False).tobytes())
+
+
+def encode_periodic_mp3(frequency, duration: float, sample_rate: int, bit_rate: int, mp3_filename,
+                        quality: int = 2, gapless_header: bool = True) -> Optional[dict]:
+    """
+    Write `duration` seconds of the tone to mp3_filename from a short encode whose loop
+    block is repeated. Returns None without writing anything when the loop block is too
+    long for repetition to save work (fewer than three blocks fit in the duration).
+    Otherwise returns the block and seam positions for check_seams.
+    """
+    total_samples = int(sample_rate * duration)
+    block = loop_block_samples(frequency, sample_rate, bit_rate)
+    repeats = total_samples // block - 2
+    if repeats < 1:
+        return None
+
+    # Encode two to three blocks: a settled first block, a steady block and the ending
+    encoded_samples = total_samples - repeats * block
+    frames = split_frames(_encode(periodic_tone(frequency, sample_rate, encoded_samples), sample_rate,
+                                  bit_rate, quality))
+    block_frames = block // SAMPLES_PER_FRAME
+    steady = frames[block_frames:2 * block_frames]
+
+    # The encode continues past the steady block; it must repeat it up to the last few frames
+    overlap = max(0, len(frames) - 2 * block_frames - 3)
+    if frames[2 * block_frames:2 * block_frames + overlap] != steady[:overlap]:
+        raise RuntimeError(f"MP3 frames of {frequency} Hz do not repeat with the {block} sample loop block")
+    frames = frames[:block_frames] + steady * repeats + frames[block_frames:]
+
+    audio = b"".join(frames)
+    padding = len(frames) * SAMPLES_PER_FRAME - total_samples - ENCODER_DELAY
+    with open(mp3_filename, "wb") as f:
+        if gapless_header:
+            f.write(info_frame(frames[0], len(frames), len(audio), padding, bit_rate))
+        f.write(audio)
+
+    return {
+        "block_samples": block,
+        "encoded_samples": encoded_samples,
+        "total_samples": total_samples,
+        # Audio frames at which a repeated block starts
+        "seam_frames": [block_frames * (index + 1) for index in range(repeats + 1)],
+        "gapless_header": gapless_header,
+    }
+
+
+def check_seams(path, frequency, seam_frames: List[int], sample_rate: int, gapless_header: bool = True,
+                window: int = 4096, phase_tolerance: float = 0.01, residual_tolerance: float = 0.01) -> List[str]:
+    """
+    Decode an MP3 and fit the tone's phase just before and just after each seam frame.
+    The phase must not jump at a seam, and must match the ideal tone's phase at that
+    sample index, which also checks the gapless trim. Samples around each seam must
+    match the fitted tone to within residual_tolerance. Returns a list of problems.
+    """
+    samples = np.frombuffer(read_ffmpeg(["-i", path, "-map", "0:a:0", "-ac", 1, "-ar", sample_rate,
+                                         "-f", "s16le", "-"]), dtype="<i2").astype(np.float64) / 32768
+    # Decoded samples that precede the first input sample
+    lead = 0 if gapless_header else ENCODER_DELAY + DECODER_DELAY
+    step = Fraction(str(frequency)) / sample_rate
+
+    def fit(start, stop):
+        # Least-squares sin/cos fit against the ideal phase of each sample index
+        index = np.arange(start, stop, dtype=np.int64) - lead
+        cycles = (step.numerator * index) % step.denominator / step.denominator
+        basis = np.stack([np.sin(2 * np.pi * cycles), np.cos(2 * np.pi * cycles)], axis=1)
+        (sine, cosine), *_ = np.linalg.lstsq(basis, samples[start:stop], rcond=None)
+        return math.atan2(cosine, sine), samples[start:stop] - basis @ (sine, cosine)
+
+    problems = []
+    for frame in seam_frames:
+        seam = frame * SAMPLES_PER_FRAME - ENCODER_DELAY - DECODER_DELAY + lead
+        if seam - window < 0 or seam + window > len(samples):
+            continue
+        before, _ = fit(seam - window, seam)
+        after, _ = fit(seam, seam + window)
+        jump = math.remainder(after - before, 2 * math.pi)
+        if abs(jump) > phase_tolerance:
+            problems.append(f"phase jumps {jump:+.4f} rad at the seam before frame {frame}")
+        offset = max(before, after, key=abs)
+        if abs(offset) > phase_tolerance:
+            problems.append(f"phase is off by {offset:+.4f} rad at the seam before frame {frame}")
+        _, residual = fit(seam - SAMPLES_PER_FRAME, seam + SAMPLES_PER_FRAME)
+        if np.abs(residual).max() > residual_tolerance:
+            problems.append(f"samples deviate {np.abs(residual).max():.4f} from the tone around frame {frame}")
+    return problems
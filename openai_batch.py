@@ -0,0 +1,207 @@
+"""
+Asynchronous, rate-limited OpenAI client for batch description and image generation.
+
+Requests go through one pooled HTTP connection pool. A semaphore bounds how many
+API calls are in flight and a token bucket spaces them out to the account's rate
+limit, so no fixed sleeps are needed between frequencies. Responses are stored in an
+on-disk cache keyed by endpoint, model and prompt, so a repeated frequency never
+reaches the API again. Images are cached as downloaded bytes, because the URLs the
+API returns expire.
+
+Usage:
+    async with OpenAIBatchClient(api_key, concurrency=4, requests_per_minute=50) as client:
+        description = await client.chat("gpt-4", [{"role": "user", "content": prompt}])
+        image_bytes = await client.image(image_prompt)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from typing import List, Optional
+
+import httpx
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+CACHE_DIR = ".openai_cache"
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class OpenAIError(Exception):
+    pass
+
+
+class TokenBucket:
+    """
+    Allow `rate` acquisitions per second on average, with bursts of up to `capacity`.
+    """
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ResponseCache:
+    """
+    Persistent cache of API results, one file per request key.
+    """
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(endpoint: str, model: str, prompt, **params) -> str:
+        payload = json.dumps({"endpoint": endpoint, "model": model, "prompt": prompt, "params": params},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, value: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(value)
+        os.replace(temp_path, path)
+
+
+class OpenAIBatchClient:
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = OPENAI_BASE_URL,
+        concurrency: int = 4,
+        requests_per_minute: float = 50,
+        cache: Optional[ResponseCache] = None,
+        max_retries: int = 6,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        timeout: float = 120.0
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.bucket = TokenBucket(requests_per_minute / 60.0, capacity=concurrency)
+        self.stats = {"api_requests": 0, "cache_hits": 0, "downloads": 0, "retries": 0}
+        self._semaphore = None
+        self._http = None
+        self._in_flight = {}  # cache key -> task, so identical requests in one batch share a call
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._http = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.concurrency * 2, max_keepalive_connections=self.concurrency * 2)
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._http.aclose()
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                await self.bucket.acquire()
+                self.stats["api_requests"] += 1
+                try:
+                    response = await self._http.post(
+                        f"{self.base_url}{path}",
+                        json=payload,
+                        headers={"Authorization": f"Bearer {self.api_key}"}
+                    )
+                    status = response.status_code
+                except httpx.TransportError:
+                    response, status = None, None
+
+            if status == 200:
+                return response.json()
+            if status is not None and status not in RETRYABLE_STATUSES:
+                raise OpenAIError(f"POST {path} failed: HTTP {status} {response.text[:200]}")
+
+            attempt += 1
+            if attempt > self.max_retries:
+                raise OpenAIError(f"POST {path} failed after {self.max_retries} retries")
+            self.stats["retries"] += 1
+            retry_after = response.headers.get("Retry-After") if response is not None else None
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+            await asyncio.sleep(float(retry_after) if retry_after else delay * random.uniform(0.5, 1.0))
+
+    async def _cached(self, key: str, fetch) -> bytes:
+        if self.cache is not None:
+            value = self.cache.get(key)
+            if value is not None:
+                self.stats["cache_hits"] += 1
+                return value
+
+        if key not in self._in_flight:
+            self._in_flight[key] = asyncio.ensure_future(fetch())
+        else:
+            self.stats["cache_hits"] += 1
+        try:
+            value = await self._in_flight[key]
+        finally:
+            self._in_flight.pop(key, None)
+
+        if self.cache is not None:
+            self.cache.put(key, value)
+        return value
+
+    async def chat(self, model: str, messages: List[dict]) -> str:
+        """
+        Return the assistant message content of a chat completion.
+        """
+        async def fetch():
+            response = await self._post("/chat/completions", {"model": model, "messages": messages})
+            return response["choices"][0]["message"]["content"].encode("utf-8")
+
+        key = ResponseCache.key("chat/completions", model, messages)
+        return (await self._cached(key, fetch)).decode("utf-8")
+
+    async def image(self, prompt: str, model: str = "dall-e-2", size: str = "1024x1024") -> bytes:
+        """
+        Generate one image and return its downloaded bytes.
+        """
+        async def fetch():
+            response = await self._post("/images/generations",
+                                        {"model": model, "prompt": prompt, "n": 1, "size": size})
+            download = await self._http.get(response["data"][0]["url"])
+            download.raise_for_status()
+            self.stats["downloads"] += 1
+            return download.content
+
+        key = ResponseCache.key("images/generations", model, prompt, size=size)
+        return await self._cached(key, fetch)
+
+    def report(self) -> str:
+        return (f"OpenAI: {self.stats['api_requests']} API requests, {self.stats['cache_hits']} cache hits, "
+                f"{self.stats['downloads']} image downloads, {self.stats['retries']} retries")
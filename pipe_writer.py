@@ -0,0 +1,169 @@
+"""
+Streams rendered frames straight into an ffmpeg subprocess, bypassing write_videofile.
+
+A producer thread renders frames into a fixed ring of uint8 buffers while the calling
+thread writes filled buffers to ffmpeg's stdin, so frame generation and encoding
+overlap. The bounded queues cap memory at `queue_frames` frames and no per-frame
+arrays are allocated. Audio, from a file or any other ffmpeg input such as a
+SineSource socket, is muxed by the same ffmpeg invocation instead of going through a
+temporary audio file.
+
+write_video_pipes feeds several outputs, e.g. one per aspect ratio, from the same frame
+loop: each ring slot holds one buffer per output and every output has its own ffmpeg.
+"""
+import queue
+import subprocess
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from ffmpeg_tools import ffmpeg_binary
+
+
+def pipe_command(output_path, size: tuple, fps: float, codec: str, bitrate: Optional[str] = None,
+                 threads: Optional[int] = None, audio_input: Optional[List[str]] = None,
+                 audio_codec: Optional[str] = None, duration: Optional[float] = None,
+                 ffmpeg_params: Optional[List[str]] = None, preset: str = "medium") -> List[str]:
+    """
+    The ffmpeg command line for raw RGB frames on stdin, mirroring write_videofile's encoder settings.
+    audio_input holds the ffmpeg input arguments of the audio track, e.g. ["-i", "tone.mp3"].
+    """
+    command = [
+        ffmpeg_binary(), "-y", "-v", "error",
+        "-f", "rawvideo", "-vcodec", "rawvideo",
+        "-s", f"{size[0]}x{size[1]}", "-pix_fmt", "rgb24", "-r", f"{fps:.02f}",
+        "-i", "-",
+    ]
+    if audio_input is not None:
+        command += [str(argument) for argument in audio_input] + ["-map", "0:v:0", "-map", "1:a:0", "-c:a", audio_codec or "aac"]
+    command += ["-vcodec", codec, "-preset", preset]
+    command += [str(param) for param in ffmpeg_params or []]
+    if bitrate is not None:
+        command += ["-b:v", bitrate]
+    if threads is not None:
+        command += ["-threads", str(threads)]
+    if codec == "libx264" and size[0] % 2 == 0 and size[1] % 2 == 0:
+        command += ["-pix_fmt", "yuv420p"]
+    if duration is not None:
+        command += ["-t", f"{duration:.3f}"]
+    return command + [str(output_path)]
+
+
+class PipeOutput(NamedTuple):
+    """
+    One output of write_video_pipes: the clip rendered into it and its audio track.
+    """
+    clip: object
+    output_path: object
+    audio_input: Optional[List[str]] = None
+    audio_codec: Optional[str] = None
+
+
+def write_video_pipe(clip, output_path, fps: float, codec: str = "libx264", bitrate: Optional[str] = None,
+                     threads: Optional[int] = None, audio_path: Optional[str] = None,
+                     audio_codec: Optional[str] = None, ffmpeg_params: Optional[List[str]] = None,
+                     queue_frames: int = 8, progress: bool = False,
+                     audio_input: Optional[List[str]] = None, preset: str = "medium") -> dict:
+    """
+    Encode clip.duration seconds of clip at fps into output_path, with audio from
+    audio_path or the ffmpeg input arguments in audio_input. Returns frame count,
+    elapsed seconds and how long each side spent waiting on the other.
+    """
+    if audio_path is not None:
+        audio_input = ["-i", audio_path]
+    return write_video_pipes([PipeOutput(clip, output_path, audio_input, audio_codec)], fps, codec, bitrate,
+                             threads, ffmpeg_params, queue_frames, progress, preset)
+
+
+def write_video_pipes(outputs: List[PipeOutput], fps: float, codec: str = "libx264", bitrate: Optional[str] = None,
+                      threads: Optional[int] = None, ffmpeg_params: Optional[List[str]] = None,
+                      queue_frames: int = 8, progress: bool = False, preset: str = "medium") -> dict:
+    """
+    Encode every output from one frame loop. Frame t of all outputs is rendered before
+    frame t + 1 of any, so clips that share a source frame compute it once per t.
+    All outputs run for the first clip's duration.
+    """
+    duration = outputs[0].clip.duration
+    frame_count = int(duration * fps)
+    processes = []
+    for output in outputs:
+        command = pipe_command(output.output_path, tuple(output.clip.size), fps, codec, bitrate, threads,
+                               output.audio_input, output.audio_codec,
+                               duration if output.audio_input is not None else None, ffmpeg_params, preset)
+        processes.append(subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                          stderr=subprocess.PIPE))
+
+    # Slots of one buffer per output cycle free -> producer -> filled -> writer -> free
+    free = queue.Queue()
+    filled = queue.Queue()
+    for _ in range(queue_frames):
+        free.put([np.empty((output.clip.size[1], output.clip.size[0], 3), dtype=np.uint8) for output in outputs])
+    stop = threading.Event()
+    stats = {"frames": frame_count, "producer_wait": 0.0, "writer_wait": 0.0}
+
+    def produce():
+        try:
+            for index in range(frame_count):
+                wait_start = time.perf_counter()
+                buffers = free.get()
+                stats["producer_wait"] += time.perf_counter() - wait_start
+                if stop.is_set():
+                    return
+                for buffer, output in zip(buffers, outputs):
+                    np.copyto(buffer, output.clip.get_frame(index / fps), casting="unsafe")
+                filled.put(buffers)
+        except BaseException as e:
+            filled.put(e)
+            return
+        filled.put(None)
+
+    def failure(process):
+        process.wait()
+        return RuntimeError(f"ffmpeg failed: {process.stderr.read().decode(errors='replace').strip()}")
+
+    producer = threading.Thread(target=produce, daemon=True)
+    start = time.perf_counter()
+    last_report = start
+    producer.start()
+    written = 0
+    try:
+        while True:
+            wait_start = time.perf_counter()
+            item = filled.get()
+            stats["writer_wait"] += time.perf_counter() - wait_start
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            for buffer, process in zip(item, processes):
+                try:
+                    process.stdin.write(memoryview(buffer).cast("B"))
+                except BrokenPipeError:
+                    raise failure(process)
+            free.put(item)
+            written += 1
+            if progress and time.perf_counter() - last_report >= 5:
+                last_report = time.perf_counter()
+                print(f"  {written}/{frame_count} frames, {written / (last_report - start):.1f} frames/s")
+        for process in processes:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                raise failure(process)
+        for process in processes:
+            error = process.stderr.read()
+            if process.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed: {error.decode(errors='replace').strip()}")
+    finally:
+        stop.set()
+        free.put(None)  # Unblock the producer if the writer stopped early
+        producer.join()
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
@@ -1,66 +1,167 @@
-import os
-from moviepy.editor import VideoFileClip
-
-# Define folder paths
-input_folder = "output_videos/videos"  # Folder where original videos are stored
-output_folder = "processed_videos"  # Folder where processed videos will be saved
-platforms = {
-    "tiktok": 180,  # Max duration in seconds (e.g., 3 minutes)
-    "facebook_reels": 60,
-    "instagram_reels": 90,
-    "youtube_shorts": 180,
-}
-
-def create_folders():
-    """
-    Checks if output folders for each platform exist; if not, creates them.
-    """
-    for platform in platforms.keys():
-        platform_folder = os.path.join(output_folder, platform)
-        os.makedirs(platform_folder, exist_ok=True)
-
-def compress_video(input_path, output_path):
-    """
-    Compresses a video using MoviePy while maintaining quality.
-    Adjusts bitrate to reduce file size but keeps a high-quality codec.
-    """
-    with VideoFileClip(input_path) as clip:
-        # Use a reasonable bitrate for good quality (e.g., 1000k)
-        clip.write_videofile(output_path, codec='libx264', bitrate="1000k")  # Adjust bitrate for quality
-
-def process_videos():
-    # Ensure output folders are set up
-    create_folders()
-    
-    # Process each video in the input folder
-    for video_file in os.listdir(input_folder):
-        if video_file.endswith((".mp4", ".mov", ".avi")):
-            video_path = os.path.join(input_folder, video_file)
-            clip = VideoFileClip(video_path)
-
-            # Trim and compress video for each platform
-            for platform, max_duration in platforms.items():
-                trimmed_path = os.path.join(output_folder, platform, f"{platform}_{video_file}")
-                
-                # Trim video to platform's max duration if needed
-                if clip.duration > max_duration:
-                    trimmed_clip = clip.subclip(0, max_duration)
-                else:
-                    trimmed_clip = clip
-                
-                # Save trimmed video
-                trimmed_clip.write_videofile(trimmed_path, codec="libx264")
-                trimmed_clip.close()
-
-                # Compress the video
-                compressed_path = os.path.join(output_folder, platform, f"compressed_{platform}_{video_file}")
-                compress_video(trimmed_path, compressed_path)
-
-                # Optional: remove the uncompressed version after compressing
-                os.remove(trimmed_path)
-
-            # Close the original clip to free memory
-            clip.close()
-
-# Run the process
-process_videos()
+import os
+import shutil
+import argparse
+from build_cache import atomic_write_all
+from encoder_profiles import DEFAULT_PLATFORM_PROFILE, PROFILES, get_profile
+from ffmpeg_tools import probe_codecs, run_ffmpeg
+import tracing
+
+# Define folder paths
+input_folder = "output_videos/videos"  # Folder where original videos are stored
+output_folder = "processed_videos"  # Folder where processed videos will be saved
+platforms = {
+    "tiktok": 180,  # Max duration in seconds (e.g., 3 minutes)
+    "facebook_reels": 60,
+    "instagram_reels": 90,
+    "youtube_shorts": 180,
+}
+platform_profile = get_profile(DEFAULT_PLATFORM_PROFILE)  # Encoder settings of every platform output
+
+def create_folders():
+    """
+    Checks if output folders for each platform exist; if not, creates them.
+    """
+    for platform in platforms.keys():
+        platform_folder = os.path.join(output_folder, platform)
+        os.makedirs(platform_folder, exist_ok=True)
+
+def compress_video(input_path, output_path):
+    """
+    Compresses a video using MoviePy while maintaining quality.
+    Encodes with the platform profile to reduce file size but keep a high-quality codec.
+    """
+    from moviepy.editor import VideoFileClip
+
+    with VideoFileClip(input_path) as clip:
+        clip.write_videofile(output_path, codec=platform_profile.codec, bitrate=platform_profile.bitrate,
+                             preset=platform_profile.preset, ffmpeg_params=platform_profile.ffmpeg_params())
+
+def compressed_output_path(platform, video_file):
+    return os.path.join(output_folder, platform, f"compressed_{platform}_{video_file}")
+
+def transcode_fanout(video_path, video_file):
+    """
+    Decodes the source once and encodes every platform output from that single decode.
+    Platforms that share a max duration share one encode; the result is copied to each.
+    AAC audio, which the generated videos carry, is stream-copied instead of re-encoded.
+    Every output, copies included, is renamed into place once all of them are complete.
+    """
+    audio_codec = "copy" if probe_codecs(video_path).get("audio") == "aac" else "aac"
+
+    durations = {}
+    for platform, max_duration in platforms.items():
+        durations.setdefault(max_duration, []).append(platform)
+
+    outputs = [compressed_output_path(platform, video_file) for platform_group in durations.values()
+               for platform in platform_group]
+
+    def encode(temp_paths):
+        temp_path = dict(zip(outputs, temp_paths))
+        arguments = ["-y", "-i", video_path]
+        for max_duration, platform_group in durations.items():
+            arguments += [
+                "-map", "0:v", "-map", "0:a?",
+                "-t", max_duration,
+                *platform_profile.output_args(), "-pix_fmt", "yuv420p",
+                "-c:a", audio_codec,
+                temp_path[compressed_output_path(platform_group[0], video_file)]
+            ]
+        run_ffmpeg(arguments)
+
+        for platform_group in durations.values():
+            for platform in platform_group[1:]:
+                shutil.copyfile(temp_path[compressed_output_path(platform_group[0], video_file)],
+                                temp_path[compressed_output_path(platform, video_file)])
+
+    atomic_write_all(outputs, encode)
+
+def process_video_legacy(video_path, video_file):
+    """
+    Original path: a full re-encode per platform followed by a second compressing encode.
+    """
+    from moviepy.editor import VideoFileClip
+
+    clip = VideoFileClip(video_path)
+
+    # Trim and compress video for each platform
+    for platform, max_duration in platforms.items():
+        trimmed_path = os.path.join(output_folder, platform, f"{platform}_{video_file}")
+        
+        # Trim video to platform's max duration if needed
+        if clip.duration > max_duration:
+            trimmed_clip = clip.subclip(0, max_duration)
+        else:
+            trimmed_clip = clip
+        
+        # Save trimmed video (subclips share the source reader, which is closed once below)
+        trimmed_clip.write_videofile(trimmed_path, codec="libx264")
+
+        # Compress the video
+        compressed_path = compressed_output_path(platform, video_file)
+        compress_video(trimmed_path, compressed_path)
+
+        # Optional: remove the uncompressed version after compressing
+        os.remove(trimmed_path)
+
+    # Close the original clip to free memory
+    clip.close()
+
+def input_videos():
+    return [video_file for video_file in os.listdir(input_folder) if video_file.endswith((".mp4", ".mov", ".avi"))]
+
+def process_video(video_file, legacy=False):
+    """
+    Writes every platform's version of one video from the input folder and returns their paths.
+    """
+    video_path = os.path.join(input_folder, video_file)
+    outputs = [compressed_output_path(platform, video_file) for platform in platforms]
+    with tracing.span("transcode", file=video_file, legacy=legacy, profile=platform_profile.key) as span:
+        if legacy:
+            process_video_legacy(video_path, video_file)
+        else:
+            transcode_fanout(video_path, video_file)
+        span.add(bytes=sum(os.path.getsize(output) for output in outputs))
+    return outputs
+
+def process_videos(legacy=False):
+    # Ensure output folders are set up
+    create_folders()
+    
+    # Process each video in the input folder
+    for video_file in input_videos():
+        process_video(video_file, legacy)
+        print(f"Processed {video_file}")
+
+def add_arguments(parser):
+    parser.add_argument("--legacy", action="store_true",
+                        help="Use the original trim-then-compress path (two encodes per platform)")
+    parser.add_argument("--profile", choices=PROFILES, default=DEFAULT_PLATFORM_PROFILE,
+                        help="Encoder profile of the platform outputs, see encoder_profiles.py")
+    tracing.add_arguments(parser)
+
+def plan_work(args):
+    """
+    One (video, None) entry per video run(args) would transcode for every platform.
+    """
+    if not os.path.isdir(input_folder):
+        return []
+    return [(f"{video_file} -> {', '.join(platforms)}", None) for video_file in sorted(input_videos())]
+
+def run(args):
+    global platform_profile
+    tracing.configure(args.trace, args.metrics)
+    platform_profile = get_profile(args.profile)
+
+    # Run the process
+    try:
+        process_videos(legacy=args.legacy)
+    finally:
+        tracing.tracer.write_metrics()
+
+def main():
+    parser = argparse.ArgumentParser(description="Trim and compress videos for each platform")
+    add_arguments(parser)
+    run(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
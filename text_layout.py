@@ -0,0 +1,268 @@
+"""
+Shared text rendering for the frequency title and description overlays.
+
+Fonts are loaded once per (path, size). The top and bottom shade bands are NumPy
+alpha ramps instead of one drawn rectangle per row. Word-wrap layouts are memoized
+per (text, font, width). Every string is rasterized once into a coverage mask, and
+its glow comes from one convolution of that mask, replacing the 4-8 offset redraws.
+
+The pixel constants below are for the full 1080x1920 frame. LayoutMetrics scales them
+to any other image size, so previews and other formats keep the same proportions: type
+and margins follow the frame's area, vertical placement follows its height.
+"""
+import math
+from functools import lru_cache
+from pathlib import Path
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+from PIL import Image, ImageChops, ImageDraw, ImageFilter, ImageFont
+
+REFERENCE_SIZE = (1080, 1920)
+# The repository's font, wherever the scripts are run from
+DEFAULT_FONT_PATH = str(Path(__file__).resolve().with_name("Roboto-Light.ttf"))
+TITLE_SIZE = 140
+DESCRIPTION_SIZE = 80
+TITLE_TOP = 100
+DESCRIPTION_BOTTOM = 150
+LINE_SPACING = 20
+SIDE_MARGIN = 60
+GRADIENT_HEIGHT = 400
+GRADIENT_ALPHA = 180
+GLOW_ALPHA = 30
+
+# Offsets the glow was originally drawn at, for the title and for description lines
+TITLE_GLOW_OFFSETS = (-2, -1, 1, 2)
+DESCRIPTION_GLOW_OFFSETS = (-1, 1)
+
+
+def layout_scale(image_size: Tuple[int, int]) -> float:
+    """
+    Linear scale of image_size relative to the reference frame, by area: 0.25 for a
+    270x480 preview, 0.75 for 1080x1080, and 1 for 1920x1080.
+    """
+    return math.sqrt(image_size[0] * image_size[1] / (REFERENCE_SIZE[0] * REFERENCE_SIZE[1]))
+
+
+def scaled(value: int, scale: float) -> int:
+    return max(1, int(round(value * scale)))
+
+
+class LayoutMetrics(NamedTuple):
+    """
+    The layout's pixel constants at one image size.
+    """
+    title_size: int
+    description_size: int
+    title_top: int
+    description_bottom: int
+    line_spacing: int
+    side_margin: int
+    gradient_height: int
+    title_glow_offsets: Tuple[int, ...]
+    description_glow_offsets: Tuple[int, ...]
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def for_size(cls, image_size: Tuple[int, int]) -> "LayoutMetrics":
+        scale = layout_scale(image_size)
+        vertical = image_size[1] / REFERENCE_SIZE[1]
+
+        def offsets(values):
+            # Glow offsets keep at least one pixel of reach on each side
+            return tuple(sorted({(1 if value > 0 else -1) * scaled(abs(value), scale) for value in values}))
+
+        return cls(
+            title_size=scaled(TITLE_SIZE, scale),
+            description_size=scaled(DESCRIPTION_SIZE, scale),
+            title_top=scaled(TITLE_TOP, vertical),
+            description_bottom=scaled(DESCRIPTION_BOTTOM, vertical),
+            line_spacing=scaled(LINE_SPACING, scale),
+            side_margin=scaled(SIDE_MARGIN, scale),
+            gradient_height=scaled(GRADIENT_HEIGHT, vertical),
+            title_glow_offsets=offsets(TITLE_GLOW_OFFSETS),
+            description_glow_offsets=offsets(DESCRIPTION_GLOW_OFFSETS),
+        )
+
+
+@lru_cache(maxsize=None)
+def load_font(font_path: str, size: int) -> ImageFont.ImageFont:
+    """
+    The TrueType font at size, or PIL's default bitmap font if font_path cannot be
+    loaded. The bitmap font has no size attribute on older Pillow versions, so line
+    spacing is computed from the requested size rather than font.size.
+    """
+    try:
+        return ImageFont.truetype(font_path, size)
+    except OSError:
+        print(f"Warning: {font_path} not found, using default font")
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=None)
+def wrap_text(text: str, font_path: str, size: int, max_width: int) -> Tuple[str, ...]:
+    """
+    Greedy word wrap: a word moves to the next line once the line's right edge passes max_width.
+    """
+    font = load_font(font_path, size)
+    lines = []
+    current_line = []
+    for word in text.split():
+        current_line.append(word)
+        if font.getbbox(" ".join(current_line))[2] > max_width:
+            current_line.pop()
+            lines.append(" ".join(current_line))
+            current_line = [word]
+    if current_line:
+        lines.append(" ".join(current_line))
+    return tuple(lines)
+
+
+@lru_cache(maxsize=None)
+def gradient_alpha(height: int, opaque: bool = False, gradient_height: int = GRADIENT_HEIGHT) -> np.ndarray:
+    """
+    Per-row alpha of the shade bands: fading out from the top edge and in towards the
+    bottom edge. opaque=True gives the solid bands the fills produce on RGB images.
+    """
+    alpha = np.zeros(height, dtype=np.uint8)
+    ramp = np.arange(gradient_height)
+    top = (GRADIENT_ALPHA * (1 - ramp / gradient_height)).astype(np.uint8)
+    bottom = (GRADIENT_ALPHA * (ramp / gradient_height)).astype(np.uint8)
+    alpha[:gradient_height] = 255 if opaque else top[:height]
+    start = height - gradient_height
+    alpha[max(start, 0):] = 255 if opaque else bottom[max(-start, 0):]
+    alpha.setflags(write=False)
+    return alpha
+
+
+@lru_cache(maxsize=None)
+def glow_kernel(offsets: Tuple[int, ...]) -> ImageFilter.Kernel:
+    # Plus-shaped kernel: one tap per offset the text used to be redrawn at
+    size = 2 * max(abs(offset) for offset in offsets) + 1
+    center = size // 2
+    weights = [0] * (size * size)
+    for offset in offsets:
+        weights[center * size + center + offset] = 1
+        weights[(center + offset) * size + center] = 1
+    return ImageFilter.Kernel((size, size), weights, scale=1)
+
+
+class TextLayout:
+    """
+    Positions and bounding boxes of the title and description lines for one overlay.
+    """
+    def __init__(self, image_size: Tuple[int, int], font_path: str, title: str, description: str):
+        width, height = image_size
+        self.metrics = metrics = LayoutMetrics.for_size(tuple(image_size))
+        self.title_font = load_font(font_path, metrics.title_size)
+        self.description_font = load_font(font_path, metrics.description_size)
+
+        bbox = self.title_font.getbbox(title)
+        self.title = (title, ((width - (bbox[2] - bbox[0])) // 2, metrics.title_top), bbox)
+
+        lines = wrap_text(description, font_path, metrics.description_size, width - 2 * metrics.side_margin)
+        line_height = metrics.description_size + metrics.line_spacing
+        y_position = height - len(lines) * line_height - metrics.description_bottom
+        self.lines: List[Tuple[str, Tuple[int, int], Tuple[int, int, int, int]]] = []
+        for line in lines:
+            bbox = self.description_font.getbbox(line)
+            self.lines.append((line, ((width - (bbox[2] - bbox[0])) // 2, y_position), bbox))
+            y_position += line_height
+
+
+class TextRenderer:
+    def __init__(self, font_path: str, image_size: Tuple[int, int]):
+        self.font_path = font_path
+        self.image_size = image_size
+
+    def layout(self, title: str, description: str) -> TextLayout:
+        return _cached_layout(tuple(self.image_size), self.font_path, title, description)
+
+    def _masks(self, layout: TextLayout, glow_weight: int):
+        """
+        Rasterize every string once and blur its glow once per text block.
+        Returns (text coverage, glow alpha, block boxes); the masks are full-size "L" images
+        and only the boxes contain anything.
+        """
+        text_mask = Image.new("L", self.image_size, 0)
+        glow_mask = Image.new("L", self.image_size, 0)
+        draw = ImageDraw.Draw(text_mask)
+        boxes = []
+
+        blocks = [([layout.title], layout.title_font, layout.metrics.title_glow_offsets),
+                  (layout.lines, layout.description_font, layout.metrics.description_glow_offsets)]
+        for strings, font, offsets in blocks:
+            if not strings:
+                continue
+            for text, position, _ in strings:
+                draw.text(position, text, font=font, fill=255)
+
+            # Blur only the block's bounding box, padded by the glow reach
+            reach = 2 * max(abs(offset) for offset in offsets)
+            box = (
+                max(0, min(x + bbox[0] for _, (x, _), bbox in strings) - reach),
+                max(0, min(y + bbox[1] for _, (_, y), bbox in strings) - reach),
+                min(self.image_size[0], max(x + bbox[2] for _, (x, _), bbox in strings) + reach),
+                min(self.image_size[1], max(y + bbox[3] for _, (_, y), bbox in strings) + reach),
+            )
+            if box[0] >= box[2] or box[1] >= box[3]:
+                continue
+            glow = text_mask.crop(box).point(lambda value: value * glow_weight // 255)
+            glow_mask.paste(ImageChops.lighter(glow_mask.crop(box), glow.filter(glow_kernel(offsets))), box)
+            boxes.append(box)
+
+        return text_mask, glow_mask, boxes
+
+    def render_layer(self, title: str, description: str, opaque: bool = False) -> np.ndarray:
+        """
+        Render the overlay as a straight-alpha RGBA array: black shade bands, a white glow
+        and white text. opaque=True reproduces drawing the overlay onto an RGB image, where
+        fills ignore their alpha.
+        """
+        return self._render(title, description, opaque)[0]
+
+    def _render(self, title: str, description: str, opaque: bool):
+        width, height = self.image_size
+        band = gradient_alpha(height, opaque, LayoutMetrics.for_size(tuple(self.image_size)).gradient_height)
+        layer = np.zeros((height, width, 4), dtype=np.uint8)
+        layer[..., 3] = band[:, np.newaxis]
+
+        text_mask, glow_mask, boxes = self._masks(self.layout(title, description), 255 if opaque else GLOW_ALPHA)
+        for box in boxes:
+            left, top, right, bottom = box
+            text = np.asarray(text_mask.crop(box), dtype=np.float32) / 255
+            glow = np.asarray(glow_mask.crop(box), dtype=np.float32) / 255
+            shade = band[top:bottom, np.newaxis].astype(np.float32) / 255
+
+            # White glow over the black band, then white text over both
+            white = text + glow * (1 - text)
+            alpha = text + (glow + shade * (1 - glow)) * (1 - text)
+            region = layer[top:bottom, left:right]
+            region[..., :3] = (white / np.maximum(alpha, 1e-6) * 255 + 0.5).astype(np.uint8)[..., np.newaxis]
+            region[..., 3] = (alpha * 255 + 0.5).astype(np.uint8)
+        return layer, boxes
+
+    def draw_onto(self, image: Image.Image, title: str, description: str) -> Image.Image:
+        """
+        Return a copy of an RGB image with the overlay drawn on it, the way drawing the
+        overlay directly onto an RGB image does: solid black bands and opaque white text.
+        """
+        result = np.array(image.convert("RGB"))
+        band = gradient_alpha(self.image_size[1], True, LayoutMetrics.for_size(tuple(self.image_size)).gradient_height)
+        result[band == 255] = 0
+
+        # Only the text boxes need blending
+        text_mask, glow_mask, boxes = self._masks(self.layout(title, description), 255)
+        for box in boxes:
+            left, top, right, bottom = box
+            text = np.asarray(text_mask.crop(box), dtype=np.float32) / 255
+            glow = np.asarray(glow_mask.crop(box), dtype=np.float32) / 255
+            alpha = (text + glow * (1 - text))[..., np.newaxis]
+            region = result[top:bottom, left:right]
+            region[...] = (region * (1 - alpha) + 255 * alpha + 0.5).astype(np.uint8)
+        return Image.fromarray(result, "RGB")
+
+
+@lru_cache(maxsize=256)
+def _cached_layout(image_size: Tuple[int, int], font_path: str, title: str, description: str) -> TextLayout:
+    return TextLayout(image_size, font_path, title, description)
@@ -0,0 +1,289 @@
+"""
+Structured tracing and metrics for the pipeline stages.
+
+Every stage of every frequency, every platform transcode and every upload runs inside
+a span. A finished span is appended to a JSONL trace file as one line holding its
+duration, CPU time (including waited-for children such as ffmpeg), the process and
+child RSS high-water marks, frames encoded and frames/s, bytes written or uploaded,
+and the error if it failed. Spans also add to per-stage totals that are written in
+the Prometheus text format, e.g. into node_exporter's textfile collector directory.
+
+Tracing is off unless a trace or metrics path is configured; span() then returns a
+shared no-op span, so instrumented code costs one attribute check per span. The
+paths are kept in environment variables, so pool workers trace into the same files.
+Workers hand their totals back with take_totals() for the parent to merge_totals().
+
+Usage:
+    python frequency_video_generator.py --trace trace.jsonl --metrics /var/lib/node_exporter/textfile/freqcreator.prom
+"""
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows: RSS high-water marks are not reported
+    resource = None
+
+TRACE_ENV = "FREQCREATOR_TRACE"
+METRICS_ENV = "FREQCREATOR_METRICS"
+METRIC_PREFIX = "freqcreator"
+
+# Counters summed per (stage, status) for the metrics file
+TOTAL_FIELDS = ("runs", "seconds", "cpu_seconds", "frames", "bytes")
+
+
+def _peak_rss_bytes(who) -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Span:
+    """
+    One timed unit of work. Use as a context manager; add() counts the frames and
+    bytes it produced, which also count towards the enclosing span when it finishes,
+    and attrs are written with the span.
+    """
+    def __init__(self, tracer: "Tracer", name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.frames = 0
+        self.bytes = 0
+        self.status = "ok"
+        self.error = None
+        self.span_id = None
+        self.parent_id = None
+
+    def add(self, frames: int = 0, bytes: int = 0):
+        self.frames += frames
+        self.bytes += bytes
+
+    def set_status(self, status: str, error: Optional[str] = None):
+        """
+        Record an outcome other than "ok", e.g. a handled failure or a resumed stage.
+        """
+        self.status = status
+        self.error = error
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.parent_id = stack[-1].span_id if stack else None
+        self.span_id = f"{os.getpid()}-{next(self.tracer._ids)}"
+        stack.append(self)
+        self.timestamp = time.time()
+        self._cpu = os.times()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self._start
+        cpu = os.times()
+        stack = self.tracer._stack()
+        stack.remove(self)
+        if stack:
+            stack[-1].add(self.frames, self.bytes)
+        if exc_type is not None:
+            self.status = "error"
+            self.error = f"{exc_type.__name__}: {exc}" if str(exc) else exc_type.__name__
+        self.tracer._finish(self, seconds, sum(cpu[:4]) - sum(self._cpu[:4]))
+        return False
+
+
+class _NoSpan:
+    """
+    The span handed out while tracing is disabled.
+    """
+    def add(self, frames: int = 0, bytes: int = 0):
+        pass
+
+    def set_status(self, status: str, error: Optional[str] = None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    def __init__(self, trace_path: Optional[str] = None, metrics_path: Optional[str] = None):
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.enabled = bool(trace_path or metrics_path)
+        self.totals = {}
+        self.rss_peaks = {}
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> list:
+        # Open spans of the calling thread, innermost last
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name, attrs)
+
+    def current(self):
+        """
+        The innermost open span of the calling thread, or the no-op span.
+        """
+        stack = self._stack() if self.enabled else None
+        return stack[-1] if stack else NO_SPAN
+
+    def _finish(self, span: Span, seconds: float, cpu_seconds: float):
+        rss = _peak_rss_bytes(resource.RUSAGE_SELF) if resource else None
+        child_rss = _peak_rss_bytes(resource.RUSAGE_CHILDREN) if resource else None
+        with self._lock:
+            totals = self.totals.setdefault((span.name, span.status), dict.fromkeys(TOTAL_FIELDS, 0))
+            for field, value in zip(TOTAL_FIELDS, (1, seconds, cpu_seconds, span.frames, span.bytes)):
+                totals[field] += value
+            if rss is not None:
+                self.rss_peaks[span.name] = max(self.rss_peaks.get(span.name, 0), rss, child_rss)
+
+        if not self.trace_path:
+            return
+        record = {
+            "name": span.name,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "pid": os.getpid(),
+            "start": round(span.timestamp, 6),
+            "seconds": round(seconds, 6),
+            "cpu_seconds": round(cpu_seconds, 4),
+            "rss_peak_bytes": rss,
+            "child_rss_peak_bytes": child_rss,
+            "frames": span.frames,
+            "fps": round(span.frames / seconds, 2) if span.frames and seconds else None,
+            "bytes": span.bytes,
+            "status": span.status,
+            "error": span.error,
+            **span.attrs,
+        }
+        line = (json.dumps(record, default=str) + "\n").encode("utf-8")
+        # One O_APPEND write per line keeps lines from parallel workers whole
+        fd = os.open(self.trace_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def take_totals(self) -> list:
+        """
+        Return and reset the totals, as picklable rows for merge_totals in another process.
+        """
+        with self._lock:
+            rows = [[name, status, totals] for (name, status), totals in self.totals.items()]
+            rows += [[name, "rss_peak_bytes", peak] for name, peak in self.rss_peaks.items()]
+            self.totals, self.rss_peaks = {}, {}
+        return rows
+
+    def merge_totals(self, rows: list):
+        with self._lock:
+            for name, status, value in rows:
+                if status == "rss_peak_bytes":
+                    self.rss_peaks[name] = max(self.rss_peaks.get(name, 0), value)
+                    continue
+                totals = self.totals.setdefault((name, status), dict.fromkeys(TOTAL_FIELDS, 0))
+                for field in TOTAL_FIELDS:
+                    totals[field] += value[field]
+
+    def metrics_text(self) -> str:
+        """
+        The totals in the Prometheus text exposition format.
+        """
+        metrics = [
+            ("stage_runs_total", "counter", "Stage runs by outcome", "runs"),
+            ("stage_seconds_total", "counter", "Wall time spent in the stage", "seconds"),
+            ("stage_cpu_seconds_total", "counter", "CPU time of the stage, including ffmpeg", "cpu_seconds"),
+            ("stage_frames_total", "counter", "Video frames encoded by the stage", "frames"),
+            ("stage_bytes_total", "counter", "Bytes written or uploaded by the stage", "bytes"),
+        ]
+        with self._lock:
+            totals = sorted(self.totals.items())
+            rss_peaks = sorted(self.rss_peaks.items())
+        # Runs are labelled by outcome; the other counters cover every outcome of a stage
+        stages = {}
+        for (name, _), values in totals:
+            stage = stages.setdefault(name, dict.fromkeys(TOTAL_FIELDS, 0))
+            for field in TOTAL_FIELDS:
+                stage[field] += values[field]
+        lines = []
+        for metric, kind, description, field in metrics:
+            lines += [f"# HELP {METRIC_PREFIX}_{metric} {description}.", f"# TYPE {METRIC_PREFIX}_{metric} {kind}"]
+            if field == "runs":
+                lines += [f'{METRIC_PREFIX}_{metric}{{stage="{name}",status="{status}"}} {values[field]}'
+                          for (name, status), values in totals]
+            else:
+                lines += [f'{METRIC_PREFIX}_{metric}{{stage="{name}"}} {values[field]:.6g}'
+                          for name, values in stages.items()]
+        lines += [f"# HELP {METRIC_PREFIX}_stage_rss_peak_bytes Highest RSS of the process or its children during the stage.",
+                  f"# TYPE {METRIC_PREFIX}_stage_rss_peak_bytes gauge"]
+        lines += [f'{METRIC_PREFIX}_stage_rss_peak_bytes{{stage="{name}"}} {peak}' for name, peak in rss_peaks]
+        lines += [f"# HELP {METRIC_PREFIX}_last_run_timestamp_seconds When these metrics were written.",
+                  f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge",
+                  f"{METRIC_PREFIX}_last_run_timestamp_seconds {time.time():.3f}"]
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path: Optional[str] = None):
+        """
+        Write the metrics file under a temporary name and rename it into place, so the
+        textfile collector never reads half a file.
+        """
+        path = path or self.metrics_path
+        if not path:
+            return
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.metrics_text())
+        os.replace(temp_path, path)
+
+
+tracer = Tracer(os.environ.get(TRACE_ENV), os.environ.get(METRICS_ENV))
+
+
+def configure(trace_path: Optional[str] = None, metrics_path: Optional[str] = None) -> Tracer:
+    """
+    Replace the module tracer and export its paths to processes started from now on.
+    """
+    global tracer
+    for variable, value in ((TRACE_ENV, trace_path), (METRICS_ENV, metrics_path)):
+        if value:
+            os.environ[variable] = os.path.abspath(value)
+        else:
+            os.environ.pop(variable, None)
+    tracer = Tracer(os.environ.get(TRACE_ENV), os.environ.get(METRICS_ENV))
+    return tracer
+
+
+def add_arguments(parser):
+    parser.add_argument("--trace", default=os.environ.get(TRACE_ENV),
+                        help="Append a JSONL span per stage, frequency and file to this path")
+    parser.add_argument("--metrics", default=os.environ.get(METRICS_ENV),
+                        help="Write per-stage totals in the Prometheus textfile format to this path")
+
+
+def span(name: str, **attrs):
+    return tracer.span(name, **attrs)
+
+
+def add(frames: int = 0, bytes: int = 0):
+    """
+    Count frames or bytes on the calling thread's innermost open span.
+    """
+    tracer.current().add(frames, bytes)
@@ -1,30 +1,123 @@
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-from googleapiclient.http import MediaFileUpload
-import os
-
-# Set up Google Drive API
-SCOPES = ['https://www.googleapis.com/auth/drive.file']
-SERVICE_ACCOUNT_FILE = 'credentials.json'
-
-creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-service = build('drive', 'v3', credentials=creds)
-
-# Specify the folder ID where you want to upload files
-folder_id = 'YOUR_GOOGLE_DRIVE_FOLDER_ID'
-
-def upload_to_drive(file_name):
-    file_metadata = {
-        'name': file_name,
-        'parents': [folder_id]
-    }
-    media = MediaFileUpload(file_name, mimetype='audio/mpeg')
-    service.files().create(body=file_metadata, media_body=media, fields='id').execute()
-    print(f'Uploaded {file_name} to Google Drive')
-
-# Upload each MP3 file to Google Drive
-for file in os.listdir():
-    if file.endswith(".mp3"):
-        upload_to_drive(file)
-        os.remove(file)  # Optionally delete local file after upload
+from drive_uploader import ResumableUploader
+from drive_sync import UploadManifest, list_remote_files, plan_sync, sync_files, MANIFEST_FILE
+from functools import lru_cache
+import argparse
+import glob
+import os
+import tracing
+
+# Set up Google Drive API
+SCOPES = ['https://www.googleapis.com/auth/drive.file']
+SERVICE_ACCOUNT_FILE = 'credentials.json'
+
+# Specify the folder ID where you want to upload files
+folder_id = 'YOUR_GOOGLE_DRIVE_FOLDER_ID'
+
+@lru_cache(maxsize=None)
+def drive_credentials():
+    """
+    Service account credentials, loaded on first use so importing this module needs
+    neither the Google client libraries nor credentials.json.
+    """
+    from google.oauth2 import service_account
+
+    return service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+
+@lru_cache(maxsize=None)
+def drive_service():
+    from googleapiclient.discovery import build
+
+    return build('drive', 'v3', credentials=drive_credentials())
+
+def authorized_session():
+    from google.auth.transport.requests import AuthorizedSession
+
+    return AuthorizedSession(drive_credentials())
+
+def upload_to_drive(file_name):
+    from googleapiclient.http import MediaFileUpload
+
+    file_metadata = {
+        'name': file_name,
+        'parents': [folder_id]
+    }
+    media = MediaFileUpload(file_name, mimetype='audio/mpeg')
+    with tracing.span("upload", file=file_name, legacy=True) as span:
+        drive_service().files().create(body=file_metadata, media_body=media, fields='id').execute()
+        span.add(bytes=os.path.getsize(file_name))
+    print(f'Uploaded {file_name} to Google Drive')
+
+def add_arguments(parser):
+    parser.add_argument("patterns", nargs="*", default=["*.mp3"],
+                        help="Glob patterns of files to upload (default: *.mp3)")
+    parser.add_argument("--jobs", type=int, default=4, help="Files uploaded concurrently")
+    parser.add_argument("--chunk-mb", type=int, default=8,
+                        help="Resumable upload chunk size in MiB")
+    parser.add_argument("--keep-local", action="store_true",
+                        help="Keep local files after a successful upload")
+    parser.add_argument("--sync", action="store_true",
+                        help="Skip files whose content is already on Drive (keeps local files)")
+    parser.add_argument("--offline", action="store_true",
+                        help="With --sync, trust the local manifest instead of listing the Drive folder")
+    parser.add_argument("--manifest", default=MANIFEST_FILE, help="Upload manifest used by --sync")
+    parser.add_argument("--legacy", action="store_true",
+                        help="Upload one file at a time with a single non-resumable request")
+    tracing.add_arguments(parser)
+
+def matching_files(patterns):
+    return sorted({path for pattern in patterns for path in glob.glob(pattern) if os.path.isfile(path)})
+
+def plan_work(args):
+    """
+    (file, None) for every file run(args) would upload and (file, reason) for the ones
+    --sync would skip. Only the local manifest stands in for Drive, so nothing is sent.
+    """
+    files = matching_files(args.patterns)
+    if not args.sync or args.legacy:
+        return [(path, None) for path in files]
+    manifest = UploadManifest(args.manifest)
+    uploads, skipped = plan_sync(files, manifest, manifest.as_remote_files())
+    return [(path, None) for path, _ in uploads] + skipped
+
+def run(args):
+    tracing.configure(args.trace, args.metrics)
+    try:
+        upload_matching_files(args)
+    finally:
+        tracing.tracer.write_metrics()
+
+def upload_matching_files(args):
+    files = matching_files(args.patterns)
+
+    if args.legacy:
+        for file in files:
+            upload_to_drive(file)
+            if not args.keep_local:
+                os.remove(file)  # Optionally delete local file after upload
+        return
+
+    uploader = ResumableUploader(
+        session_factory=authorized_session,
+        chunk_size=args.chunk_mb * 1024 * 1024,
+        max_workers=args.jobs
+    )
+
+    if args.sync:
+        manifest = UploadManifest(args.manifest)
+        remote_files = None if args.offline else list_remote_files(authorized_session(), folder_id)
+        sync_files(uploader, files, folder_id, manifest, remote_files)
+        return
+
+    records = uploader.upload_files(files, parents=[folder_id])
+
+    for record in records:
+        if record["error"] is None and not args.keep_local:
+            os.remove(record["path"])  # Optionally delete local file after upload
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload generated files to Google Drive")
+    add_arguments(parser)
+    run(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
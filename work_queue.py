@@ -0,0 +1,488 @@
+"""
+Distributed batch execution through a work queue on a shared filesystem.
+
+`init` writes the queue: one render job per frequency, optionally followed by the
+platform transcode of its video, together with the generator settings every worker
+renders with. Workers on any host that mounts the same directory run `worker` from
+the shared project directory, so relative output paths resolve to one common output
+tree. A worker claims the next job whose dependencies are done by creating the job's
+lease file with O_EXCL, which only one worker can do, and touches the lease every
+heartbeat interval while the job runs. A lease left untouched for the queue's lease
+TTL belongs to a worker that crashed or lost the share: the next worker to see it
+renames it aside, which again only one worker can do, deletes the dead worker's
+partial files and runs the job again. Rendered videos and platform videos alike are
+renamed into place when complete (build_cache.atomic_write and atomic_write_all), so
+a job that runs twice, or a worker that lost its lease, never leaves half a file.
+
+A finished job leaves done/<job>.json with its outputs and the worker that ran it; a
+job that raised, or whose lease expired max_attempts times, leaves failed/<job>.json.
+Workers exit once every job is done, failed or blocked by a failed dependency.
+Leases age by file modification time, so the hosts' clocks must be synchronised,
+and the share must support O_EXCL creates (NFSv3 or later). The SQLite job manifest
+is not used here, since SQLite locking is unreliable on network filesystems.
+
+Layout:
+    <queue>/queue.json                   generator settings and jobs
+    <queue>/leases/<job>.lease           held by the worker running the job
+    <queue>/leases/<job>.expired-<...>   leases reclaimed from dead workers
+    <queue>/done/<job>.json, <queue>/failed/<job>.json
+
+Usage:
+    python work_queue.py init output_videos/queue [--transcode] [-- --writer pipe --audio-source synth]
+    python work_queue.py worker output_videos/queue
+    python work_queue.py status output_videos/queue
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+import process_videos
+import tracing
+from build_cache import CACHE_DIR, atomic_write, remove_temp_files, temp_owner
+from encoder_profiles import DEFAULT_PLATFORM_PROFILE, PROFILES, get_profile
+
+QUEUE_FILE = "queue.json"
+DEFAULT_LEASE_TTL = 60  # Seconds without a heartbeat before a job is reclaimed
+DEFAULT_MAX_ATTEMPTS = 3
+# States in which a job will never run again
+FINAL_STATES = ("done", "failed", "blocked")
+
+
+def job_id(frequency, stage: str) -> str:
+    return f"{frequency}Hz-{stage}"
+
+
+def _read_json(path) -> Optional[dict]:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):  # Gone, or still being written
+        return None
+
+
+class Lease:
+    """
+    A claimed job. The lease file holds a token unique to this claim, so a worker
+    whose lease was reclaimed can tell that it no longer owns the job.
+    """
+    def __init__(self, queue: "WorkQueue", job: dict, path: Path, record: dict):
+        self.queue = queue
+        self.job = job
+        self.path = path
+        self.record = record
+        self.lost = False
+
+    def owned(self) -> bool:
+        record = _read_json(self.path)
+        return record is not None and record["token"] == self.record["token"]
+
+    def heartbeat(self) -> bool:
+        if not self.owned():
+            self.lost = True
+            return False
+        os.utime(self.path)
+        return True
+
+    @contextmanager
+    def keep_alive(self, interval: float):
+        """
+        Heartbeat from a background thread while the body runs.
+        """
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                if not self.heartbeat():
+                    print(f"- Lost the lease of {self.job['id']}; another worker is running it again")
+                    return
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+
+    def release(self):
+        if self.owned():
+            self.path.unlink()
+
+
+class WorkQueue:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        config = _read_json(self.path / QUEUE_FILE)
+        if config is None:
+            raise FileNotFoundError(f"No work queue in {self.path}; create one with `python work_queue.py init`")
+        self.options = config["options"]
+        self.jobs = config["jobs"]
+        self.jobs_by_id = {job["id"]: job for job in self.jobs}
+        self.transcode_folder = config["transcode_folder"]
+        self.platform_profile = config["platform_profile"]
+        self.lease_ttl = config["lease_ttl"]
+        self.max_attempts = config["max_attempts"]
+        self.leases_dir = self.path / "leases"
+        self.done_dir = self.path / "done"
+        self.failed_dir = self.path / "failed"
+
+    @staticmethod
+    def create(path: str, frequencies: List[float], options: dict, transcode: bool = False,
+               transcode_folder: str = "processed_videos", platform_profile: str = DEFAULT_PLATFORM_PROFILE,
+               lease_ttl: float = DEFAULT_LEASE_TTL, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+               reset: bool = False) -> "WorkQueue":
+        """
+        Write a queue of every distinct frequency's jobs. options are the
+        FrequencyVideoGenerator settings, without threads or progress, which each
+        worker picks for its own host.
+        """
+        path = Path(path)
+        if (path / QUEUE_FILE).exists() and not reset:
+            raise FileExistsError(f"{path} already holds a work queue; reset it to start over")
+        get_profile(platform_profile)
+        for name in ("leases", "done", "failed"):
+            if reset and (path / name).is_dir():
+                shutil.rmtree(path / name)
+            (path / name).mkdir(parents=True, exist_ok=True)
+
+        jobs = []
+        for frequency in dict.fromkeys(frequencies):
+            jobs.append({"id": job_id(frequency, "render"), "frequency": frequency, "stage": "render", "after": []})
+            if transcode:
+                jobs.append({"id": job_id(frequency, "transcode"), "frequency": frequency, "stage": "transcode",
+                             "after": [job_id(frequency, "render")]})
+        config = {
+            "options": options,
+            "jobs": jobs,
+            "transcode_folder": transcode_folder,
+            "platform_profile": platform_profile,
+            "lease_ttl": lease_ttl,
+            "max_attempts": max_attempts,
+            "created": time.time()
+        }
+        atomic_write(path / QUEUE_FILE, lambda temp_path: temp_path.write_text(
+            json.dumps(config, indent=2, default=str), encoding="utf-8"))
+        return WorkQueue(str(path))
+
+    def generator_options(self) -> dict:
+        """
+        The FrequencyVideoGenerator settings, with the tuples JSON turned into lists restored.
+        """
+        options = dict(self.options)
+        for key in ("image_size", "aspects"):
+            if key in options:
+                options[key] = tuple(options[key])
+        return options
+
+    def _lease_path(self, job: dict) -> Path:
+        return self.leases_dir / f"{job['id']}.lease"
+
+    def attempts(self, job: dict) -> int:
+        """
+        Claims of the job whose lease expired.
+        """
+        return sum(1 for _ in self.leases_dir.glob(f"{job['id']}.expired-*"))
+
+    def result(self, job: dict) -> Optional[dict]:
+        return _read_json(self.done_dir / f"{job['id']}.json")
+
+    def state(self, job: dict) -> str:
+        """
+        done, failed, blocked (a dependency failed), waiting (for a dependency),
+        running, expired (the lease outlived its worker) or pending.
+        """
+        if (self.done_dir / f"{job['id']}.json").exists():
+            return "done"
+        if (self.failed_dir / f"{job['id']}.json").exists():
+            return "failed"
+        dependencies = [self.state(self.jobs_by_id[dependency]) for dependency in job["after"]]
+        if any(state in ("failed", "blocked") for state in dependencies):
+            return "blocked"
+        if any(state != "done" for state in dependencies):
+            return "waiting"
+        try:
+            age = time.time() - self._lease_path(job).stat().st_mtime
+        except FileNotFoundError:
+            return "pending"
+        return "expired" if age > self.lease_ttl else "running"
+
+    def summary(self) -> Counter:
+        return Counter(self.state(job) for job in self.jobs)
+
+    def finished(self) -> bool:
+        return all(self.state(job) in FINAL_STATES for job in self.jobs)
+
+    def claim(self, worker: str) -> Optional[Lease]:
+        """
+        Lease the first runnable job, reclaiming expired leases on the way. Returns
+        None when no job can be claimed right now.
+        """
+        for job in self.jobs:
+            state = self.state(job)
+            if state == "expired":
+                self._reclaim(job, worker)
+            elif state != "pending":
+                continue
+            attempt = self.attempts(job) + 1
+            if attempt > self.max_attempts:
+                self._record(self.failed_dir, job, {"error": f"lease expired {attempt - 1} times", "worker": None})
+                continue
+            lease = self._create_lease(job, worker, attempt)
+            if lease is None:
+                continue
+            # Another worker may have finished the job between the state check and the claim
+            if (self.done_dir / f"{job['id']}.json").exists():
+                lease.release()
+                continue
+            return lease
+        return None
+
+    def _create_lease(self, job: dict, worker: str, attempt: int) -> Optional[Lease]:
+        path = self._lease_path(job)
+        record = {
+            "job": job["id"],
+            "worker": worker,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "temp_owner": temp_owner(),
+            "token": uuid.uuid4().hex,
+            "attempt": attempt,
+            "claimed": time.time()
+        }
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        return Lease(self, job, path, record)
+
+    def _reclaim(self, job: dict, worker: str) -> bool:
+        """
+        Move an expired lease aside so the job can be claimed again. The rename
+        succeeds for exactly one of the workers trying it.
+        """
+        path = self._lease_path(job)
+        tombstone = self.leases_dir / f"{job['id']}.expired-{time.time_ns()}-{worker}"
+        try:
+            os.rename(path, tombstone)
+        except FileNotFoundError:
+            return False
+        if time.time() - tombstone.stat().st_mtime <= self.lease_ttl:
+            # The owner heart-beat between the state check and the rename: put the lease back
+            try:
+                os.link(tombstone, path)
+            except FileExistsError:
+                pass
+            tombstone.unlink()
+            return False
+
+        owner = _read_json(tombstone) or {}
+        removed = 0
+        if owner.get("temp_owner"):
+            output_folder = Path(self.options.get("output_folder", "output_videos"))
+            directories = [output_folder / name for name in ("descriptions", "images", "videos")]
+            directories += [Path(self.transcode_folder) / platform for platform in process_videos.platforms]
+            removed = sum(remove_temp_files(directory, owner["temp_owner"])
+                          for directory in directories if directory.is_dir())
+        print(f"- Reclaimed {job['id']} from {owner.get('worker', 'an unknown worker')}, whose lease expired"
+              + (f"; removed {removed} partial file(s)" if removed else ""))
+        return True
+
+    def _record(self, directory: Path, job: dict, fields: dict):
+        record = {"job": job["id"], "finished": time.time(), **fields}
+        atomic_write(directory / f"{job['id']}.json", lambda temp_path: temp_path.write_text(
+            json.dumps(record, indent=2, default=str), encoding="utf-8"))
+
+    def complete(self, lease: Lease, outputs, seconds: float):
+        self._record(self.done_dir, lease.job, {"worker": lease.record["worker"], "attempt": lease.record["attempt"],
+                                                "seconds": seconds, "outputs": outputs})
+        lease.release()
+
+    def fail(self, lease: Lease, error: str, seconds: float) -> bool:
+        """
+        Record the job as failed, unless the lease was reclaimed: the job then runs
+        elsewhere, and the error may come from the reclaim deleting this worker's files.
+        """
+        if not lease.owned():
+            lease.lost = True
+            return False
+        self._record(self.failed_dir, lease.job, {"worker": lease.record["worker"], "attempt": lease.record["attempt"],
+                                                  "seconds": seconds, "error": error})
+        lease.release()
+        return True
+
+
+def run_job(queue: WorkQueue, job: dict, threads: int, cache_dir: str):
+    """
+    Run one job and return its outputs; raises if it fails.
+    """
+    if job["stage"] == "render":
+        from frequency_video_generator import _process_frequency_job
+
+        options = dict(queue.generator_options(), threads=threads, progress=False)
+        record = _process_frequency_job(options, cache_dir, job["frequency"])
+        tracing.tracer.merge_totals(record["trace_totals"])
+        if record["error"] is not None:
+            raise RuntimeError(record["error"])
+        return record["results"]
+
+    video_path = Path(queue.result(queue.jobs_by_id[job["after"][0]])["outputs"]["video"])
+    process_videos.input_folder = str(video_path.parent)
+    process_videos.create_folders()
+    return process_videos.process_video(video_path.name)
+
+
+def run_worker(queue_path: str, worker: Optional[str] = None, threads: Optional[int] = None,
+               heartbeat: Optional[float] = None, poll: float = 2.0, cache_dir: str = CACHE_DIR) -> List[dict]:
+    """
+    Claim and run jobs until the queue is finished. Returns one record per job this
+    worker ran.
+    """
+    from frequency_video_generator import plan_workers
+
+    queue = WorkQueue(queue_path)
+    worker = worker or temp_owner()
+    heartbeat = heartbeat or queue.lease_ttl / 4
+    threads = threads or plan_workers(1)[1]
+    process_videos.output_folder = queue.transcode_folder
+    process_videos.platform_profile = get_profile(queue.platform_profile)
+    print(f"Worker {worker} on {queue.path}: lease TTL {queue.lease_ttl:g}s, heartbeat every {heartbeat:g}s, "
+          f"{threads} ffmpeg thread(s)")
+
+    records = []
+    while True:
+        lease = queue.claim(worker)
+        if lease is None:
+            if queue.finished():
+                break
+            time.sleep(poll)
+            continue
+
+        job = lease.job
+        print(f"\n+ Claimed {job['id']} (attempt {lease.record['attempt']})")
+        start = time.perf_counter()
+        try:
+            with lease.keep_alive(heartbeat), tracing.span("queue_job", job=job["id"], worker=worker,
+                                                           attempt=lease.record["attempt"]):
+                outputs = run_job(queue, job, threads, cache_dir)
+        except KeyboardInterrupt:
+            # Let another worker claim the job without waiting for the lease to expire
+            lease.release()
+            raise
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            if lease.lost or not queue.fail(lease, str(e), seconds):
+                print(f"- Lost the lease of {job['id']} and stopped after {seconds:.1f}s: {e}")
+                continue
+            print(f"- Failed {job['id']} in {seconds:.1f}s: {e}")
+            records.append({"job": job["id"], "seconds": seconds, "error": str(e)})
+            continue
+        seconds = time.perf_counter() - start
+        # A reclaimed job's outputs are as complete as the new owner's will be
+        queue.complete(lease, outputs, seconds)
+        print(f"+ Finished {job['id']} in {seconds:.1f}s" + (" after losing its lease" if lease.lost else ""))
+        records.append({"job": job["id"], "seconds": seconds, "error": None})
+
+    failed = sum(1 for record in records if record["error"] is not None)
+    print(f"\nWorker {worker} ran {len(records)} job(s), {failed} failed; queue: "
+          + ", ".join(f"{count} {state}" for state, count in sorted(queue.summary().items())))
+    return records
+
+
+def _number(value: str):
+    return float(value) if "." in value else int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the frequency video batch across workers sharing a directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    init = subparsers.add_parser("init", help="Create the queue; render options for every worker follow --",
+                                 epilog="Options after -- are frequency_video_generator.py options, "
+                                        "e.g. -- --writer pipe --profile still")
+    init.add_argument("queue", help="Queue directory on the shared filesystem")
+    init.add_argument("--frequencies", type=lambda value: [_number(item) for item in value.split(",") if item],
+                      default=None, help="Comma-separated frequencies (default: the full batch)")
+    init.add_argument("--transcode", action="store_true", help="Add a platform transcode job after each render")
+    init.add_argument("--transcode-folder", default="processed_videos")
+    init.add_argument("--platform-profile", choices=PROFILES, default=DEFAULT_PLATFORM_PROFILE)
+    init.add_argument("--lease-ttl", type=float, default=DEFAULT_LEASE_TTL,
+                      help="Seconds without a heartbeat after which another worker reclaims a job")
+    init.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                      help="Claims of a job whose lease may expire before it is marked failed")
+    init.add_argument("--reset", action="store_true", help="Replace an existing queue and forget its progress")
+
+    worker = subparsers.add_parser("worker", help="Claim and run jobs until the queue is finished")
+    worker.add_argument("queue")
+    worker.add_argument("--worker-id", default=None, help="Name in leases and results (default: host-pid)")
+    worker.add_argument("--threads", type=int, default=None, help="ffmpeg threads (default: every core)")
+    worker.add_argument("--heartbeat", type=float, default=None,
+                        help="Seconds between lease heartbeats (default: a quarter of the lease TTL)")
+    worker.add_argument("--poll", type=float, default=2.0, help="Seconds between claims while no job is runnable")
+    worker.add_argument("--cache-dir", default=CACHE_DIR)
+    tracing.add_arguments(worker)
+
+    status = subparsers.add_parser("status", help="Show the state of every job")
+    status.add_argument("queue")
+    # Everything after -- belongs to the render options of init
+    argv, render_argv = sys.argv[1:], []
+    if "--" in argv:
+        argv, render_argv = argv[:argv.index("--")], argv[argv.index("--") + 1:]
+    args = parser.parse_args(argv)
+    if render_argv and args.command != "init":
+        parser.error("only init takes render options after --")
+    if args.command != "init" and not (Path(args.queue) / QUEUE_FILE).exists():
+        parser.error(f"no work queue in {args.queue}; create one with `python work_queue.py init`")
+
+    if args.command == "init":
+        import frequency_video_generator
+
+        render_parser = argparse.ArgumentParser(prog="work_queue.py init QUEUE --")
+        frequency_video_generator.add_arguments(render_parser)
+        render_args = render_parser.parse_args(render_argv)
+        frequency_video_generator.check_arguments(render_parser, render_args)
+        frequencies = args.frequencies or frequency_video_generator.FREQUENCIES
+        try:
+            queue = WorkQueue.create(args.queue, frequencies, frequency_video_generator.generator_options(render_args),
+                                     transcode=args.transcode, transcode_folder=args.transcode_folder,
+                                     platform_profile=args.platform_profile, lease_ttl=args.lease_ttl,
+                                     max_attempts=args.max_attempts, reset=args.reset)
+        except FileExistsError as e:
+            parser.error(f"{e} (--reset)")
+        print(f"+ Queued {len(queue.jobs)} jobs for {len(dict.fromkeys(frequencies))} frequencies in {queue.path}")
+        return
+
+    if args.command == "worker":
+        tracing.configure(args.trace, args.metrics)
+        try:
+            run_worker(args.queue, args.worker_id, args.threads, args.heartbeat, args.poll, args.cache_dir)
+        finally:
+            tracing.tracer.write_metrics()
+        return
+
+    queue = WorkQueue(args.queue)
+    for job in queue.jobs:
+        state = queue.state(job)
+        detail = ""
+        if state in ("running", "expired"):
+            lease = _read_json(queue._lease_path(job)) or {}
+            detail = f"  {lease.get('worker')}, attempt {lease.get('attempt')}"
+        elif state in ("done", "failed"):
+            record = _read_json((queue.done_dir if state == "done" else queue.failed_dir) / f"{job['id']}.json") or {}
+            detail = f"  {record.get('worker')}" + (f": {record['error']}" if record.get("error") else "")
+        print(f"  {job['id']:<24} {state:<8}{detail}")
+    print(f"{queue.path}: " + ", ".join(f"{count} {state}" for state, count in sorted(queue.summary().items())))
+
+
+if __name__ == "__main__":
+    main()